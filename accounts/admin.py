@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.utils.translation import gettext_lazy as _
-from .models import User, Investment, ReferralHistory,Pairing
+from .models import (
+    User, Investment, ReferralHistory,Pairing, TaskRun, ArchivedInvestment,
+    BiddingHoliday, BiddingWindowOverride, ReferralLedgerEntry
+)
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -11,6 +14,8 @@ class CustomUserAdmin(UserAdmin):
     fieldsets = UserAdmin.fieldsets + (
         ('Referral Information', {'fields': ('phone_number', 'referral_code', 'referred_by', 'referral_earnings')}),
     )
+    # Mirrors the referral ledger, adjust it through ledger entries instead
+    readonly_fields = ('referral_earnings',)
 
 @admin.register(Investment)
 class InvestmentAdmin(admin.ModelAdmin):
@@ -28,9 +33,53 @@ class ReferralHistoryAdmin(admin.ModelAdmin):
     list_filter = ('status', 'created_at')
     search_fields = ('referrer__username', 'referred__username')
     date_hierarchy = 'created_at'
+
+
+@admin.register(ReferralLedgerEntry)
+class ReferralLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'kind', 'amount', 'balance', 'created_at')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('user__username',)
+    date_hierarchy = 'created_at'
+
+    # The ledger is append-only
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 @admin.register(Pairing)
 class PairingAdmin(admin.ModelAdmin):
  
     search_fields = ('user__username', 'pair_user__username')
-   
 
+
+@admin.register(TaskRun)
+class TaskRunAdmin(admin.ModelAdmin):
+    list_display = ('task_name', 'state', 'started_at', 'runtime', 'queue_wait', 'db_queries', 'db_time', 'rows_touched')
+    list_filter = ('task_name', 'state')
+    date_hierarchy = 'started_at'
+    readonly_fields = [field.name for field in TaskRun._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ArchivedInvestment)
+class ArchivedInvestmentAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'amount', 'return_amount', 'status', 'created_at', 'archived_at')
+    search_fields = ('user__username', 'user__phone_number', 'transaction_reference')
+    date_hierarchy = 'created_at'
+
+
+@admin.register(BiddingHoliday)
+class BiddingHolidayAdmin(admin.ModelAdmin):
+    list_display = ('date', 'name')
+    date_hierarchy = 'date'
+
+
+@admin.register(BiddingWindowOverride)
+class BiddingWindowOverrideAdmin(admin.ModelAdmin):
+    list_display = ('date', 'name', 'start', 'end')
+    date_hierarchy = 'date'
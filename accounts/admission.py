@@ -0,0 +1,247 @@
+"""
+Admission control for investment orders.
+
+When a bidding window opens, every investor submits at once. If each request
+ran its own placement transaction they would queue on the database write
+lock, which on SQLite surfaces as "database is locked". Instead,
+``submit_order`` appends the validated order to an append-only intake and
+returns a ticket immediately. A single writer drains the intake and places
+up to ``INVESTMENT_INTAKE_BATCH_SIZE`` orders per transaction. The ticket's
+status (queued, placed or rejected) can be polled at
+``/api/investments/orders/<ticket>/``.
+
+The intake is a Redis stream at ``INVESTMENT_INTAKE_URL``, read through a
+consumer group:
+
+* an order is acknowledged only after its batch commits;
+* orders left unacknowledged by a writer that died are reclaimed;
+* the ticket is stored on the placed ``Investment``, so a redelivered order
+  is not placed twice.
+
+Only the stream survives a restart of the web or writer process, so it is
+the only way an order is accepted before it is placed. Without a URL there
+is no intake: ``InvestmentCreateView`` and ``buy_shares`` place the order
+with ``InvestmentService.place`` and answer 201.
+"""
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from decimal import Decimal
+
+import redis
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+from accounts.locks import write_transaction
+from accounts.models import Investment, User
+from accounts.services import InvestmentService
+
+logger = logging.getLogger(__name__)
+
+STATUS_CACHE_KEY = 'investment-order:{ticket}'
+
+QUEUED = 'queued'
+PLACED = 'placed'
+REJECTED = 'rejected'
+
+# Unacknowledged stream entries idle this long belong to a dead writer
+RECLAIM_IDLE_MS = 60 * 1000
+
+_intakes = {}
+
+
+def get_intake_url():
+    return getattr(settings, 'INVESTMENT_INTAKE_URL', None)
+
+
+def get_stream():
+    return getattr(settings, 'INVESTMENT_INTAKE_STREAM', 'investment-orders')
+
+
+def get_batch_size():
+    return getattr(settings, 'INVESTMENT_INTAKE_BATCH_SIZE', 200)
+
+
+def get_ticket_timeout():
+    return getattr(settings, 'INVESTMENT_TICKET_TIMEOUT', 3600)
+
+
+class RedisStreamIntake:
+    """Redis stream read through a consumer group, see module docstring"""
+
+    group = 'writers'
+
+    def __init__(self, url, stream):
+        self.client = redis.Redis.from_url(url)
+        self.stream = stream
+        self.consumer = f'{socket.gethostname()}-{os.getpid()}'
+        self._group_ready = False
+
+    def append(self, order):
+        self.client.xadd(self.stream, {'order': json.dumps(order)})
+
+    def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            self.client.xgroup_create(self.stream, self.group, id='0', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self._group_ready = True
+
+    def read(self, count, block=None):
+        self._ensure_group()
+        # Take over entries a dead writer claimed before reading new ones
+        entries = self.client.xautoclaim(
+            self.stream, self.group, self.consumer, min_idle_time=RECLAIM_IDLE_MS, count=count
+        )[1]
+        if not entries:
+            response = self.client.xreadgroup(
+                self.group, self.consumer, {self.stream: '>'}, count=count, block=block
+            )
+            entries = response[0][1] if response else []
+        return [(entry_id, json.loads(fields[b'order'])) for entry_id, fields in entries if fields]
+
+    def ack(self, entry_ids):
+        if entry_ids:
+            self.client.xack(self.stream, self.group, *entry_ids)
+            self.client.xdel(self.stream, *entry_ids)
+
+    def release(self, entries):
+        # Unacknowledged entries are reclaimed once idle
+        pass
+
+
+def get_intake():
+    """The configured intake, one per process, or None without ``INVESTMENT_INTAKE_URL``"""
+    url = get_intake_url()
+    if not url:
+        return None
+    key = (url, get_stream())
+    if key not in _intakes:
+        _intakes[key] = RedisStreamIntake(*key)
+    return _intakes[key]
+
+
+def submit_order(user, amount, maturity_period):
+    """Queue an investment order for ``user`` and return its ticket"""
+    intake = get_intake()
+    if intake is None:
+        raise ImproperlyConfigured('Queued orders need INVESTMENT_INTAKE_URL')
+    ticket = str(uuid.uuid4())
+    cache.set(
+        STATUS_CACHE_KEY.format(ticket=ticket),
+        {'status': QUEUED, 'user_id': user.pk},
+        get_ticket_timeout()
+    )
+    intake.append({
+        'ticket': ticket,
+        'user_id': user.pk,
+        'amount': str(amount),
+        'maturity_period': maturity_period,
+        'submitted_at': timezone.now().isoformat(),
+    })
+    return ticket
+
+
+def apply_orders(orders):
+    """
+    Place a batch of orders in one transaction and record each ticket's
+    status. Returns the statuses by ticket.
+
+    Each order is placed in its own savepoint, so a rejected order does not
+    undo the rest of the batch.
+    """
+    statuses = {}
+    with write_transaction():
+        placed = dict(
+            Investment.objects.filter(
+                ticket__in=[order['ticket'] for order in orders]
+            ).values_list('ticket', 'id')
+        )
+        users = User.objects.in_bulk({order['user_id'] for order in orders})
+
+        for order in orders:
+            ticket = order['ticket']
+            user = users.get(order['user_id'])
+            if uuid.UUID(ticket) in placed:
+                # Redelivered after its batch had already committed
+                statuses[ticket] = {'status': PLACED, 'user_id': order['user_id'], 'investment_id': placed[uuid.UUID(ticket)]}
+                continue
+            if user is None:
+                statuses[ticket] = {'status': REJECTED, 'user_id': order['user_id'], 'error': 'User not found'}
+                continue
+            try:
+                investment = InvestmentService.place(user, Decimal(order['amount']), order['maturity_period'], ticket)
+            except Exception as e:
+                logger.error(f"Error placing order {ticket}: {str(e)}")
+                statuses[ticket] = {'status': REJECTED, 'user_id': user.pk, 'error': str(e)}
+            else:
+                statuses[ticket] = {'status': PLACED, 'user_id': user.pk, 'investment_id': investment.id}
+
+    cache.set_many(
+        {STATUS_CACHE_KEY.format(ticket=ticket): status for ticket, status in statuses.items()},
+        get_ticket_timeout()
+    )
+    return statuses
+
+
+def process_batch(intake=None, block=None):
+    """Apply one batch from the intake, returns how many orders it held"""
+    intake = intake or get_intake()
+    entries = intake.read(get_batch_size(), block)
+    if not entries:
+        return 0
+    try:
+        apply_orders([order for _, order in entries])
+    except Exception:
+        intake.release(entries)
+        raise
+    intake.ack([entry_id for entry_id, _ in entries])
+    logger.info(f"Applied {len(entries)} investment orders")
+    return len(entries)
+
+
+def drain(intake=None):
+    """Apply batches until the intake is empty, returns how many orders were applied"""
+    total = 0
+    while True:
+        count = process_batch(intake)
+        if not count:
+            return total
+        total += count
+
+
+def run_writer(intake=None, block=1000, stop=None):
+    """Apply batches as they arrive until ``stop`` is set"""
+    intake = intake or get_intake()
+    while stop is None or not stop.is_set():
+        close_old_connections()
+        try:
+            process_batch(intake, block)
+        except Exception as e:
+            logger.error(f"Error applying investment orders: {str(e)}")
+            time.sleep(1)
+
+
+def get_order_status(ticket, user):
+    """
+    The status of ``user``'s order ``ticket`` with its investment once
+    placed, or None for unknown tickets and those of other users.
+    """
+    status = cache.get(STATUS_CACHE_KEY.format(ticket=ticket))
+    if status is not None and status['user_id'] != user.pk:
+        return None
+    if status is None or status['status'] == PLACED:
+        # Placed orders are also found by ticket once the status has expired
+        investment = Investment.objects.filter(ticket=ticket, user=user).first()
+        if investment is not None:
+            return {'status': PLACED, 'investment': investment}
+    return status
@@ -7,6 +7,8 @@ class AccountsConfig(AppConfig):
 
     def ready(self):
         try:
+            import accounts.checks  # noqa
             import accounts.signals  # noqa
+            import accounts.task_metrics  # noqa
         except ImportError:
             pass
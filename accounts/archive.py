@@ -0,0 +1,126 @@
+"""
+Archival and compaction of terminal rows.
+
+Rows that can no longer change and are older than ``ARCHIVE_RETENTION_DAYS``
+are copied into the ``Archived*`` tables (keeping their original ids) and
+deleted from the live tables in chunked transactions, so the hot scans over
+``Queue``, ``Investment`` and ``Pairing`` only see live rows. Exhausted
+queue entries carry no history and are simply deleted.
+
+Dashboards and the system overview add ``ArchivedInvestment`` to their
+completed figures, and ledger entries keep the id of an archived
+investment.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from accounts.locks import write_transaction
+from accounts.models import (
+    ArchivedInvestment, ArchivedPairedInvestment, ArchivedPairing,
+    Investment, PairedInvestment, Pairing, Queue
+)
+
+logger = logging.getLogger(__name__)
+
+INVESTMENT_FIELDS = (
+    'id', 'user_id', 'amount', 'created_at', 'maturity_period', 'status',
+    'return_amount', 'referral_bonus_used', 'amount_paid',
+    'payment_confirmed_at', 'transaction_reference',
+)
+PAIRING_FIELDS = (
+    'id', 'matured_investment_id', 'new_investment_id', 'amount_paired',
+    'is_confirmed', 'paired_at', 'payment_due_date', 'status', 'payment_status',
+)
+PAIRED_INVESTMENT_FIELDS = (
+    'id', 'matured_investor_id', 'new_investor_id', 'amount_paired',
+    'is_confirmed', 'paired_at', 'status',
+)
+
+
+def get_cutoff(now=None):
+    days = getattr(settings, 'ARCHIVE_RETENTION_DAYS', 30)
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def get_batch_size():
+    return getattr(settings, 'ARCHIVE_BATCH_SIZE', 1000)
+
+
+def exhausted_queue_entries(cutoff):
+    return Queue.objects.filter(amount_remaining__lte=0, created_at__lt=cutoff)
+
+
+def terminal_pairings(cutoff):
+    """Pairings that were paid or failed, or whose investments both completed"""
+    return Pairing.objects.filter(
+        Q(payment_status__in=['paid', 'failed'])
+        | Q(status='failed')
+        | Q(matured_investment__status='completed', new_investment_id__status='completed'),
+        paired_at__lt=cutoff
+    )
+
+
+def terminal_investments(cutoff):
+    """Completed investments no live pairing or open queue entry still refers to"""
+    live_pairings = Pairing.objects.filter(
+        Q(matured_investment=OuterRef('pk')) | Q(new_investment_id=OuterRef('pk'))
+    )
+    open_entries = Queue.objects.filter(investment=OuterRef('pk'), amount_remaining__gt=0)
+    return Investment.objects.filter(
+        status='completed',
+        created_at__lt=cutoff
+    ).exclude(Exists(live_pairings)).exclude(Exists(open_entries))
+
+
+def terminal_paired_investments(cutoff):
+    return PairedInvestment.objects.filter(status='completed', paired_at__lt=cutoff)
+
+
+def _archive_in_batches(queryset, archive_model, fields, batch_size):
+    """Copy rows into ``archive_model`` and delete them, one transaction per batch"""
+    total = 0
+    while True:
+        with write_transaction():
+            rows = list(queryset.order_by('pk').values(*fields)[:batch_size])
+            if not rows:
+                break
+            if archive_model is not None:
+                archive_model.objects.bulk_create(
+                    [archive_model(**row) for row in rows],
+                    ignore_conflicts=True
+                )
+            queryset.model.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        total += len(rows)
+        if len(rows) < batch_size:
+            break
+    return total
+
+
+def archive_terminal_rows(now=None):
+    """Archive every terminal row older than the retention window, returns counts per table"""
+    cutoff = get_cutoff(now)
+    batch_size = get_batch_size()
+
+    # Pairings go first so completed investments no longer have live references
+    counts = {
+        'queue_entries': _archive_in_batches(exhausted_queue_entries(cutoff), None, ('id',), batch_size),
+        'pairings': _archive_in_batches(terminal_pairings(cutoff), ArchivedPairing, PAIRING_FIELDS, batch_size),
+        'investments': _archive_in_batches(terminal_investments(cutoff), ArchivedInvestment, INVESTMENT_FIELDS, batch_size),
+        'paired_investments': _archive_in_batches(
+            terminal_paired_investments(cutoff), ArchivedPairedInvestment, PAIRED_INVESTMENT_FIELDS, batch_size
+        ),
+    }
+    logger.info(f"Archived terminal rows older than {cutoff:%Y-%m-%d}: {counts}")
+    return counts
+
+
+def get_investment_for_statement(user, investment_id):
+    """Look an investment up in the live table, then in the archive"""
+    investment = Investment.objects.filter(id=investment_id, user=user).first()
+    if investment is None:
+        investment = ArchivedInvestment.objects.filter(id=investment_id, user=user).first()
+    return investment
@@ -0,0 +1,136 @@
+"""
+Async read endpoints.
+
+Async counterparts of the dashboard, overview and list API views, mounted
+under ``/api/async/``. Served by an ASGI worker (see
+``referral_system.asgi``) they wait on the database without holding a
+thread, and the dashboard and overview run their independent queries with
+``asyncio.gather`` (see ``accounts.dashboard``).
+
+DRF views are sync only, so these are plain Django views: they
+authenticate the bearer token with ``ClaimsJWTAuthentication``, require an
+authenticated user as the sync views do, and render with DRF's JSON
+encoder so the payloads are the same.
+
+``events`` streams the user's ``accounts.events`` as server-sent events.
+It takes a single-use ``ticket`` query parameter instead of the access
+token (see ``accounts.events.issue_ticket``). Django 4.2 does not notice a client
+disconnecting from a stream, so each stream ends after
+``EVENTS_STREAM_TIMEOUT`` seconds and the client reconnects.
+"""
+import logging
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.utils.encoders import JSONEncoder
+
+from accounts.authentication import ClaimsJWTAuthentication
+from accounts.dashboard import aget_system_overview, aget_user_dashboard
+from accounts.events import aredeem_ticket, encode, get_broker
+from accounts.models import Investment, ReferralHistory
+from accounts.routers import replica_reads
+from accounts.serializers import InvestmentSerializer, ReferralHistorySerializer
+
+logger = logging.getLogger(__name__)
+
+
+def get_heartbeat_interval():
+    return getattr(settings, 'EVENTS_HEARTBEAT_INTERVAL', 15)
+
+
+def get_stream_timeout():
+    return getattr(settings, 'EVENTS_STREAM_TIMEOUT', 900)
+
+
+def get_reconnect_delay():
+    return getattr(settings, 'EVENTS_RECONNECT_DELAY', 3)
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def authenticated_get(view):
+    """Allow GET requests carrying a valid access token, setting ``request.user``"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+        authentication = ClaimsJWTAuthentication()
+        try:
+            result = await sync_to_async(authentication.authenticate)(request)
+        except APIException as e:
+            detail = e.detail if isinstance(e.detail, dict) else {'detail': e.detail}
+            response = json_response(detail, status=e.status_code)
+        else:
+            if result is not None:
+                request.user = result[0]
+                return await view(request, *args, **kwargs)
+            response = json_response({'detail': 'Authentication credentials were not provided.'}, status=401)
+        response['WWW-Authenticate'] = authentication.authenticate_header(request)
+        return response
+    return wrapper
+
+
+@authenticated_get
+@replica_reads
+async def user_dashboard(request):
+    try:
+        return json_response(await aget_user_dashboard(request.user))
+    except Exception as e:
+        logger.exception(f"Dashboard error for user {request.user.pk}: {str(e)}")
+        return json_response({'error': f'Failed to fetch dashboard data: {str(e)}'}, status=500)
+
+
+@authenticated_get
+@replica_reads
+async def system_overview(request):
+    """Get comprehensive system overview data"""
+    return json_response(await aget_system_overview())
+
+
+@authenticated_get
+@replica_reads
+async def investment_list(request):
+    investments = Investment.objects.filter(user=request.user).select_related('user')
+    return json_response(InvestmentSerializer([investment async for investment in investments], many=True).data)
+
+
+@authenticated_get
+@replica_reads
+async def referral_list(request):
+    referrals = ReferralHistory.objects.filter(referrer=request.user)
+    return json_response(ReferralHistorySerializer([referral async for referral in referrals], many=True).data)
+
+
+async def event_stream(user_id):
+    yield f'retry: {get_reconnect_delay() * 1000}\n\n'
+    deadline = time.monotonic() + get_stream_timeout()
+    async with get_broker().subscribe(user_id) as subscription:
+        while time.monotonic() < deadline:
+            message = await subscription.get(min(get_heartbeat_interval(), deadline - time.monotonic()))
+            if message is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield f"event: {message['event']}\ndata: {encode(message['data'])}\n\n"
+
+
+async def events(request):
+    """Stream the dashboard events of the user the ``ticket`` was issued to"""
+    if request.method != 'GET':
+        return json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    ticket = request.GET.get('ticket')
+    user_id = await aredeem_ticket(ticket) if ticket else None
+    if user_id is None:
+        return json_response({'detail': 'Invalid or expired event stream ticket.'}, status=401)
+
+    response = StreamingHttpResponse(event_stream(user_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,114 @@
+"""
+Stateless JWT authentication.
+
+Tokens issued with ``ClaimsRefreshToken`` carry the user's phone number,
+referral code and staff flag, and the time they logged in (``auth_time``).
+Access tokens refreshed from them copy these claims. ``ClaimsJWTAuthentication``
+builds ``request.user`` from the signed claims without a query. The result
+is a ``ClaimsUser`` whose other fields are loaded, together, the first time
+a view touches one of them.
+
+Deactivating or deleting a user, or changing a field their tokens claim,
+revokes every token issued to them until then (``revoke_user``, see
+``accounts.signals``). Revocations are stored in ``TokenRevocation`` and
+kept in the default cache for the refresh token lifetime. A user missing
+from the cache, e.g. after Redis lost its data or while the cache falls
+back to a per-process one, is looked up in the table once and cached,
+users never revoked included. Each process also caches lookups for
+``JWT_REVOCATION_CACHE_TIMEOUT`` seconds, so a revocation reaches every
+worker within that delay.
+
+Tokens issued without the claims fall back to simplejwt's lookup by id.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.cache import LRUCache
+from accounts.models import ClaimsUser, TokenRevocation
+
+CLAIM_FIELDS = ('phone_number', 'referral_code', 'is_staff')
+AUTH_TIME_CLAIM = 'auth_time'
+REVOKED_KEY = 'revoked-user:{user_id}'
+# Cached for users whose tokens were never revoked
+NEVER_REVOKED = 0
+
+_revocations = LRUCache(10000)
+
+
+def get_revocation_cache_timeout():
+    return getattr(settings, 'JWT_REVOCATION_CACHE_TIMEOUT', 5)
+
+
+class ClaimsRefreshToken(RefreshToken):
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for field in CLAIM_FIELDS:
+            token[field] = getattr(user, field)
+        token[AUTH_TIME_CLAIM] = token['iat']
+        return token
+
+
+def get_revocation_lifetime():
+    return int(jwt_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+
+
+def revoke_user(user_id):
+    """Reject the tokens issued to ``user_id`` up to now"""
+    revoked_at = int(time.time())
+    TokenRevocation.objects.update_or_create(user_id=user_id, defaults={'revoked_at': revoked_at})
+    cache.set(REVOKED_KEY.format(user_id=user_id), revoked_at, get_revocation_lifetime())
+    _revocations.delete(user_id)
+
+
+def get_revoked_at(user_id):
+    """When ``user_id``'s tokens were last revoked, or None"""
+    found, revoked_at = _revocations.get(user_id)
+    if not found:
+        key = REVOKED_KEY.format(user_id=user_id)
+        revoked_at = cache.get(key)
+        if revoked_at is None:
+            revoked_at = TokenRevocation.objects.filter(user_id=user_id).values_list(
+                'revoked_at', flat=True
+            ).first() or NEVER_REVOKED
+            # add() so a revocation cached meanwhile is not overwritten
+            cache.add(key, revoked_at, get_revocation_lifetime())
+        _revocations.set(user_id, revoked_at, get_revocation_cache_timeout())
+    return revoked_at or None
+
+
+def claims_user(user_id, claims):
+    """An active ``ClaimsUser`` with only ``id`` and the claimed fields loaded"""
+    values = {'id': user_id, 'is_active': True, **claims}
+    names = [field.attname for field in ClaimsUser._meta.concrete_fields if field.attname in values]
+    return ClaimsUser.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWT authentication that trusts the user claims in the token"""
+
+    def get_user(self, validated_token):
+        if AUTH_TIME_CLAIM not in validated_token or any(
+            field not in validated_token for field in CLAIM_FIELDS
+        ):
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        revoked_at = get_revoked_at(user_id)
+        if revoked_at is not None and validated_token[AUTH_TIME_CLAIM] < revoked_at:
+            raise AuthenticationFailed('User is inactive or was signed out', code='token_revoked')
+
+        return claims_user(user_id, {field: validated_token[field] for field in CLAIM_FIELDS})
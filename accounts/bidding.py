@@ -0,0 +1,239 @@
+"""
+Bidding-window calendar.
+
+Investments can only be placed, and the window-bound pairing job only runs,
+inside the daily bidding windows. ``BiddingCalendar`` precomputes the
+windows of every day in ``[today - 1, today + BIDDING_CALENDAR_DAYS]`` in
+``BIDDING_TIME_ZONE``: the ``BIDDING_WINDOWS`` defaults, replaced by any
+``BiddingWindowOverride`` rows for that date, and nothing on a
+``BiddingHoliday``. "Is open", "current window" and "next window" are then
+dictionary lookups over the table.
+
+The table is shared through the default cache, under a key versioned by the
+holiday and override models, and memoized per process for
+``BIDDING_CALENDAR_CACHE_TIMEOUT`` seconds; saving or deleting a holiday or
+override invalidates it.
+"""
+import uuid
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+from time import monotonic
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils import timezone
+
+from accounts.cache import bump_model_version, get_or_set, versioned_key
+from accounts.models import BiddingHoliday, BiddingWindowOverride
+
+CACHE_KEY = 'bidding-calendar:{day}'
+PAYLOAD_CACHE_KEY = 'bidding-windows:{version}:{day}:{current}:{next}'
+
+DEFAULT_WINDOWS = [
+    ('morning', '09:00', '09:40'),
+    ('evening', '17:00', '17:40'),
+]
+
+# Saving or deleting any of these moves the calendar's cache key on
+CALENDAR_MODELS = (BiddingHoliday, BiddingWindowOverride)
+
+Window = namedtuple('Window', ['id', 'name', 'start', 'end'])
+
+_memo = {'calendar': None, 'expires': 0.0}
+
+
+def get_default_windows():
+    """The configured daily windows as ``(name, start, end)`` with ``time`` bounds"""
+    return [
+        (name, time.fromisoformat(start), time.fromisoformat(end))
+        for name, start, end in getattr(settings, 'BIDDING_WINDOWS', DEFAULT_WINDOWS)
+    ]
+
+
+def get_time_zone():
+    return ZoneInfo(getattr(settings, 'BIDDING_TIME_ZONE', settings.TIME_ZONE))
+
+
+def get_calendar_days():
+    return getattr(settings, 'BIDDING_CALENDAR_DAYS', 14)
+
+
+def get_cache_timeout():
+    return getattr(settings, 'BIDDING_CALENDAR_CACHE_TIMEOUT', 300)
+
+
+class BiddingCalendar:
+    """Precomputed bidding windows for a range of days, see module docstring"""
+
+    def __init__(self, first_day, last_day, tz, default_windows, holidays=(), overrides=None):
+        self.first_day = first_day
+        self.last_day = last_day
+        self.tz = tz
+        # Distinguishes payloads rendered from different builds of the table
+        self.version = uuid.uuid4().hex[:12]
+        overrides = overrides or {}
+
+        self._days = {}
+        day = first_day
+        while day <= last_day:
+            if day in holidays:
+                bounds = []
+            else:
+                bounds = overrides.get(day, default_windows)
+            self._days[day] = tuple(
+                Window(
+                    f'{day.isoformat()}-{name}',
+                    name,
+                    datetime.combine(day, start, tzinfo=tz),
+                    datetime.combine(day, end, tzinfo=tz),
+                )
+                for name, start, end in sorted(bounds, key=lambda bound: bound[1])
+            )
+            day += timedelta(days=1)
+
+        # First window on or after each day, filled in backwards
+        self._first_from = {}
+        following = None
+        day = last_day
+        while day >= first_day:
+            if self._days[day]:
+                following = self._days[day][0]
+            self._first_from[day] = following
+            day -= timedelta(days=1)
+
+    @classmethod
+    def build(cls, today=None, days=None):
+        """Build the table from settings and the holiday and override rows"""
+        tz = get_time_zone()
+        today = today or timezone.now().astimezone(tz).date()
+        first_day = today - timedelta(days=1)
+        last_day = today + timedelta(days=days if days is not None else get_calendar_days())
+
+        holidays = set(
+            BiddingHoliday.objects.filter(date__range=(first_day, last_day)).values_list('date', flat=True)
+        )
+        overrides = {}
+        for override in BiddingWindowOverride.objects.filter(date__range=(first_day, last_day)):
+            overrides.setdefault(override.date, []).append((override.name, override.start, override.end))
+
+        return cls(first_day, last_day, tz, get_default_windows(), holidays, overrides)
+
+    def covers(self, day):
+        """Whether ``day`` and the one after it fall inside the precomputed range"""
+        return self.first_day <= day and day + timedelta(days=1) <= self.last_day
+
+    def local_date(self, now):
+        return now.astimezone(self.tz).date()
+
+    def windows_on(self, day):
+        return self._days.get(day, ())
+
+    def current_window(self, now=None):
+        """The window open at ``now``, or None"""
+        now = now or timezone.now()
+        for window in self.windows_on(self.local_date(now)):
+            if window.start <= now <= window.end:
+                return window
+        return None
+
+    def current_window_id(self, now=None):
+        window = self.current_window(now)
+        return window.id if window else None
+
+    def is_open(self, now=None):
+        return self.current_window(now) is not None
+
+    def next_window(self, now=None):
+        """The first window starting after ``now``, or None past the end of the table"""
+        now = now or timezone.now()
+        day = self.local_date(now)
+        for window in self.windows_on(day):
+            if window.start > now:
+                return window
+        return self._first_from.get(day + timedelta(days=1))
+
+    def window_for(self, moment):
+        """The window open at ``moment`` or else the next one, i.e. the one that settles it"""
+        return self.current_window(moment) or self.next_window(moment)
+
+    def upcoming(self, now=None, days=None):
+        """Windows that have not ended yet, over the next ``days`` days"""
+        now = now or timezone.now()
+        day = self.local_date(now)
+        last_day = min(self.last_day, day + timedelta(days=days if days is not None else get_calendar_days()))
+        windows = []
+        while day <= last_day:
+            windows.extend(window for window in self.windows_on(day) if window.end >= now)
+            day += timedelta(days=1)
+        return windows
+
+
+def get_calendar(now=None):
+    """The shared calendar, rebuilt when stale or no longer covering today"""
+    now = now or timezone.now()
+    calendar = _memo['calendar']
+    if calendar is not None and _memo['expires'] > monotonic():
+        if calendar.covers(calendar.local_date(now)):
+            return calendar
+
+    today = now.astimezone(get_time_zone()).date()
+    calendar = get_or_set(
+        versioned_key(CACHE_KEY.format(day=today.isoformat()), *CALENDAR_MODELS),
+        lambda: BiddingCalendar.build(today),
+        get_cache_timeout()
+    )
+
+    _memo['calendar'] = calendar
+    _memo['expires'] = monotonic() + get_cache_timeout()
+    return calendar
+
+
+def invalidate_calendar():
+    bump_model_version(*CALENDAR_MODELS)
+    _memo['calendar'] = None
+    _memo['expires'] = 0.0
+
+
+def serialize_window(window):
+    if window is None:
+        return None
+    return {
+        'id': window.id,
+        'name': window.name,
+        'start': window.start.isoformat(),
+        'end': window.end.isoformat(),
+    }
+
+
+def render_bidding_windows(now=None):
+    """
+    The ``/api/bidding-windows/`` payload at ``now`` and the moment it stops
+    being valid (the current window's end or the next window's start).
+
+    The payload only changes when a window opens or closes, so it is cached
+    per calendar build, local day and (current, next) window pair; the
+    warm-up renders the next window's payload ahead of time.
+    """
+    now = now or timezone.now()
+    calendar = get_calendar(now)
+    current = calendar.current_window(now)
+    next_window = calendar.next_window(now)
+    valid_until = current.end if current else next_window.start if next_window else None
+
+    key = PAYLOAD_CACHE_KEY.format(
+        version=calendar.version,
+        day=calendar.local_date(now).isoformat(),
+        current=current.id if current else '-',
+        next=next_window.id if next_window else '-'
+    )
+    timeout = get_cache_timeout()
+    if valid_until is not None:
+        timeout = max(int((valid_until - timezone.now()).total_seconds()), 1)
+    payload = get_or_set(key, lambda: {
+        'time_zone': str(calendar.tz),
+        'is_open': current is not None,
+        'current_window': serialize_window(current),
+        'next_window': serialize_window(next_window),
+        'windows': [serialize_window(window) for window in calendar.upcoming(now)],
+    }, timeout)
+    return payload, valid_until
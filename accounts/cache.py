@@ -0,0 +1,334 @@
+"""
+Cache subsystem.
+
+The ``default`` cache is a ``FallbackCache``: it forwards every call to the
+``redis`` alias and, for ``RETRY_AFTER`` seconds after Redis fails to
+answer, to the per-process ``local`` alias. Entries written or deleted
+during an outage only reach the local cache, so after Redis comes back it
+can serve values that were invalidated meanwhile until they time out.
+
+``get_or_set`` is the read-through helper the cached payloads go through,
+and ``aget_or_set`` its counterpart for coroutine builders.
+Values are stored with how long they took to compute and when they expire,
+which protects them against stampedes:
+
+* a hot key is recomputed early by one reader, chosen at random with a
+  probability that grows as the expiry approaches and with the cost of the
+  computation (XFetch, ``CACHE_EARLY_EXPIRY_BETA``);
+* a missing key is computed by the reader that takes its lock; the others
+  wait for the value, for up to ``CACHE_LOCK_TIMEOUT`` seconds.
+
+``versioned_key`` appends the current version of some models to a key, and
+``bump_model_version`` moves it on. ``track_model_versions`` bumps the
+version after every committed save or delete, so cached values derived from
+a model are replaced on the next read. ``QuerySet.update`` and bulk writes
+send no signals; values derived from them are only as fresh as their
+timeout.
+
+``LRUCache`` is a small in-process cache for hot lookups that must not
+cost a round trip to Redis.
+
+Lookups, computations and fallbacks are counted in ``accounts.metrics``.
+"""
+import asyncio
+import logging
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Iterable, Optional, Type, TypeVar
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import transaction
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from accounts.metrics import cache_build_duration_seconds, cache_fallback_total, cache_requests_total
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+VERSION_KEY = 'cache-version:{label}'
+LOCK_KEY = '{key}:lock'
+LOCK_POLL_INTERVAL = 0.05
+
+
+class FallbackCache(BaseCache):
+    """Cache backend forwarding to a primary alias, or a fallback one while it is down"""
+
+    UNAVAILABLE = (RedisConnectionError, RedisTimeoutError, ConnectionError, TimeoutError)
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.primary = options.get('PRIMARY', 'redis')
+        self.fallback = options.get('FALLBACK', 'local')
+        self.retry_after = options.get('RETRY_AFTER', 30)
+        self._down_until = 0.0
+
+    def _call(self, method, *args, **kwargs):
+        if time.monotonic() >= self._down_until:
+            try:
+                return getattr(caches[self.primary], method)(*args, **kwargs)
+            except self.UNAVAILABLE as e:
+                self._down_until = time.monotonic() + self.retry_after
+                logger.warning(
+                    f"Cache '{self.primary}' unavailable, using '{self.fallback}' "
+                    f"for {self.retry_after}s: {str(e)}"
+                )
+        cache_fallback_total.inc(alias=self.fallback)
+        return getattr(caches[self.fallback], method)(*args, **kwargs)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call('add', key, value, timeout, version=version)
+
+    def get(self, key, default=None, version=None):
+        return self._call('get', key, default, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call('set', key, value, timeout, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call('touch', key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        return self._call('delete', key, version=version)
+
+    def get_many(self, keys, version=None):
+        return self._call('get_many', keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self._call('has_key', key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        return self._call('incr', key, delta, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call('set_many', data, timeout, version=version)
+
+    def delete_many(self, keys, version=None):
+        return self._call('delete_many', keys, version=version)
+
+    def clear(self):
+        return self._call('clear')
+
+    def close(self, **kwargs):
+        for alias in (self.primary, self.fallback):
+            caches[alias].close(**kwargs)
+
+
+class LRUCache:
+    """Thread-safe least-recently-used mapping with per-entry timeouts"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """``(found, value)`` for ``key``"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def get_early_expiry_beta() -> float:
+    return getattr(settings, 'CACHE_EARLY_EXPIRY_BETA', 1.0)
+
+
+def get_lock_timeout() -> int:
+    return getattr(settings, 'CACHE_LOCK_TIMEOUT', 10)
+
+
+def key_namespace(key: str) -> str:
+    return key.split(':', 1)[0].split('@', 1)[0]
+
+
+def set_value(key: str, value: T, timeout: Optional[int], delta: float = 0.0) -> T:
+    """Store ``value`` as ``get_or_set`` does, ``delta`` being the seconds it took to compute"""
+    expires = time.time() + timeout if timeout is not None else None
+    cache.set(key, (value, delta, expires), timeout)
+    return value
+
+
+def get_value(key: str, default=None):
+    """The value stored under ``key`` by ``set_value`` or ``get_or_set``"""
+    entry = cache.get(key)
+    return entry[0] if entry is not None else default
+
+
+def compute(key: str, builder: Callable[[], T], timeout: Optional[int]) -> T:
+    """Call ``builder`` and store its result under ``key``"""
+    start = time.perf_counter()
+    value = builder()
+    delta = time.perf_counter() - start
+    cache_build_duration_seconds.observe(delta, namespace=key_namespace(key))
+    return set_value(key, value, timeout, delta)
+
+
+def _is_fresh(entry, beta):
+    _, delta, expires = entry
+    if expires is None or beta <= 0:
+        return True
+    # XFetch: -log(U) is exponentially distributed, so the chance of an early
+    # recompute rises steeply in the last few multiples of ``delta``
+    return time.time() - delta * beta * math.log(1.0 - random.random()) < expires
+
+
+def get_or_set(key: str, builder: Callable[[], T], timeout: Optional[int], beta: Optional[float] = None) -> T:
+    """
+    The value cached under ``key``, computed with ``builder`` and stored for
+    ``timeout`` seconds when missing or picked for an early recompute.
+    """
+    namespace = key_namespace(key)
+    beta = get_early_expiry_beta() if beta is None else beta
+    entry = cache.get(key)
+    if entry is not None:
+        if _is_fresh(entry, beta):
+            cache_requests_total.inc(namespace=namespace, result='hit')
+            return entry[0]
+        cache_requests_total.inc(namespace=namespace, result='early')
+        return compute(key, builder, timeout)
+
+    lock_key = LOCK_KEY.format(key=key)
+    lock_timeout = get_lock_timeout()
+    if cache.add(lock_key, 1, lock_timeout):
+        cache_requests_total.inc(namespace=namespace, result='miss')
+        try:
+            return compute(key, builder, timeout)
+        finally:
+            cache.delete(lock_key)
+
+    # Another reader is computing the value
+    cache_requests_total.inc(namespace=namespace, result='wait')
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    logger.warning(f"Timed out waiting for cache key {key}, computing it")
+    return compute(key, builder, timeout)
+
+
+async def acompute(key: str, builder: Callable[[], Awaitable[T]], timeout: Optional[int]) -> T:
+    """Async ``compute`` for a coroutine ``builder``"""
+    start = time.perf_counter()
+    value = await builder()
+    delta = time.perf_counter() - start
+    cache_build_duration_seconds.observe(delta, namespace=key_namespace(key))
+    expires = time.time() + timeout if timeout is not None else None
+    await cache.aset(key, (value, delta, expires), timeout)
+    return value
+
+
+async def aget_or_set(key: str, builder: Callable[[], Awaitable[T]], timeout: Optional[int],
+                      beta: Optional[float] = None) -> T:
+    """Async ``get_or_set`` for a coroutine ``builder``, waiting without blocking the event loop"""
+    namespace = key_namespace(key)
+    beta = get_early_expiry_beta() if beta is None else beta
+    entry = await cache.aget(key)
+    if entry is not None:
+        if _is_fresh(entry, beta):
+            cache_requests_total.inc(namespace=namespace, result='hit')
+            return entry[0]
+        cache_requests_total.inc(namespace=namespace, result='early')
+        return await acompute(key, builder, timeout)
+
+    lock_key = LOCK_KEY.format(key=key)
+    lock_timeout = get_lock_timeout()
+    if await cache.aadd(lock_key, 1, lock_timeout):
+        cache_requests_total.inc(namespace=namespace, result='miss')
+        try:
+            return await acompute(key, builder, timeout)
+        finally:
+            await cache.adelete(lock_key)
+
+    cache_requests_total.inc(namespace=namespace, result='wait')
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        entry = await cache.aget(key)
+        if entry is not None:
+            return entry[0]
+    logger.warning(f"Timed out waiting for cache key {key}, computing it")
+    return await acompute(key, builder, timeout)
+
+
+def _version_key(model):
+    # Proxy models share their concrete model's version
+    return VERSION_KEY.format(label=model._meta.concrete_model._meta.label_lower)
+
+
+def model_versions(models: Iterable[Type[Model]]) -> list:
+    """Current cache versions of ``models``"""
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Start from the clock rather than zero, so an evicted version
+            # never brings keys from before the eviction back
+            cache.add(key, time.time_ns() // 1000, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def versioned_key(key: str, *models: Type[Model]) -> str:
+    """``key`` tagged with the current versions of ``models``"""
+    return f"{key}@{'.'.join(str(version) for version in model_versions(models))}"
+
+
+def bump_model_version(*models: Type[Model]) -> None:
+    """Move the versions of ``models`` on, orphaning keys built from the old ones"""
+    for model in models:
+        key = _version_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns() // 1000, None)
+
+
+def _model_changed(sender, **kwargs):
+    transaction.on_commit(lambda: bump_model_version(sender))
+
+
+def track_model_versions(*models: Type[Model]) -> None:
+    """Bump the versions of ``models`` after every committed save or delete"""
+    for model in models:
+        proxies = [
+            proxy for proxy in apps.get_models()
+            if proxy._meta.proxy and proxy._meta.concrete_model is model
+        ]
+        for sender in (model, *proxies):
+            uid = f'cache-version:{sender._meta.label_lower}'
+            post_save.connect(_model_changed, sender=sender, dispatch_uid=uid)
+            post_delete.connect(_model_changed, sender=sender, dispatch_uid=uid)
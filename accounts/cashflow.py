@@ -0,0 +1,117 @@
+"""
+Projected maturity cash flow per bidding window.
+
+Investments that mature are queued and paid out by new investors in the
+next bidding window, so the liquidity needed in a window is the sum of the
+``return_amount`` of investments maturing since the previous one. The
+projection is a single grouped query over the indexed ``maturity_date``
+that assigns every row to its (local day, window) bucket in SQL; the
+buckets are then mapped onto the ``BiddingCalendar``.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from accounts.bidding import BiddingCalendar, get_calendar, get_default_windows
+from accounts.cache import get_or_set
+from accounts.models import Investment
+from accounts.pricing import from_cents, to_cents
+
+CACHE_KEY = 'cashflow-projection:{horizon}'
+
+
+def get_default_horizon():
+    return getattr(settings, 'CASHFLOW_PROJECTION_HORIZON_DAYS', 7)
+
+
+def get_max_horizon():
+    return getattr(settings, 'CASHFLOW_PROJECTION_MAX_HORIZON_DAYS', 90)
+
+
+def maturing_investments(start, end):
+    """Investments still running that mature in ``(start, end]``"""
+    return Investment.objects.filter(
+        maturity_date__gt=start,
+        maturity_date__lte=end
+    ).exclude(status__in=['matured', 'completed'])
+
+
+def _window_slot(windows):
+    """
+    Index into the default ``windows`` of the last window closing at or after
+    the row's local time of day; ``len(windows)`` means after the last one.
+    """
+    return Case(
+        *[
+            When(maturity_date__time__lte=end, then=Value(index))
+            for index, (name, start, end) in enumerate(windows)
+        ],
+        default=Value(len(windows)),
+        output_field=IntegerField()
+    )
+
+
+def project_cashflow(horizon_days, now=None, calendar=None):
+    """
+    Return amounts maturing in each bidding window over the next ``horizon_days``.
+
+    Rows are grouped in SQL by local day and default-window slot; each group
+    is then settled in the calendar window open at, or following, the latest
+    moment of its slot, so holidays and overrides move it to the right window.
+    """
+    now = now or timezone.now()
+    calendar = calendar or get_calendar(now)
+    last_day = calendar.local_date(now + timedelta(days=horizon_days))
+    if not calendar.covers(last_day):
+        calendar = BiddingCalendar.build(calendar.local_date(now), days=horizon_days + 1)
+
+    windows = get_default_windows()
+    with timezone.override(calendar.tz):
+        rows = list(maturing_investments(now, now + timedelta(days=horizon_days)).annotate(
+            day=TruncDate('maturity_date', tzinfo=calendar.tz),
+            slot=_window_slot(windows)
+        ).values('day', 'slot').annotate(
+            amount=Sum('return_amount'),
+            investments=Count('id')
+        ).order_by('day', 'slot'))
+
+    buckets = {}
+    for row in rows:
+        if row['slot'] < len(windows):
+            latest = datetime.combine(row['day'], windows[row['slot']][2], tzinfo=calendar.tz)
+        else:
+            latest = datetime.combine(row['day'], time.max, tzinfo=calendar.tz)
+        bucket = buckets.setdefault(calendar.window_for(latest), {'cents': 0, 'investments': 0})
+        bucket['cents'] += to_cents(row['amount'] or 0)
+        bucket['investments'] += row['investments']
+
+    # Maturities after the last window the calendar knows of, e.g. behind holidays
+    unscheduled = buckets.pop(None, {'cents': 0})
+
+    return {
+        'generated_at': now.isoformat(),
+        'horizon_days': horizon_days,
+        'total_amount': str(from_cents(
+            sum(bucket['cents'] for bucket in buckets.values()) + unscheduled['cents']
+        )),
+        'unscheduled_amount': str(from_cents(unscheduled['cents'])),
+        'windows': [
+            {
+                'window_id': window.id,
+                'window_start': window.start.isoformat(),
+                'window_end': window.end.isoformat(),
+                'investments': bucket['investments'],
+                'amount': str(from_cents(bucket['cents'])),
+            }
+            for window, bucket in sorted(buckets.items(), key=lambda item: item[0].start)
+        ],
+    }
+
+
+def get_cashflow_projection(horizon_days):
+    """Cached ``project_cashflow`` for the given horizon"""
+    timeout = getattr(settings, 'CASHFLOW_PROJECTION_CACHE_TIMEOUT', 300)
+    return get_or_set(CACHE_KEY.format(horizon=horizon_days), lambda: project_cashflow(horizon_days), timeout)
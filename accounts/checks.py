@@ -0,0 +1,35 @@
+"""
+System checks for deployment sizing.
+"""
+from django.conf import settings
+from django.core.checks import Warning, register
+
+from referral_system.celery import WORKER_POOLS
+
+
+def connection_budget():
+    """
+    Persistent connections one node holds per database alias: one per
+    gunicorn thread and one per Celery pool process, plus beat and the
+    investment order writer.
+    """
+    web = getattr(settings, 'WEB_CONCURRENCY', 1) * getattr(settings, 'WEB_THREADS', 1)
+    workers = sum(pool['concurrency'] for pool in WORKER_POOLS.values())
+    return web + workers + 2
+
+
+@register()
+def check_connection_budget(app_configs, **kwargs):
+    max_connections = getattr(settings, 'DATABASE_MAX_CONNECTIONS', None)
+    if not max_connections:
+        return []
+    budget = connection_budget()
+    if budget <= max_connections:
+        return []
+    return [Warning(
+        f'Gunicorn threads and Celery pools hold up to {budget} database connections, '
+        f'more than DATABASE_MAX_CONNECTIONS ({max_connections}).',
+        hint='Lower WEB_CONCURRENCY, WEB_THREADS or the WORKER_POOLS concurrency, '
+             'or put PgBouncer in transaction mode in front of the database.',
+        id='accounts.W001',
+    )]
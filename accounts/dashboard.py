@@ -0,0 +1,337 @@
+"""
+Per-user dashboard data.
+
+The ``/api/user-dashboard/`` payload is cached per user for
+``DASHBOARD_CACHE_TIMEOUT`` seconds. Saves that change what a dashboard
+shows drop the affected users' entries (see ``accounts.signals``), and the
+pre-window warm-up fills the cache for recently active users before the
+bidding peak.
+
+The admin ``/api/system-overview/`` payload is cached for
+``SYSTEM_OVERVIEW_CACHE_TIMEOUT`` seconds under a key versioned by
+``OVERVIEW_MODELS``.
+
+Both are built from the primary even when the view reads from the replica
+(``accounts.routers``), so a value cached right after an invalidation
+already includes the write that caused it.
+
+Both payloads are assembled from a handful of independent queries, the
+per-status figures coming from conditional aggregates and grouped rows.
+Completed investments moved to ``ArchivedInvestment`` (``accounts.archive``)
+are added to the completed figures.
+``build_*`` runs them one after another; the ``abuild_*`` versions used by
+the async views (``accounts.async_views``) run them with ``asyncio.gather``.
+"""
+import asyncio
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Exists, OuterRef, Q, Sum
+from django.utils import timezone
+
+from accounts.cache import aget_or_set, compute, get_or_set, versioned_key
+from accounts.ledger import aget_balance, get_balance
+from accounts.models import ArchivedInvestment, Investment, Payment, Queue, ReferralHistory, User
+from accounts.routers import read_from_primary
+
+CACHE_KEY = 'user-dashboard:{user_id}'
+OVERVIEW_CACHE_KEY = 'system-overview'
+
+# Models the system overview is computed from; saving any of them moves the
+# overview's cache key on (see accounts.signals)
+OVERVIEW_MODELS = (User, Investment, ArchivedInvestment, Payment, Queue)
+
+STATUSES = ['pending', 'matured', 'paired', 'completed']
+
+
+def get_cache_timeout():
+    return getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+
+def get_overview_cache_timeout():
+    return getattr(settings, 'SYSTEM_OVERVIEW_CACHE_TIMEOUT', 60)
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+def investment_totals():
+    """A user's investment figures as conditional aggregates over one scan"""
+    totals = {
+        'total_returns': Sum('return_amount', filter=Q(status='completed')),
+        'due_earnings': Sum('return_amount', filter=Q(status='matured')),
+        'active_investments': Count('id', filter=Q(status__in=['pending', 'paired'])),
+    }
+    totals.update({status: Count('id', filter=Q(status=status)) for status in STATUSES})
+    return totals
+
+
+def archived_totals():
+    """A user's archived investments, all completed"""
+    return {'total_returns': Sum('return_amount'), 'completed': Count('id')}
+
+
+def dashboard_querysets(user):
+    investments = Investment.objects.filter(user=user)
+    recent_investments = investments.order_by('-created_at')[:5].values(
+        'id', 'amount', 'status', 'created_at', 'return_amount',
+        'paired_to__username', 'payment_confirmed_at'
+    )
+    # Pending payments to the user, for the sell shares section
+    payments = Payment.objects.filter(
+        to_user=user,
+        status='pending'
+    ).values(
+        'id',
+        'amount',
+        'created_at',
+        'status',
+        'from_user__username',
+        'from_user__phone_number'
+    ).order_by('-created_at')
+    referrals = ReferralHistory.objects.filter(referrer=user).values(
+        'referred__username',
+        'referred__phone_number',
+        'status',
+        'bonus_earned'
+    )
+    archived = ArchivedInvestment.objects.filter(user=user)
+    return investments, archived, recent_investments, payments, referrals
+
+
+def assemble_dashboard(totals, archived, balance, recent_investments, payments, referrals):
+    totals['total_returns'] = (totals['total_returns'] or 0) + (archived['total_returns'] or 0)
+    totals['completed'] += archived['completed']
+    return {
+        'statistics': {
+            'total_returns': float(totals['total_returns']),
+            'total_referral_earnings': float(balance),
+            'due_earnings': float(totals['due_earnings'] or 0),
+            'active_investments': totals['active_investments'],
+            'pending_payments': len(payments)
+        },
+        'investments': {
+            'recent': recent_investments,
+            'by_status': {status: totals[status] for status in ['completed', 'pending', 'paired', 'matured']}
+        },
+        'payments': payments,
+        'referral': {
+            'total_referrals': len(referrals),
+            'referrals': referrals
+        }
+    }
+
+
+def build_user_dashboard(user):
+    """Compute the dashboard payload for ``user``"""
+    investments, archived, recent_investments, payments, referrals = dashboard_querysets(user)
+    return assemble_dashboard(
+        investments.aggregate(**investment_totals()),
+        archived.aggregate(**archived_totals()),
+        get_balance(user),
+        list(recent_investments),
+        list(payments),
+        list(referrals)
+    )
+
+
+async def abuild_user_dashboard(user):
+    """``build_user_dashboard`` with its queries run concurrently"""
+    investments, archived, recent_investments, payments, referrals = dashboard_querysets(user)
+    return assemble_dashboard(*await asyncio.gather(
+        investments.aaggregate(**investment_totals()),
+        archived.aaggregate(**archived_totals()),
+        aget_balance(user),
+        _alist(recent_investments),
+        _alist(payments),
+        _alist(referrals)
+    ))
+
+
+def get_user_dashboard(user):
+    """Cached ``build_user_dashboard``"""
+    with read_from_primary():
+        return get_or_set(
+            CACHE_KEY.format(user_id=user.pk), lambda: build_user_dashboard(user), get_cache_timeout()
+        )
+
+
+async def aget_user_dashboard(user):
+    """Cached ``abuild_user_dashboard``"""
+    with read_from_primary():
+        return await aget_or_set(
+            CACHE_KEY.format(user_id=user.pk), lambda: abuild_user_dashboard(user), get_cache_timeout()
+        )
+
+
+def prime_user_dashboard(user):
+    return compute(
+        CACHE_KEY.format(user_id=user.pk), lambda: build_user_dashboard(user), get_cache_timeout()
+    )
+
+
+def overview_querysets():
+    stats = {'count': Count('id'), 'total': Sum('amount')}
+    return {
+        'total_users': User.objects.all(),
+        'status_counts': Investment.objects.values('status').annotate(
+            count=Count('id'),
+            total_amount=Sum('amount'),
+            avg_amount=Avg('amount')
+        ),
+        'users': User.objects.filter(
+            Exists(Investment.objects.filter(user=OuterRef('pk')))
+            | Exists(ArchivedInvestment.objects.filter(user=OuterRef('pk')))
+        ).values('id', 'username', 'phone_number').order_by('pk'),
+        'user_investments': Investment.objects.values('user', 'status').annotate(**stats).order_by(),
+        'archived_investments': ArchivedInvestment.objects.values('user').annotate(**stats).order_by(),
+        'payments_made': Payment.objects.values('from_user').annotate(**stats).order_by(),
+        'payments_received': Payment.objects.values('to_user').annotate(**stats).order_by(),
+    }
+
+
+def payment_totals():
+    return {'total_count': Count('id'), 'total_amount': Sum('amount'), 'avg_amount': Avg('amount')}
+
+
+def queue_totals():
+    return {
+        'total_count': Count('id'),
+        'total_amount': Sum('amount_remaining'),
+        'avg_amount': Avg('amount_remaining')
+    }
+
+
+def _add_completed(by_status, count, total):
+    """Add archived investments to the completed entry of a ``{status: {count, total}}`` mapping"""
+    row = by_status.setdefault('completed', {'count': 0, 'total': 0})
+    row['count'] += count
+    row['total'] = (row['total'] or 0) + (total or 0)
+
+
+def assemble_overview(total_users, status_counts, payment_stats, queue_stats, users,
+                      user_investments, archived_investments, payments_made, payments_received):
+    investments = {}
+    for row in user_investments:
+        investments.setdefault(row['user'], {})[row['status']] = dict(row)
+    for row in archived_investments:
+        _add_completed(investments.setdefault(row['user'], {}), row['count'], row['total'])
+    archived_count = sum(row['count'] for row in archived_investments)
+    if archived_count:
+        completed = next((row for row in status_counts if row['status'] == 'completed'), None)
+        if completed is None:
+            completed = {'status': 'completed', 'count': 0, 'total_amount': 0}
+            status_counts.append(completed)
+        completed['count'] += archived_count
+        completed['total_amount'] = (completed['total_amount'] or 0) + sum(row['total'] for row in archived_investments)
+        completed['avg_amount'] = completed['total_amount'] / completed['count']
+    made = {row['from_user']: row for row in payments_made}
+    received = {row['to_user']: row for row in payments_received}
+
+    user_details = []
+    for user in users:
+        by_status = investments[user['id']]
+        user_data = {
+            'username': user['username'],
+            'phone_number': user['phone_number'],
+            'total_investments': sum(row['count'] for row in by_status.values()),
+            'investments_by_status': {
+                status: {'count': by_status[status]['count'], 'total': float(by_status[status]['total'])}
+                for status in STATUSES if status in by_status
+            },
+            'payments': {
+                'made': {'count': 0, 'total': 0},
+                'received': {'count': 0, 'total': 0}
+            }
+        }
+        for direction, rows in (('made', made), ('received', received)):
+            row = rows.get(user['id'])
+            if row:
+                user_data['payments'][direction] = {'count': row['count'], 'total': float(row['total'])}
+        user_details.append(user_data)
+
+    return {
+        'user_statistics': {
+            'total_users': total_users
+        },
+        'investment_statistics': {
+            'total_investments': sum(row['count'] for row in status_counts),
+            'status_breakdown': status_counts
+        },
+        'payment_statistics': {
+            'total_payments': payment_stats['total_count'],
+            'total_amount': float(payment_stats['total_amount'] or 0),
+            'average_amount': float(payment_stats['avg_amount'] or 0)
+        },
+        'queue_statistics': {
+            'total_entries': queue_stats['total_count'],
+            'total_amount': float(queue_stats['total_amount'] or 0),
+            'average_amount': float(queue_stats['avg_amount'] or 0)
+        },
+        'user_details': user_details
+    }
+
+
+def build_system_overview():
+    """Compute the system overview payload"""
+    querysets = overview_querysets()
+    return assemble_overview(
+        querysets['total_users'].count(),
+        list(querysets['status_counts']),
+        Payment.objects.aggregate(**payment_totals()),
+        Queue.objects.aggregate(**queue_totals()),
+        list(querysets['users']),
+        list(querysets['user_investments']),
+        list(querysets['archived_investments']),
+        list(querysets['payments_made']),
+        list(querysets['payments_received'])
+    )
+
+
+async def abuild_system_overview():
+    """``build_system_overview`` with its queries run concurrently"""
+    querysets = overview_querysets()
+    return assemble_overview(*await asyncio.gather(
+        querysets['total_users'].acount(),
+        _alist(querysets['status_counts']),
+        Payment.objects.aaggregate(**payment_totals()),
+        Queue.objects.aaggregate(**queue_totals()),
+        _alist(querysets['users']),
+        _alist(querysets['user_investments']),
+        _alist(querysets['archived_investments']),
+        _alist(querysets['payments_made']),
+        _alist(querysets['payments_received'])
+    ))
+
+
+def get_system_overview():
+    """Cached ``build_system_overview``"""
+    with read_from_primary():
+        return get_or_set(
+            versioned_key(OVERVIEW_CACHE_KEY, *OVERVIEW_MODELS), build_system_overview, get_overview_cache_timeout()
+        )
+
+
+async def aget_system_overview():
+    """Cached ``abuild_system_overview``"""
+    key = await asyncio.to_thread(versioned_key, OVERVIEW_CACHE_KEY, *OVERVIEW_MODELS)
+    with read_from_primary():
+        return await aget_or_set(key, abuild_system_overview, get_overview_cache_timeout())
+
+
+def invalidate_user_dashboards(user_ids):
+    keys = [CACHE_KEY.format(user_id=user_id) for user_id in set(user_ids) if user_id is not None]
+    if keys:
+        cache.delete_many(keys)
+
+
+def active_users(days, limit=None):
+    """Users who logged in or invested in the last ``days`` days"""
+    since = timezone.now() - timedelta(days=days)
+    users = User.objects.filter(
+        Q(last_login__gte=since) | Q(investments__created_at__gte=since),
+        is_active=True
+    ).distinct().order_by('pk')
+    return users[:limit] if limit else users
@@ -0,0 +1,276 @@
+"""
+Per-user event stream.
+
+Dashboards listen on ``/api/events/`` (``accounts.async_views.events``)
+instead of polling ``/api/user-dashboard/``. Pairing, maturity, payment and
+referral changes ``publish`` a small delta to each user they concern once
+their transaction commits:
+
+* ``investment``: ``{id, status}`` when one of the user's investments is
+  saved, e.g. when it matures;
+* ``paired``: ``{investment_id, amount}`` for each new pairing, on both sides;
+* ``pairing_failed``: ``{pairing_id}`` when an overdue pairing is failed;
+* ``payment``: ``{id, status, amount}`` for payments to or from the user;
+* ``referral``: ``{id, bonus_earned}`` when the user earns a referral bonus;
+* ``resync``: the stream may have missed events, refetch the dashboard.
+
+With ``EVENTS_BROKER = 'redis'`` events go through Redis pub/sub on
+``EVENTS_REDIS_URL``, so those published by Celery workers reach every ASGI
+process. Each process holds a single pattern subscription and fans the
+messages out to its own streams. For ``EVENTS_RETRY_AFTER`` seconds after
+Redis fails, events are only delivered in the process publishing them, and
+streams are sent a ``resync`` once the subscription is back.
+``EVENTS_BROKER = 'local'`` keeps everything in process, for a single server
+process and for tests.
+
+A stream that falls ``EVENTS_QUEUE_SIZE`` events behind has its backlog
+replaced by a ``resync``.
+
+Browsers' ``EventSource`` cannot set headers, and an access token in the URL
+would end up in proxy and server logs. Clients instead ``POST`` to
+``/api/events/ticket/`` for a ticket, kept in the default cache for
+``EVENTS_TICKET_TIMEOUT`` seconds, and open the stream with it. A ticket
+opens one stream only.
+"""
+import asyncio
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import defaultdict
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from redis.exceptions import RedisError
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'user-events:{user_id}'
+CHANNEL_PATTERN = 'user-events:*'
+RESYNC = {'event': 'resync', 'data': {}}
+TICKET_KEY = 'events-ticket:{ticket}'
+
+_brokers = {}
+_brokers_lock = threading.Lock()
+
+
+def get_broker_name():
+    return getattr(settings, 'EVENTS_BROKER', 'redis')
+
+
+def get_redis_url():
+    return getattr(settings, 'EVENTS_REDIS_URL', 'redis://localhost:6379/0')
+
+
+def get_retry_after():
+    return getattr(settings, 'EVENTS_RETRY_AFTER', 30)
+
+
+def get_queue_size():
+    return getattr(settings, 'EVENTS_QUEUE_SIZE', 100)
+
+
+def get_ticket_timeout():
+    return getattr(settings, 'EVENTS_TICKET_TIMEOUT', 30)
+
+
+def encode(data):
+    return json.dumps(data, cls=JSONEncoder)
+
+
+class Subscription:
+    """
+    One stream's queue of ``user_id``'s messages, fed from any thread while
+    the subscription is entered
+    """
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = str(user_id)
+        self.loop = None
+        self.queue = None
+
+    async def __aenter__(self):
+        self.broker.start()
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(get_queue_size())
+        self.broker.add(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broker.remove(self)
+
+    def _offer(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too far behind to apply deltas, the client has to refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    def deliver(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self._offer, message)
+        except RuntimeError:
+            # The stream's event loop is closed
+            pass
+
+    async def get(self, timeout):
+        """The next message, or None after ``timeout`` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBroker:
+    """In-process pub/sub"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def deliver(self, user_id, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(str(user_id), ()))
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+    def deliver_all(self, message):
+        with self._lock:
+            subscriptions = [s for group in self._subscriptions.values() for s in group]
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+    def publish(self, events):
+        """Send ``(user_id, message)`` pairs"""
+        for user_id, message in events:
+            self.deliver(user_id, message)
+
+    def start(self):
+        """Hook run on the stream's event loop before it subscribes"""
+
+    def add(self, subscription):
+        with self._lock:
+            self._subscriptions[subscription.user_id].add(subscription)
+
+    def remove(self, subscription):
+        with self._lock:
+            group = self._subscriptions[subscription.user_id]
+            group.discard(subscription)
+            if not group:
+                del self._subscriptions[subscription.user_id]
+
+    def subscribe(self, user_id):
+        """A ``Subscription`` to ``user_id``'s events, to use with ``async with``"""
+        return Subscription(self, user_id)
+
+
+class RedisBroker(LocalBroker):
+    """Pub/sub through Redis, delivering in process while Redis is down"""
+
+    def __init__(self, url, retry_after):
+        super().__init__()
+        self.url = url
+        self.retry_after = retry_after
+        self._client = redis.Redis.from_url(url, socket_connect_timeout=1, socket_timeout=1)
+        self._down_until = 0.0
+        self._listener = None
+
+    def publish(self, events):
+        if time.monotonic() >= self._down_until:
+            try:
+                with self._client.pipeline(transaction=False) as pipe:
+                    for user_id, message in events:
+                        pipe.publish(CHANNEL.format(user_id=user_id), encode(message))
+                    pipe.execute()
+                return
+            except RedisError as e:
+                self._down_until = time.monotonic() + self.retry_after
+                logger.warning(
+                    f"Event broker unavailable, delivering events in process for {self.retry_after}s: {str(e)}"
+                )
+        super().publish(events)
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._listener is None or self._listener.done() or self._listener.get_loop() is not loop:
+                self._listener = loop.create_task(self._listen())
+
+    async def _listen(self):
+        """Fan the events published to Redis out to this process's streams"""
+        resync = False
+        while True:
+            client = aioredis.Redis.from_url(self.url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(CHANNEL_PATTERN)
+                    if resync:
+                        self.deliver_all(RESYNC)
+                        resync = False
+                    async for message in pubsub.listen():
+                        if message['type'] == 'pmessage':
+                            user_id = message['channel'].decode().split(':', 1)[1]
+                            self.deliver(user_id, json.loads(message['data']))
+            except RedisError as e:
+                logger.warning(f"Event subscription lost, retrying in {self.retry_after}s: {str(e)}")
+                resync = True
+                await asyncio.sleep(self.retry_after)
+            finally:
+                await client.aclose()
+
+
+def get_broker():
+    """This process's broker; forked workers start their own"""
+    key = (os.getpid(), get_broker_name(), get_redis_url())
+    with _brokers_lock:
+        broker = _brokers.get(key)
+        if broker is None:
+            if get_broker_name() == 'local':
+                broker = LocalBroker()
+            else:
+                broker = RedisBroker(get_redis_url(), get_retry_after())
+            _brokers[key] = broker
+        return broker
+
+
+def _send(events):
+    try:
+        get_broker().publish(events)
+    except Exception as e:
+        logger.error(f"Failed to publish {len(events)} events: {str(e)}")
+
+
+def publish(deltas):
+    """Send ``(user_id, event, data)`` deltas once the current transaction commits"""
+    events = [
+        (user_id, {'event': event, 'data': data})
+        for user_id, event, data in deltas if user_id is not None
+    ]
+    if events:
+        transaction.on_commit(lambda: _send(events))
+
+
+def issue_ticket(user_id):
+    """A short-lived ticket opening one of ``user_id``'s streams"""
+    ticket = secrets.token_urlsafe(32)
+    cache.set(TICKET_KEY.format(ticket=ticket), user_id, get_ticket_timeout())
+    return ticket
+
+
+async def aredeem_ticket(ticket):
+    """The user id ``ticket`` was issued to, or None; a ticket is only redeemed once"""
+    key = TICKET_KEY.format(ticket=ticket)
+    user_id = await cache.aget(key)
+    # Only the request that actually deletes the ticket may use it
+    if user_id is None or not await cache.adelete(key):
+        return None
+    return user_id
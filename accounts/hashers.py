@@ -0,0 +1,26 @@
+"""
+Password hashers.
+
+Argon2id is the preferred hasher (``PASSWORD_HASHERS``), with its costs
+taken from the ``ARGON2_*`` settings. A password stored with PBKDF2, or
+with other Argon2 costs, is rehashed the next time its user logs in (see
+``accounts.login``).
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Django's Argon2 hasher with configurable costs"""
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'ARGON2_TIME_COST', 2)
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'ARGON2_MEMORY_COST', 19456)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'ARGON2_PARALLELISM', 1)
@@ -0,0 +1,106 @@
+"""
+Referral bonus ledger.
+
+Referral bonus balances are kept as an append-only list of
+``ReferralLedgerEntry`` rows per user. Each entry is either a bonus credited
+for a referred investment or a redemption debited by an investment that
+used the bonus. Every entry records the balance after it, and the same
+balance is mirrored in ``User.referral_earnings`` in the same transaction:
+
+* a balance read is a single column of the user row;
+* a redemption is one insert;
+* a statement over a date range is an index range scan, with its opening
+  balance read from the entry just before the range.
+
+Nothing updates ``ReferralHistory`` rows any more. They only record which
+referred investment earned each bonus.
+"""
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from accounts.locks import write_transaction
+from accounts.models import ReferralLedgerEntry, User
+
+
+class InsufficientBalance(Exception):
+    pass
+
+
+def get_balance(user):
+    """The user's current referral bonus balance"""
+    return User.objects.values_list('referral_earnings', flat=True).get(pk=user.pk)
+
+
+async def aget_balance(user):
+    """Async ``get_balance``"""
+    return await User.objects.values_list('referral_earnings', flat=True).aget(pk=user.pk)
+
+
+def append_entry(user, kind, amount, balance=None, referral=None, investment=None, now=None):
+    """
+    Append a signed ``amount`` to ``user``'s ledger and return the entry.
+
+    Locks the user row unless the caller already holds it and passes the
+    current ``balance``.
+    """
+    with write_transaction():
+        if balance is None:
+            balance = User.objects.select_for_update().values_list(
+                'referral_earnings', flat=True
+            ).get(pk=user.pk)
+        new_balance = balance + amount
+        if new_balance < 0:
+            raise InsufficientBalance(f"Referral balance {balance} cannot cover {-amount}")
+
+        entry = ReferralLedgerEntry.objects.create(
+            user=user,
+            kind=kind,
+            amount=amount,
+            balance=new_balance,
+            referral=referral,
+            investment=investment,
+            created_at=now or timezone.now()
+        )
+        User.objects.filter(pk=user.pk).update(referral_earnings=new_balance)
+        user.referral_earnings = new_balance
+    return entry
+
+
+def credit_referral_bonus(history):
+    """Credit the bonus of a new ``ReferralHistory`` row to its referrer"""
+    return append_entry(history.referrer, 'bonus', history.bonus_earned, referral=history)
+
+
+def redeem(user, amount, investment, balance=None):
+    """Debit ``amount`` of bonus applied to ``investment``"""
+    return append_entry(user, 'redemption', -amount, balance=balance, investment=investment)
+
+
+def statement(user, start=None, end=None):
+    """
+    ``user``'s ledger between ``start`` (inclusive) and ``end`` (exclusive)
+    as ``(opening_balance, entries)``.
+    """
+    entries = ReferralLedgerEntry.objects.filter(user=user)
+    opening_balance = Decimal('0')
+    if start is not None:
+        previous = entries.filter(created_at__lt=start).order_by('-created_at', '-id').values_list(
+            'balance', flat=True
+        ).first()
+        opening_balance = previous if previous is not None else Decimal('0')
+        entries = entries.filter(created_at__gte=start)
+    if end is not None:
+        entries = entries.filter(created_at__lt=end)
+    return opening_balance, list(entries.select_related('referral__referred').order_by('created_at', 'id'))
+
+
+def total_redeemed(start=None, end=None):
+    """Bonus redeemed across all users, optionally within a time range"""
+    entries = ReferralLedgerEntry.objects.filter(kind='redemption')
+    if start is not None:
+        entries = entries.filter(created_at__gte=start)
+    if end is not None:
+        entries = entries.filter(created_at__lt=end)
+    return -(entries.aggregate(total=Sum('amount'))['total'] or Decimal('0'))
@@ -0,0 +1,117 @@
+"""
+Login pipeline.
+
+``UserLoginView`` is throttled per client IP and per phone number
+(``accounts.throttling``) before it reaches ``authenticate_credentials``. That
+function looks the user up and checks the password on a bounded hashing pool:
+
+* ``LOGIN_HASHING_WORKERS`` threads hash passwords. argon2-cffi releases
+  the GIL while it hashes, so threads run hashes in parallel;
+* at most ``LOGIN_HASHING_BACKLOG`` more checks wait for a thread. Beyond
+  that ``HashingPoolFull`` is raised at once, so a burst cannot queue up more
+  CPU work than the pool can do;
+* a password stored with an outdated hasher or cost is rehashed on the pool
+  and saved after a successful check.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+from accounts.models import User
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class HashingPoolFull(Exception):
+    pass
+
+
+def get_workers():
+    return getattr(settings, 'LOGIN_HASHING_WORKERS', 2)
+
+
+def get_backlog():
+    return getattr(settings, 'LOGIN_HASHING_BACKLOG', 32)
+
+
+def get_timeout():
+    return getattr(settings, 'LOGIN_HASHING_TIMEOUT', 10)
+
+
+class HashingPool:
+    """Thread pool that refuses work once ``workers + backlog`` jobs are in flight"""
+
+    def __init__(self, workers, backlog):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        self._slots = threading.BoundedSemaphore(workers + backlog)
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolFull('Too many password checks in flight')
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args):
+        return self.submit(fn, *args).result(get_timeout())
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def get_pool():
+    """This process's hashing pool; forked workers start their own"""
+    key = (os.getpid(), get_workers(), get_backlog())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = HashingPool(get_workers(), get_backlog())
+        return pool
+
+
+def verify_password(password, encoded):
+    """
+    Check ``password`` against ``encoded`` on the pool. Returns ``(valid,
+    rehashed)``, ``rehashed`` being the new hash when the stored one is
+    outdated.
+    """
+    rehashed = []
+    valid = check_password(password, encoded, setter=lambda raw: rehashed.append(make_password(raw)))
+    return valid, rehashed[0] if rehashed else None
+
+
+def _get_user(phone_number):
+    return User.objects.filter(phone_number=phone_number).first()
+
+
+def _finish(user, result):
+    valid, rehashed = result
+    if not valid or not user.is_active:
+        return None
+    if rehashed:
+        user.password = rehashed
+        user.save(update_fields=['password'])
+        logger.info(f"Rehashed password of user {user.pk}")
+    return user
+
+
+def authenticate_credentials(phone_number, password):
+    """The active user with these credentials, or None"""
+    user = _get_user(phone_number)
+    if user is None:
+        # Hash anyway, so unknown numbers take as long as wrong passwords
+        get_pool().run(make_password, password)
+        return None
+    return _finish(user, get_pool().run(verify_password, password, user.password))
+
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
+from accounts import pricing
 from accounts.models import User, Investment, ReferralHistory
 from datetime import timedelta
 import random
@@ -47,19 +48,16 @@ class Command(BaseCommand):
             
             # Create 2-4 investments per user
             num_investments = random.randint(2, 4)
-            for j in range(num_investments):
-                # Random amount between 100 and 10000
-                amount = random.randint(100, 10000)
-                # Random maturity period between 7 and 30 days
-                maturity_period = random.randint(7, 30)
-                
+            # Random amounts between 100 and 10000, maturity periods between 7 and 30 days
+            amounts = [random.randint(100, 10000) for _ in range(num_investments)]
+            maturity_periods = [random.randint(7, 30) for _ in range(num_investments)]
+            # Calculate return amounts (2% daily interest) for the whole batch
+            return_amounts = pricing.return_amounts(amounts, maturity_periods)
+            for amount, maturity_period, return_amount in zip(amounts, maturity_periods, return_amounts):
                 # Calculate created_at to have some matured and some immature investments
                 days_ago = random.randint(0, maturity_period + 5)
                 created_at = timezone.now() - timedelta(days=days_ago)
                 
-                # Calculate return amount (2% daily interest)
-                return_amount = amount * (1 + (0.02 * maturity_period))
-                
                 investment = Investment.objects.create(
                     user=user,
                     amount=amount,
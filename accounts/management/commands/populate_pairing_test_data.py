@@ -3,6 +3,7 @@ from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 from accounts.models import User, Investment, Queue, Payment
+from accounts.pricing import calculate_return_amount
 import random
 from django.db import models
 
@@ -57,12 +58,13 @@ class Command(BaseCommand):
             num_investments = random.randint(1, 3)
             for _ in range(num_investments):
                 amount = self.generate_investment_amount()
+                maturity_period = random.randint(1, 7)  # 1-7 days maturity
                 investment = Investment.objects.create(
                     user=user,
                     amount=amount,
-                    maturity_period=random.randint(1, 7),  # 1-7 days maturity
+                    maturity_period=maturity_period,
                     status='matured',
-                    return_amount=amount * Decimal('1.02')  # 2% return
+                    return_amount=calculate_return_amount(amount, maturity_period)  # 2% daily return
                 )
                 matured_investments.append(investment)
                 
@@ -82,12 +84,13 @@ class Command(BaseCommand):
             num_investments = random.randint(1, 2)
             for _ in range(num_investments):
                 amount = self.generate_investment_amount()
+                maturity_period = random.randint(1, 7)  # 1-7 days maturity
                 investment = Investment.objects.create(
                     user=user,
                     amount=amount,
-                    maturity_period=random.randint(1, 7),  # 1-7 days maturity
+                    maturity_period=maturity_period,
                     status='pending',
-                    return_amount=amount * Decimal('1.02')  # 2% return
+                    return_amount=calculate_return_amount(amount, maturity_period)  # 2% daily return
                 )
                 pending_investments.append(investment)
                 self.stdout.write(f'Created pending investment: {investment.id} for user {user.username}')
@@ -0,0 +1,32 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.admission import drain, get_intake, run_writer
+
+
+class Command(BaseCommand):
+    help = 'Place queued investment orders from the intake in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Apply what is queued and exit instead of waiting for new orders'
+        )
+
+    def handle(self, *args, **options):
+        intake = get_intake()
+        if intake is None:
+            raise CommandError('INVESTMENT_INTAKE_URL is not set; orders are placed as they arrive')
+        if options['once']:
+            count = drain(intake)
+            self.stdout.write(self.style.SUCCESS(f'Applied {count} investment orders'))
+            return
+
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+        self.stdout.write(f'Waiting for investment orders on {type(intake).__name__}')
+        run_writer(intake, stop=stop)
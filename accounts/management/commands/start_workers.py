@@ -0,0 +1,87 @@
+import os
+import signal
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from referral_system.celery import WORKER_POOLS
+
+
+class Command(BaseCommand):
+    help = 'Start one Celery worker per task queue with its own concurrency and prefetch settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queues',
+            nargs='+',
+            choices=sorted(WORKER_POOLS),
+            help='Only start workers for these queues (default: all)'
+        )
+        parser.add_argument(
+            '--pool',
+            default='prefork',
+            help='Celery execution pool, e.g. prefork, threads or solo (default: prefork)'
+        )
+        parser.add_argument(
+            '--loglevel',
+            default='info',
+            help='Worker log level (default: info)'
+        )
+
+    def build_command(self, queue, options):
+        pool = WORKER_POOLS[queue]
+        command = [
+            sys.executable, '-m', 'celery', '-A', 'referral_system', 'worker',
+            '-Q', queue,
+            '-n', f'{queue}@%h',
+            '--pool', options['pool'],
+            '--prefetch-multiplier', str(pool['prefetch_multiplier']),
+            '-l', options['loglevel'],
+        ]
+        if options['pool'] != 'solo':
+            command += ['--concurrency', str(pool['concurrency'])]
+        if pool['prefetch_multiplier'] == 1:
+            command += ['-O', 'fair']
+        return command
+
+    def metrics_ports(self):
+        """First task metrics exporter port of each queue's workers, one port per pool process"""
+        port = getattr(settings, 'TASK_METRICS_PORT', None)
+        if port is None:
+            return {}
+        ports = {}
+        for queue in sorted(WORKER_POOLS):
+            ports[queue] = port
+            port += WORKER_POOLS[queue]['concurrency']
+        return ports
+
+    def handle(self, *args, **options):
+        queues = options['queues'] or sorted(WORKER_POOLS)
+        ports = self.metrics_ports()
+        processes = []
+
+        for queue in queues:
+            command = self.build_command(queue, options)
+            env = os.environ.copy()
+            if queue in ports:
+                env['TASK_METRICS_PORT'] = str(ports[queue])
+            self.stdout.write(self.style.SUCCESS(f'Starting {queue} worker: {" ".join(command)}'))
+            if queue in ports:
+                self.stdout.write(f'  task metrics from port {ports[queue]}')
+            processes.append(subprocess.Popen(command, env=env))
+
+        try:
+            exit_codes = [process.wait() for process in processes]
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping workers...')
+            for process in processes:
+                if process.poll() is None:
+                    process.send_signal(signal.SIGINT)
+            for process in processes:
+                process.wait()
+            return
+
+        if any(exit_codes):
+            raise CommandError(f'Worker exited with codes {exit_codes}')
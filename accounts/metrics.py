@@ -0,0 +1,268 @@
+"""
+In-process Prometheus-style metrics registry.
+
+Counters and histograms are kept per worker process and rendered in the
+Prometheus text exposition format by the ``/metrics`` endpoint.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, labelvalues):
+    if not labelnames:
+        return ''
+    pairs = [
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in zip(labelnames, labelvalues)
+    ]
+    return '{%s}' % ','.join(pairs)
+
+
+class Metric:
+    """Base class for a labelled metric family"""
+    type_name = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self, items):
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in items
+        ]
+
+
+class Histogram(Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {
+                    'buckets': [0] * len(self.buckets),
+                    'sum': 0.0,
+                    'count': 0,
+                }
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state['buckets'][index] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def get(self, **labels):
+        """Return ``(count, sum)`` for the given labels"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None:
+                return 0, 0.0
+            return state['count'], state['sum']
+
+    def _render_samples(self, items):
+        lines = []
+        labelnames = self.labelnames + ('le',)
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['buckets']):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(labelnames, key + (bound,))} {cumulative}"
+                )
+            lines.append(
+                f"{self.name}_bucket{_format_labels(labelnames, key + ('+Inf',))} {state['count']}"
+            )
+            base_labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{base_labels} {state['sum']}")
+            lines.append(f"{self.name}_count{base_labels} {state['count']}")
+        return lines
+
+
+class QueryCollector:
+    """
+    Database execute wrapper that counts queries, their total duration and
+    the rows written by INSERT/UPDATE/DELETE statements.
+    """
+    WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.rows_touched = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+        if sql.lstrip()[:6].upper() in self.WRITE_PREFIXES:
+            rowcount = getattr(context['cursor'], 'rowcount', -1)
+            if rowcount and rowcount > 0:
+                self.rows_touched += rowcount
+        return result
+
+
+class Registry:
+    """Collection of metric families rendered together"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def clear(self):
+        with self._lock:
+            for metric in self._metrics.values():
+                metric.clear()
+
+    def render(self):
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# HTTP request metrics, recorded by accounts.middleware.RequestMetricsMiddleware
+http_requests_total = registry.counter(
+    'http_requests_total',
+    'Total API requests handled',
+    ('view', 'method', 'status'),
+)
+http_request_duration_seconds = registry.histogram(
+    'http_request_duration_seconds',
+    'Total API request latency in seconds',
+    ('view', 'method'),
+)
+http_request_db_queries = registry.histogram(
+    'http_request_db_queries',
+    'Number of SQL queries executed per API request',
+    ('view',),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250),
+)
+http_request_db_duration_seconds = registry.histogram(
+    'http_request_db_duration_seconds',
+    'Time spent in SQL queries per API request in seconds',
+    ('view',),
+)
+http_request_serialize_duration_seconds = registry.histogram(
+    'http_request_serialize_duration_seconds',
+    'Time spent rendering API responses in seconds',
+    ('view',),
+)
+http_query_budget_exceeded_total = registry.counter(
+    'http_query_budget_exceeded_total',
+    'API requests that executed more SQL queries than the configured budget',
+    ('view',),
+)
+
+# Cache metrics, recorded by accounts.cache
+cache_requests_total = registry.counter(
+    'cache_requests_total',
+    'Cache lookups made through accounts.cache.get_or_set by result',
+    ('namespace', 'result'),
+)
+cache_build_duration_seconds = registry.histogram(
+    'cache_build_duration_seconds',
+    'Time spent computing cached values in seconds',
+    ('namespace',),
+)
+cache_fallback_total = registry.counter(
+    'cache_fallback_total',
+    'Cache calls served by the fallback cache because the primary was unreachable',
+    ('alias',),
+)
+
+# Celery task metrics, recorded by accounts.task_metrics
+celery_task_runs_total = registry.counter(
+    'celery_task_runs_total',
+    'Total Celery task runs by final state',
+    ('task', 'state'),
+)
+celery_task_duration_seconds = registry.histogram(
+    'celery_task_duration_seconds',
+    'Celery task runtime in seconds',
+    ('task',),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+celery_task_queue_wait_seconds = registry.histogram(
+    'celery_task_queue_wait_seconds',
+    'Time Celery tasks spent waiting in the broker queue in seconds',
+    ('task',),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+celery_task_db_queries = registry.histogram(
+    'celery_task_db_queries',
+    'Number of SQL queries executed per Celery task run',
+    ('task',),
+    buckets=(1, 5, 10, 50, 100, 500, 1000, 5000),
+)
+celery_task_rows_touched_total = registry.counter(
+    'celery_task_rows_touched_total',
+    'Rows inserted, updated or deleted by Celery tasks',
+    ('task',),
+)
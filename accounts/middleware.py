@@ -0,0 +1,112 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from rest_framework.views import APIView
+
+from accounts import metrics
+from accounts.metrics import QueryCollector
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, DB time, serialization time and total latency for
+    every DRF view, export them to the metrics registry and emit them as a
+    Server-Timing header.
+
+    Requests that run more queries than ``REQUEST_QUERY_BUDGET`` are logged
+    so N+1 regressions show up immediately.
+
+    Under ASGI it runs as async middleware, so the async views
+    (``accounts.async_views``) are not pushed onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.query_budget = getattr(settings, 'REQUEST_QUERY_BUDGET', 20)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        collector, start = self.begin(request)
+        with self.collecting(collector):
+            response = self.get_response(request)
+        return self.finish(request, response, collector, start)
+
+    async def __acall__(self, request):
+        collector, start = self.begin(request)
+        with self.collecting(collector):
+            response = await self.get_response(request)
+        return self.finish(request, response, collector, start)
+
+    def begin(self, request):
+        request._metrics_view = None
+        request._metrics_serialize = 0.0
+        return QueryCollector(), time.perf_counter()
+
+    def collecting(self, collector):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(collector))
+        return stack
+
+    def finish(self, request, response, collector, start):
+        view_name = request._metrics_view
+        if view_name is None:
+            return response
+
+        total = time.perf_counter() - start
+        self.record(request, response, view_name, collector, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is not None and issubclass(view_class, APIView):
+            match = request.resolver_match
+            request._metrics_view = (match.view_name if match else None) or view_class.__name__
+        return None
+
+    def process_template_response(self, request, response):
+        if request._metrics_view is None:
+            return response
+
+        render_start = time.perf_counter()
+
+        def record_render_time(rendered):
+            request._metrics_serialize = time.perf_counter() - render_start
+
+        response.add_post_render_callback(record_render_time)
+        return response
+
+    def record(self, request, response, view_name, collector, total):
+        serialize = request._metrics_serialize
+
+        metrics.http_requests_total.inc(
+            view=view_name, method=request.method, status=response.status_code
+        )
+        metrics.http_request_duration_seconds.observe(total, view=view_name, method=request.method)
+        metrics.http_request_db_queries.observe(collector.count, view=view_name)
+        metrics.http_request_db_duration_seconds.observe(collector.duration, view=view_name)
+        metrics.http_request_serialize_duration_seconds.observe(serialize, view=view_name)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={collector.duration * 1000:.2f};desc="{collector.count} queries"',
+            f'serialize;dur={serialize * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+        if self.query_budget and collector.count > self.query_budget:
+            metrics.http_query_budget_exceeded_total.inc(view=view_name)
+            logger.warning(
+                f"Query budget exceeded: {request.method} {request.path} ({view_name}) ran "
+                f"{collector.count} queries (budget {self.query_budget}) in {total * 1000:.1f}ms"
+            )
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_remove_payment_investment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_name', models.CharField(db_index=True, max_length=200)),
+                ('task_id', models.CharField(max_length=255)),
+                ('state', models.CharField(max_length=20)),
+                ('started_at', models.DateTimeField()),
+                ('runtime', models.FloatField(help_text='Task runtime in seconds')),
+                ('queue_wait', models.FloatField(blank=True, help_text='Time spent waiting in the broker queue in seconds', null=True)),
+                ('db_queries', models.PositiveIntegerField(default=0)),
+                ('db_time', models.FloatField(default=0, help_text='Time spent in SQL queries in seconds')),
+                ('rows_touched', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
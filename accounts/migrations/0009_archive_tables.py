@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPairing',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('matured_investment_id', models.BigIntegerField(db_index=True)),
+                ('new_investment_id', models.BigIntegerField(db_index=True)),
+                ('amount_paired', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_confirmed', models.BooleanField(default=False)),
+                ('paired_at', models.DateTimeField(db_index=True)),
+                ('payment_due_date', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(max_length=20)),
+                ('payment_status', models.CharField(max_length=20)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedPairedInvestment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount_paired', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_confirmed', models.BooleanField(default=False)),
+                ('paired_at', models.DateTimeField(db_index=True)),
+                ('status', models.CharField(max_length=20)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('matured_investor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_matured_pairings', to=settings.AUTH_USER_MODEL)),
+                ('new_investor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_new_pairings', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedInvestment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('maturity_period', models.PositiveIntegerField()),
+                ('status', models.CharField(max_length=20)),
+                ('return_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('referral_bonus_used', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('payment_confirmed_at', models.DateTimeField(blank=True, null=True)),
+                ('transaction_reference', models.CharField(blank=True, max_length=50, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_investments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:20
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def backfill_maturity_date(apps, schema_editor):
+    Investment = apps.get_model('accounts', 'Investment')
+    investments = list(Investment.objects.only('id', 'created_at', 'maturity_period'))
+    for investment in investments:
+        investment.maturity_date = investment.created_at + timedelta(days=investment.maturity_period)
+    Investment.objects.bulk_update(investments, ['maturity_date'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_archive_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='investment',
+            name='maturity_date',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_maturity_date, migrations.RunPython.noop),
+    ]
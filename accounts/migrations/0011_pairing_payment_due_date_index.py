@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_investment_maturity_date'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pairing',
+            name='payment_due_date',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
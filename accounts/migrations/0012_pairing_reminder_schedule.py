@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:25
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def schedule_open_pairings(apps, schema_editor):
+    # Open pairings get their first reminder on the next run of the job
+    Pairing = apps.get_model('accounts', 'Pairing')
+    Pairing.objects.filter(
+        status__in=['pending', 'paired'],
+        payment_status='pending',
+        is_confirmed=False
+    ).update(next_reminder_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_pairing_payment_due_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pairing',
+            name='last_reminded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pairing',
+            name='next_reminder_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pairing',
+            name='reminder_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(schedule_open_pairings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_pairing_reminder_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BiddingHoliday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('name', models.CharField(blank=True, max_length=100)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BiddingWindowOverride',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('name', models.CharField(max_length=50)),
+                ('start', models.TimeField()),
+                ('end', models.TimeField()),
+            ],
+            options={
+                'ordering': ['date', 'start'],
+                'unique_together': {('date', 'name')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_bidding_calendar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='investment',
+            name='ticket',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
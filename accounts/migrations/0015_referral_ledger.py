@@ -0,0 +1,71 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+
+
+def backfill_ledger(apps, schema_editor):
+    # Replay each user's referral history as ledger entries: a bonus when the
+    # row was earned and a redemption when it was used, then reconcile with
+    # referral_earnings so the ledger ends on the balance users see today
+    User = apps.get_model('accounts', 'User')
+    ReferralHistory = apps.get_model('accounts', 'ReferralHistory')
+    ReferralLedgerEntry = apps.get_model('accounts', 'ReferralLedgerEntry')
+    now = django.utils.timezone.now()
+
+    events = {}
+    for history in ReferralHistory.objects.order_by('created_at', 'id'):
+        events.setdefault(history.referrer_id, []).append((history.created_at, 'bonus', history.bonus_earned, history.id))
+        if history.status == 'used':
+            used_at = history.used_at or history.created_at
+            events[history.referrer_id].append((used_at, 'redemption', -history.bonus_earned, history.id))
+
+    earnings = dict(
+        User.objects.filter(referral_earnings__gt=0).values_list('id', 'referral_earnings')
+    )
+    entries = []
+    for user_id in sorted(set(events) | set(earnings)):
+        balance = Decimal('0')
+        for created_at, kind, amount, referral_id in sorted(events.get(user_id, []), key=lambda event: event[0]):
+            balance += amount
+            entries.append(ReferralLedgerEntry(
+                user_id=user_id, kind=kind, amount=amount, balance=balance,
+                referral_id=referral_id, created_at=created_at
+            ))
+        target = earnings.get(user_id, Decimal('0'))
+        if balance != target:
+            entries.append(ReferralLedgerEntry(
+                user_id=user_id, kind='adjustment', amount=target - balance, balance=target, created_at=now
+            ))
+    ReferralLedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_investment_ticket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferralLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('bonus', 'Referral Bonus'), ('redemption', 'Redemption'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('investment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='referral_ledger_entries', to='accounts.investment')),
+                ('referral', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='accounts.referralhistory')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='referral_ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['user', 'created_at', 'id'], name='referral_ledger_user_time')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_referral_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferralCodeBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reserved_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
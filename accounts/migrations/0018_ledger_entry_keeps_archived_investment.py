@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_claims_user'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='referralledgerentry',
+            name='investment',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='referral_ledger_entries', to='accounts.investment'),
+        ),
+    ]
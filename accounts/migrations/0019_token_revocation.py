@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_ledger_entry_keeps_archived_investment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenRevocation',
+            fields=[
+                ('user_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('revoked_at', models.BigIntegerField(help_text='Unix time; tokens issued before it are rejected')),
+            ],
+        ),
+    ]
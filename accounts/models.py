@@ -6,6 +6,7 @@ from django.dispatch import receiver
 from decimal import Decimal
 import uuid
 from datetime import timedelta
+from accounts import pricing
 
 class User(AbstractUser):
     phone_number = models.CharField(max_length=20, unique=True)
@@ -18,13 +19,29 @@ class User(AbstractUser):
 
     def save(self, *args, **kwargs):
         if not self.referral_code:
-            # Generate a unique referral code
-            self.referral_code = str(uuid.uuid4())[:8].upper()
+            # Take the next code from this process's reserved block
+            from accounts.referrals import next_code
+            self.referral_code = next_code()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return self.username
 
+class ClaimsUser(User):
+    """
+    A user built from access-token claims (accounts.authentication). The
+    fields the token does not carry are deferred; touching any of them
+    loads them all in one query.
+    """
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = list(deferred)
+        super().refresh_from_db(using=using, fields=fields)
+
 class Investment(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -50,16 +67,24 @@ class Investment(models.Model):
     payment_method = models.CharField(max_length=50, null=True, blank=True)
     payment_notes = models.TextField(blank=True)
     maturity_notification_sent = models.BooleanField(default=False)
+    maturity_date = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Admission ticket of the order that placed it (accounts.admission)
+    ticket = models.UUIDField(null=True, blank=True, unique=True, editable=False)
 
     def __str__(self):
         return f"Investment: {self.user.username} - ${self.amount} ({self.status})"
 
+    def save(self, *args, **kwargs):
+        if self.maturity_period is not None:
+            # Denormalized created_at + maturity_period so maturity can be range-scanned
+            self.maturity_date = (self.created_at or timezone.now()) + timedelta(days=self.maturity_period)
+            if self.return_amount is None and self.amount is not None:
+                self.return_amount = self.calculate_return_amount()
+        super().save(*args, **kwargs)
+
     def calculate_return_amount(self):
         """Calculate return amount including 2% daily interest"""
-        daily_interest = Decimal('0.02')  # 2% daily interest
-        interest_amount = self.amount * daily_interest * self.maturity_period
-        total_return = self.amount + interest_amount + self.referral_bonus_used
-        return total_return
+        return pricing.calculate_return_amount(self.amount, self.maturity_period, self.referral_bonus_used)
 
     def update_payment(self, amount_paid, payment_method=None, notes=None):
         """Update payment status and amounts"""
@@ -82,13 +107,29 @@ class Investment(models.Model):
             
         self.save()
 
+class Queue(models.Model):
+    """Matured investor waiting to be paid, with the amount still owed to them"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='queue_entries')
+    investment = models.ForeignKey(Investment, on_delete=models.CASCADE, null=True, blank=True, related_name='queue_entries')
+    amount_remaining = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+
+    def __str__(self):
+        return f"Queue: {self.user.username} - ${self.amount_remaining}"
+
 class Pairing(models.Model):
+    # Statuses of pairings still waiting for the new investor's payment
+    OPEN_STATUSES = ('pending', 'paired')
+
     matured_investment = models.ForeignKey(Investment, on_delete=models.CASCADE, related_name='matured_pairings')
     new_investment_id = models.ForeignKey(Investment, on_delete=models.CASCADE, related_name='new_pairings')
     amount_paired = models.DecimalField(max_digits=10, decimal_places=2)
     is_confirmed = models.BooleanField(default=False)
     paired_at = models.DateTimeField(auto_now_add=True)
-    payment_due_date = models.DateTimeField(null=True, blank=True)
+    payment_due_date = models.DateTimeField(null=True, blank=True, db_index=True)
     status = models.CharField(max_length=20, choices=[
         ('paired', 'Paired'),
         
@@ -98,6 +139,9 @@ class Pairing(models.Model):
         ('paid', 'Paid'),
         ('failed', 'Failed')
     ], default='pending')
+    reminder_count = models.PositiveIntegerField(default=0)
+    last_reminded_at = models.DateTimeField(null=True, blank=True)
+    next_reminder_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     def __str__(self):
         return f"Pairing: {self.matured_investment.user.username} -> {self.new_investment_id.user.username}"
@@ -106,6 +150,9 @@ class Pairing(models.Model):
         if not self.payment_due_date and self.paired_at:
             # Set payment due date to 24 hours after pairing
             self.payment_due_date = self.paired_at + timedelta(hours=24)
+        if self._state.adding and self.next_reminder_at is None and not self.is_confirmed:
+            from accounts.reminders import next_reminder_at
+            self.next_reminder_at = next_reminder_at(0, self.paired_at or timezone.now())
         super().save(*args, **kwargs)
 
 class Referral(models.Model):
@@ -117,6 +164,17 @@ class Referral(models.Model):
     def __str__(self):
         return f"Referral Code: {self.referral_code} by {self.referrer.username}"
 
+class ReferralCodeBlock(models.Model):
+    """
+    A block of referral code numbers reserved by one process
+    (accounts.referrals). Block ``id`` covers the numbers
+    ``[id * BLOCK_SIZE, (id + 1) * BLOCK_SIZE)``.
+    """
+    reserved_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Referral code block {self.pk}"
+
 class ReferralHistory(models.Model):
     referrer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='referral_history')
     referred = models.ForeignKey(User, on_delete=models.CASCADE, related_name='referred_by_history')
@@ -132,6 +190,40 @@ class ReferralHistory(models.Model):
     def __str__(self):
         return f"{self.referrer.username} -> {self.referred.username}: ${self.bonus_earned}"
 
+class ReferralLedgerEntry(models.Model):
+    """
+    Append-only referral bonus movement (accounts.ledger). ``amount`` is
+    signed and ``balance`` is the user's balance after it, mirrored in
+    ``User.referral_earnings``.
+    """
+    KIND_CHOICES = [
+        ('bonus', 'Referral Bonus'),
+        ('redemption', 'Redemption'),
+        ('adjustment', 'Adjustment')
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='referral_ledger')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    balance = models.DecimalField(max_digits=10, decimal_places=2)
+    referral = models.ForeignKey(ReferralHistory, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries')
+    # Keeps the id of investments accounts.archive moves out of the live table
+    investment = models.ForeignKey(
+        Investment, on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='referral_ledger_entries'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            # Statements and opening balances are range scans per user
+            models.Index(fields=['user', 'created_at', 'id'], name='referral_ledger_user_time'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} {self.kind}: ${self.amount} (balance ${self.balance})"
+
 class PairedInvestment(models.Model):
     matured_investor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='matured_pairings')
     new_investor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='new_pairings')
@@ -179,3 +271,116 @@ class Payment(models.Model):
         self.rejected_at = timezone.now()
         self.rejection_reason = reason
         self.save()
+
+class TaskRun(models.Model):
+    """Rolling record of recent Celery task executions, see accounts.task_metrics"""
+    task_name = models.CharField(max_length=200, db_index=True)
+    task_id = models.CharField(max_length=255)
+    state = models.CharField(max_length=20)
+    started_at = models.DateTimeField()
+    runtime = models.FloatField(help_text='Task runtime in seconds')
+    queue_wait = models.FloatField(null=True, blank=True, help_text='Time spent waiting in the broker queue in seconds')
+    db_queries = models.PositiveIntegerField(default=0)
+    db_time = models.FloatField(default=0, help_text='Time spent in SQL queries in seconds')
+    rows_touched = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"{self.task_name} [{self.state}] {self.runtime:.3f}s"
+
+class TaskLease(models.Model):
+    """Single-flight lease for periodic jobs, see accounts.locks"""
+    name = models.CharField(max_length=100, unique=True)
+    owner = models.CharField(max_length=200, blank=True)
+    token = models.PositiveBigIntegerField(default=0, help_text='Fencing token, incremented on every acquisition')
+    acquired_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Lease {self.name} #{self.token} ({self.owner or 'free'})"
+
+class TokenRevocation(models.Model):
+    """When a user's tokens were last revoked, see accounts.authentication; outlives the user"""
+    user_id = models.BigIntegerField(primary_key=True)
+    revoked_at = models.BigIntegerField(help_text='Unix time; tokens issued before it are rejected')
+
+    def __str__(self):
+        return f"Tokens of user {self.user_id} revoked at {self.revoked_at}"
+
+class ArchivedInvestment(models.Model):
+    """Completed investment moved out of the live table by accounts.archive, keeps its original id"""
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_investments')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(db_index=True)
+    maturity_period = models.PositiveIntegerField()
+    status = models.CharField(max_length=20)
+    return_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    referral_bonus_used = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    payment_confirmed_at = models.DateTimeField(null=True, blank=True)
+    transaction_reference = models.CharField(max_length=50, null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Archived investment {self.id}: ${self.amount} ({self.status})"
+
+class ArchivedPairing(models.Model):
+    """Settled or failed pairing moved out of the live table, keeps its original id"""
+    id = models.BigIntegerField(primary_key=True)
+    matured_investment_id = models.BigIntegerField(db_index=True)
+    new_investment_id = models.BigIntegerField(db_index=True)
+    amount_paired = models.DecimalField(max_digits=10, decimal_places=2)
+    is_confirmed = models.BooleanField(default=False)
+    paired_at = models.DateTimeField(db_index=True)
+    payment_due_date = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=20)
+    payment_status = models.CharField(max_length=20)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived pairing {self.id}: ${self.amount_paired} ({self.payment_status})"
+
+class ArchivedPairedInvestment(models.Model):
+    """Completed legacy PairedInvestment row moved out of the live table, keeps its original id"""
+    id = models.BigIntegerField(primary_key=True)
+    matured_investor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_matured_pairings')
+    new_investor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_new_pairings')
+    amount_paired = models.DecimalField(max_digits=10, decimal_places=2)
+    is_confirmed = models.BooleanField(default=False)
+    paired_at = models.DateTimeField(db_index=True)
+    status = models.CharField(max_length=20)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived paired investment {self.id}: ${self.amount_paired}"
+
+class BiddingHoliday(models.Model):
+    """Day on which no bidding window opens"""
+    date = models.DateField(unique=True)
+    name = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"Bidding holiday {self.date}: {self.name}"
+
+class BiddingWindowOverride(models.Model):
+    """Bidding window for one date; a date's overrides replace its default windows"""
+    date = models.DateField(db_index=True)
+    name = models.CharField(max_length=50)
+    start = models.TimeField()
+    end = models.TimeField()
+
+    class Meta:
+        ordering = ['date', 'start']
+        unique_together = ('date', 'name')
+
+    def __str__(self):
+        return f"Bidding window {self.date} {self.name}: {self.start:%H:%M}-{self.end:%H:%M}"
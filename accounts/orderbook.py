@@ -0,0 +1,210 @@
+"""
+Order book over the matured-investor ``Queue``.
+
+Open queue entries are kept in FIFO slots with a Fenwick tree over their
+remaining amounts (in cents), so the next open entry after any position is
+found in O(log n) without walking exhausted rows, and "take X from the
+head" costs O(k log n) for the k entries it consumes. A max segment tree
+over the same slots answers "which entry covers amount Y in full" with one
+O(log n) descent, returning the oldest such entry.
+
+The book is rebuilt from the open rows of the ``Queue`` table and writes
+are buffered: consumed amounts are only persisted by ``flush()``, in one
+bulk update, when the caller commits its pairing pass.
+"""
+from accounts.models import Queue
+from accounts.pricing import from_cents, to_cents
+
+
+class FenwickTree:
+    """Binary indexed tree of non-negative integers with prefix sums and search"""
+
+    def __init__(self, values):
+        self.size = len(values)
+        self.tree = [0] * (self.size + 1)
+        for index, value in enumerate(values, start=1):
+            self.tree[index] += value
+            parent = index + (index & -index)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[index]
+
+    def add(self, index, delta):
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index):
+        """Sum of the first ``index`` values"""
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def lower_bound(self, target):
+        """Smallest index whose prefix sum including itself reaches ``target``"""
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            candidate = position + step
+            if candidate <= self.size and self.tree[candidate] < target:
+                position = candidate
+                target -= self.tree[candidate]
+            step >>= 1
+        return position
+
+
+class MaxSegmentTree:
+    """Segment tree of non-negative integers with point updates and first-fit search"""
+
+    def __init__(self, values):
+        self.size = len(values)
+        self.capacity = 1
+        while self.capacity < self.size:
+            self.capacity *= 2
+        self.tree = [0] * (2 * self.capacity)
+        self.tree[self.capacity:self.capacity + self.size] = values
+        for node in range(self.capacity - 1, 0, -1):
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def update(self, index, value):
+        node = index + self.capacity
+        self.tree[node] = value
+        node //= 2
+        while node:
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+
+    def first_at_least(self, target, start=0):
+        """Smallest index at or after ``start`` whose value reaches ``target``, or None"""
+        index = self._search(1, 0, self.capacity, max(target, 1), start)
+        return index if index is not None and index < self.size else None
+
+    def _search(self, node, low, high, target, start):
+        if high <= start or self.tree[node] < target:
+            return None
+        if high - low == 1:
+            return low
+        middle = (low + high) // 2
+        found = self._search(2 * node, low, middle, target, start)
+        if found is None:
+            found = self._search(2 * node + 1, middle, high, target, start)
+        return found
+
+
+class OrderBook:
+    """FIFO book of queue entries over Fenwick and max segment trees, see module docstring"""
+
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self._cents = [max(to_cents(entry.amount_remaining), 0) for entry in self.entries]
+        self._tree = FenwickTree(self._cents)
+        self._largest = MaxSegmentTree(self._cents)
+        self._open = sum(1 for cents in self._cents if cents > 0)
+        self._slots = {entry.pk: slot for slot, entry in enumerate(self.entries)}
+        self._dirty = set()
+        self.head = self._next_open(0)
+
+    @classmethod
+    def load(cls, queryset=None):
+        """Rebuild the book from the open rows of the Queue table"""
+        if queryset is None:
+            queryset = Queue.objects.filter(amount_remaining__gt=0).order_by('created_at', 'id')
+        return cls(queryset)
+
+    def __len__(self):
+        return self._open
+
+    @property
+    def total(self):
+        return from_cents(self._tree.prefix(len(self.entries)))
+
+    def _next_open(self, slot):
+        """First slot at or after ``slot`` with a positive balance, or None"""
+        if slot >= len(self.entries):
+            return None
+        target = self._tree.prefix(slot) + 1
+        if target > self._tree.prefix(len(self.entries)):
+            return None
+        return self._tree.lower_bound(target)
+
+    def _consume(self, slot, cents):
+        self._cents[slot] -= cents
+        if self._cents[slot] == 0:
+            self._open -= 1
+        self._tree.add(slot, -cents)
+        self._largest.update(slot, self._cents[slot])
+        self._dirty.add(slot)
+
+    def remaining(self, entry):
+        return from_cents(self._cents[self._slots[entry.pk]])
+
+    def take(self, amount, exclude_user=None):
+        """
+        Take up to ``amount`` from the head of the book in FIFO order.
+
+        Entries owned by ``exclude_user`` are skipped. Returns a list of
+        ``(entry, amount_taken)``; the total may be less than ``amount`` if
+        the book runs dry.
+        """
+        needed = to_cents(amount)
+        taken = []
+        slot = self.head
+        while needed > 0 and slot is not None:
+            entry = self.entries[slot]
+            if exclude_user is not None and entry.user_id == exclude_user:
+                slot = self._next_open(slot + 1)
+                continue
+
+            cents = min(self._cents[slot], needed)
+            self._consume(slot, cents)
+            taken.append((entry, from_cents(cents)))
+            needed -= cents
+            if self._cents[slot] == 0:
+                slot = self._next_open(slot + 1)
+
+        if self.head is not None and self._cents[self.head] == 0:
+            self.head = self._next_open(self.head + 1)
+        return taken
+
+    def best_fit(self, amount, exclude_user=None):
+        """
+        The oldest entry whose balance covers ``amount`` in full, or None.
+
+        Entries owned by ``exclude_user`` are skipped.
+        """
+        needed = to_cents(amount)
+        slot = self._largest.first_at_least(needed)
+        while slot is not None and exclude_user is not None and self.entries[slot].user_id == exclude_user:
+            slot = self._largest.first_at_least(needed, slot + 1)
+        return None if slot is None else self.entries[slot]
+
+    def take_best_fit(self, amount, exclude_user=None):
+        """Take ``amount`` from the best-fitting entry; returns ``(entry, amount)`` or None"""
+        entry = self.best_fit(amount, exclude_user)
+        if entry is None:
+            return None
+        slot = self._slots[entry.pk]
+        cents = to_cents(amount)
+        self._consume(slot, cents)
+        if slot == self.head and self._cents[slot] == 0:
+            self.head = self._next_open(slot + 1)
+        return entry, from_cents(cents)
+
+    def dirty_entries(self):
+        """Entries whose balance changed since the last flush, with updated amounts"""
+        entries = []
+        for slot in sorted(self._dirty):
+            entry = self.entries[slot]
+            entry.amount_remaining = from_cents(self._cents[slot])
+            entries.append(entry)
+        return entries
+
+    def flush(self):
+        """Write buffered balances back to the Queue table in one bulk update"""
+        entries = self.dirty_entries()
+        if entries:
+            Queue.objects.bulk_update(entries, ['amount_remaining'])
+        self._dirty.clear()
+        return len(entries)
@@ -0,0 +1,348 @@
+"""
+Pairing engine.
+
+Matches pending investments against the matured-investor ``Queue`` in FIFO
+order through an ``OrderBook``. The work can be partitioned into amount buckets
+(``PAIRING_SHARD_BOUNDARIES``): each shard only touches queue entries and
+investments whose amounts fall inside its range and takes its row locks with
+``select_for_update(skip_locked=True)``, so shards never wait on each other
+and can run in parallel Celery subtasks. A final unsharded pass reconciles
+whatever could not be matched inside a single bucket.
+
+New investments placed during a bidding window are matched individually
+by ``pair_investment`` as soon as they are committed, so the periodic job
+only has to reconcile leftovers.
+
+Pairings whose payment is overdue are failed in bulk by
+``expire_overdue_pairings``, which hands their amounts back to the queue and
+their investments back to the pool in the same transaction.
+
+Both sides of new and failed pairings are pushed an event once the
+transaction commits (``accounts.events``).
+"""
+import logging
+import sqlite3
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounts.dashboard import invalidate_user_dashboards
+from accounts.events import publish as publish_events
+from accounts.locks import LeaseLost, write_transaction
+from accounts.models import Investment, Pairing, Queue
+from accounts.orderbook import OrderBook
+from accounts.reminders import next_reminder_at
+
+logger = logging.getLogger(__name__)
+
+Match = namedtuple('Match', ['entry', 'investment', 'amount'])
+
+DEFAULT_PAYMENT_WINDOW = timedelta(hours=24)
+
+
+def get_shard_boundaries():
+    return sorted(Decimal(str(bound)) for bound in getattr(settings, 'PAIRING_SHARD_BOUNDARIES', []))
+
+
+def get_shard_count():
+    return len(get_shard_boundaries()) + 1
+
+
+def amount_range(shard, shard_count):
+    """Return the ``(low, high)`` amount range of a shard; None means unbounded"""
+    if shard_count <= 1:
+        return None, None
+
+    boundaries = get_shard_boundaries()
+    if shard_count != len(boundaries) + 1 or not 0 <= shard < shard_count:
+        raise ValueError(f"Shard {shard}/{shard_count} does not match PAIRING_SHARD_BOUNDARIES")
+
+    low = boundaries[shard - 1] if shard > 0 else None
+    high = boundaries[shard] if shard < len(boundaries) else None
+    return low, high
+
+
+def _range_filter(field, low, high):
+    condition = Q()
+    if low is not None:
+        condition &= Q(**{f'{field}__gte': low})
+    if high is not None:
+        condition &= Q(**{f'{field}__lt': high})
+    return condition
+
+
+def open_queue_entries(low=None, high=None):
+    """Queue entries still owed money, oldest first"""
+    return Queue.objects.filter(
+        _range_filter('amount_remaining', low, high),
+        amount_remaining__gt=0,
+        investment__isnull=False
+    ).order_by('created_at', 'id')
+
+
+def unpaired_investments(low=None, high=None):
+    """Pending investments not fully paired yet, annotated with ``amount_matched``"""
+    matched = Pairing.objects.filter(
+        new_investment_id=OuterRef('pk')
+    ).exclude(status='failed').values('new_investment_id').annotate(total=Sum('amount_paired')).values('total')
+
+    return Investment.objects.filter(
+        _range_filter('amount', low, high),
+        status='pending',
+        paired_to__isnull=True
+    ).annotate(
+        amount_matched=Coalesce(
+            Subquery(matched),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        )
+    ).order_by('created_at', 'id')
+
+
+def match(entries, investments):
+    """
+    Match investments against queue entries in FIFO order.
+
+    Works on already loaded rows through an ``OrderBook``; nothing is
+    written until ``apply_matches``. Returns the matches and the book. An
+    investor is never paired with their own queue entry.
+    """
+    book = OrderBook(entries)
+    matches = []
+
+    for investment in investments:
+        needed = investment.amount - getattr(investment, 'amount_matched', Decimal('0'))
+        if needed <= 0:
+            continue
+        for entry, amount in book.take(needed, exclude_user=investment.user_id):
+            matches.append(Match(entry, investment, amount))
+
+    return matches, book
+
+
+def apply_matches(matches, book, now=None):
+    """Persist matches and flush the book with a fixed number of bulk queries"""
+    now = now or timezone.now()
+    payment_window = getattr(settings, 'PAIRING_PAYMENT_WINDOW', DEFAULT_PAYMENT_WINDOW)
+
+    Pairing.objects.bulk_create([
+        Pairing(
+            matured_investment_id=m.entry.investment_id,
+            new_investment_id=m.investment,
+            amount_paired=m.amount,
+            payment_due_date=now + payment_window,
+            next_reminder_at=next_reminder_at(0, now),
+        )
+        for m in matches
+    ])
+
+    covered = {}
+    matched = {}
+    exhausted = {}
+    for m in matches:
+        matched[m.investment.pk] = matched.get(m.investment.pk, m.investment.amount_matched) + m.amount
+        if matched[m.investment.pk] >= m.investment.amount:
+            covered.setdefault(m.investment.pk, m.entry.user_id)
+        if book.remaining(m.entry) <= 0:
+            exhausted[m.entry.investment_id] = m.investment.user_id
+
+    book.flush()
+
+    # Fully paired new investments and matured investments whose queue entry is exhausted
+    paired = [
+        Investment(pk=pk, status='paired', paired_to_id=user_id)
+        for pk, user_id in list(covered.items()) + list(exhausted.items())
+    ]
+    Investment.objects.bulk_update(paired, ['status', 'paired_to'])
+
+    user_ids = {m.entry.user_id for m in matches} | {m.investment.user_id for m in matches}
+    transaction.on_commit(lambda: invalidate_user_dashboards(user_ids))
+    publish_events(
+        (user_id, 'paired', {'investment_id': investment_id, 'amount': m.amount})
+        for m in matches
+        for user_id, investment_id in ((m.entry.user_id, m.entry.investment_id), (m.investment.user_id, m.investment.pk))
+    )
+
+
+def pair_shard(shard=0, shard_count=1, lease=None):
+    """
+    Pair one amount bucket inside a single transaction and return the matches.
+
+    When ``lease`` is given its fencing token is checked before anything is
+    written; if the lease was lost the transaction is rolled back with
+    ``LeaseLost``.
+    """
+    low, high = amount_range(shard, shard_count)
+
+    with write_transaction():
+        entries = list(open_queue_entries(low, high).select_for_update(skip_locked=True))
+        if not entries:
+            return []
+        investments = list(unpaired_investments(low, high).select_for_update(skip_locked=True))
+
+        matches, book = match(entries, investments)
+        if not matches:
+            return []
+
+        if lease is not None and not lease.is_held():
+            raise LeaseLost(f"Lease '{lease.name}' #{lease.token} was lost before shard {shard} committed")
+
+        apply_matches(matches, book)
+
+    logger.info(f"Pairing shard {shard}/{shard_count} created {len(matches)} pairings")
+    return matches
+
+
+def pair_investment(investment_id):
+    """
+    Match a single new investment against the head of the queue.
+
+    Only the queue entries needed to cover the investment are read and
+    locked. Returns an empty list if the investment is already paired or
+    locked by a concurrent pairing run.
+    """
+    with write_transaction():
+        investment = unpaired_investments().filter(
+            pk=investment_id
+        ).select_for_update(skip_locked=True).first()
+        if investment is None:
+            return []
+
+        needed = investment.amount - investment.amount_matched
+        entries = []
+        available = Decimal('0')
+        candidates = open_queue_entries().exclude(
+            user_id=investment.user_id
+        ).select_for_update(skip_locked=True)
+        for entry in candidates.iterator(chunk_size=20):
+            entries.append(entry)
+            available += entry.amount_remaining
+            if available >= needed:
+                break
+
+        matches, book = match(entries, [investment])
+        if matches:
+            apply_matches(matches, book)
+
+    if matches:
+        logger.info(f"Paired investment {investment_id} on arrival with {len(matches)} queue entries")
+    return matches
+
+
+def supports_update_returning():
+    """Whether the database supports ``UPDATE ... RETURNING``"""
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 35)
+    # MariaDB returns columns from INSERT and DELETE but not from UPDATE
+    return False
+
+
+def _fail_overdue(now):
+    """Mark overdue unconfirmed pairings failed, returns ``(id, matured_id, new_id)`` rows"""
+    if supports_update_returning():
+        table = connection.ops.quote_name(Pairing._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET status = %s, next_reminder_at = NULL "
+                f"WHERE is_confirmed = %s AND status IN (%s, %s) AND payment_due_date <= %s "
+                f"RETURNING id, matured_investment_id, new_investment_id_id",
+                ['failed', False, *Pairing.OPEN_STATUSES, connection.ops.adapt_datetimefield_value(now)]
+            )
+            return cursor.fetchall()
+
+    overdue = Pairing.objects.filter(
+        is_confirmed=False,
+        status__in=Pairing.OPEN_STATUSES,
+        payment_due_date__lte=now
+    ).select_for_update()
+    rows = list(overdue.values_list('id', 'matured_investment_id', 'new_investment_id'))
+    Pairing.objects.filter(pk__in=[row[0] for row in rows]).update(status='failed', next_reminder_at=None)
+    return rows
+
+
+def _return_to_queue(amounts):
+    """Credit failed amounts back to each matured investment's queue entry"""
+    entries = {}
+    for entry in Queue.objects.filter(investment_id__in=amounts).order_by('created_at', 'id'):
+        entries.setdefault(entry.investment_id, entry)
+
+    for investment_id, entry in entries.items():
+        entry.amount_remaining += amounts[investment_id]
+    Queue.objects.bulk_update(list(entries.values()), ['amount_remaining'])
+
+    missing = Investment.objects.filter(pk__in=set(amounts) - set(entries)).values_list('pk', 'user_id')
+    Queue.objects.bulk_create([
+        Queue(user_id=user_id, investment_id=pk, amount_remaining=amounts[pk])
+        for pk, user_id in missing
+    ])
+
+
+def expire_overdue_pairings(now=None):
+    """
+    Fail every unconfirmed pairing whose payment is overdue.
+
+    The failed pairings are found and updated with a single statement over
+    the indexed ``payment_due_date``. In the same transaction the paired
+    amounts go back to the matured investors' queue entries and both sides
+    of each pairing become matchable again. Returns one notification payload
+    per failed pairing with both users already joined in.
+    """
+    now = now or timezone.now()
+
+    with write_transaction():
+        rows = _fail_overdue(now)
+        if not rows:
+            return []
+
+        failed = list(Pairing.objects.filter(pk__in=[row[0] for row in rows]).values(
+            'id', 'amount_paired', 'payment_due_date', 'matured_investment_id', 'new_investment_id',
+            'matured_investment__user_id', 'matured_investment__user__username', 'matured_investment__user__email',
+            'new_investment_id__user_id', 'new_investment_id__user__username', 'new_investment_id__user__email',
+        ))
+
+        amounts = {}
+        for pairing in failed:
+            investment_id = pairing['matured_investment_id']
+            amounts[investment_id] = amounts.get(investment_id, Decimal('0')) + pairing['amount_paired']
+        _return_to_queue(amounts)
+
+        Investment.objects.filter(pk__in=amounts, status='paired').update(status='matured', paired_to=None)
+        Investment.objects.filter(
+            pk__in={pairing['new_investment_id'] for pairing in failed},
+            status='paired'
+        ).update(status='pending', paired_to=None)
+
+        user_ids = {pairing['matured_investment__user_id'] for pairing in failed}
+        user_ids |= {pairing['new_investment_id__user_id'] for pairing in failed}
+        transaction.on_commit(lambda: invalidate_user_dashboards(user_ids))
+        publish_events(
+            (pairing[side], 'pairing_failed', {'pairing_id': pairing['id']})
+            for pairing in failed
+            for side in ('matured_investment__user_id', 'new_investment_id__user_id')
+        )
+
+    logger.info(f"Expired {len(failed)} overdue pairings")
+    return [
+        {
+            'pairing_id': pairing['id'],
+            'amount': str(pairing['amount_paired']),
+            'due_date': pairing['payment_due_date'].isoformat(),
+            'matured_user': {
+                'username': pairing['matured_investment__user__username'],
+                'email': pairing['matured_investment__user__email'],
+            },
+            'new_user': {
+                'username': pairing['new_investment_id__user__username'],
+                'email': pairing['new_investment_id__user__email'],
+            },
+        }
+        for pairing in failed
+    ]
@@ -0,0 +1,74 @@
+"""
+Interest and return-amount pricing.
+
+Investments earn ``DAILY_INTEREST_RATE`` simple interest per day of their
+maturity period. There are two APIs over the same rule:
+
+* a scalar ``Decimal`` API for request paths (``calculate_interest``,
+  ``calculate_return_amount``);
+* a batched API over whole columns for bulk paths such as the test-data
+  seeding commands (``return_amounts_cents``, ``return_amounts``).
+
+Both round half up to the cent and the batched API never leaves integer
+arithmetic, so the two always agree to the cent and no float drift can
+creep into stored amounts.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+CENT = Decimal('0.01')
+
+DAILY_INTEREST_RATE = Decimal('0.02')  # 2% daily interest
+
+# Interest rate in basis points for the integer cents API
+RATE_SCALE = 10000
+DAILY_INTEREST_BP = int(DAILY_INTEREST_RATE * RATE_SCALE)
+
+
+def to_cents(amount):
+    """Convert a money amount to integer cents, rounding half up"""
+    return int((Decimal(str(amount)) / CENT).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    return (Decimal(cents) * CENT).quantize(CENT)
+
+
+def _interest_cents(amount_cents, days):
+    # Half-up rounding of amount * rate * days for non-negative operands
+    return (amount_cents * DAILY_INTEREST_BP * days * 2 + RATE_SCALE) // (2 * RATE_SCALE)
+
+
+def calculate_interest(amount, maturity_period):
+    """Interest earned by ``amount`` over ``maturity_period`` days"""
+    return from_cents(_interest_cents(to_cents(amount), int(maturity_period)))
+
+
+def calculate_return_amount(amount, maturity_period, referral_bonus=0):
+    """Principal plus interest plus any referral bonus applied to the investment"""
+    amount_cents = to_cents(amount)
+    return from_cents(
+        amount_cents + _interest_cents(amount_cents, int(maturity_period)) + to_cents(referral_bonus)
+    )
+
+
+def return_amounts_cents(amounts_cents, periods, bonuses_cents=None):
+    """Return amounts in cents for parallel columns of amounts, periods and bonuses"""
+    if bonuses_cents is None:
+        return [
+            amount + _interest_cents(amount, days)
+            for amount, days in zip(amounts_cents, periods)
+        ]
+    return [
+        amount + _interest_cents(amount, days) + bonus
+        for amount, days, bonus in zip(amounts_cents, periods, bonuses_cents)
+    ]
+
+
+def return_amounts(amounts, periods, bonuses=None):
+    """Batched ``calculate_return_amount`` over money amounts, returns Decimals"""
+    amounts_cents = [to_cents(amount) for amount in amounts]
+    bonuses_cents = None if bonuses is None else [to_cents(bonus) for bonus in bonuses]
+    return [
+        from_cents(cents)
+        for cents in return_amounts_cents(amounts_cents, periods, bonuses_cents)
+    ]
@@ -0,0 +1,135 @@
+"""
+Referral codes.
+
+New users take their code from ``next_code``. Each process reserves a block
+of ``BLOCK_SIZE`` code numbers with one ``ReferralCodeBlock`` insert and
+hands them out from memory, so concurrent registrations neither collide on
+the unique index nor retry. A number is scrambled by multiplying it by an
+odd constant modulo 32**9, which is a bijection, and written as nine
+Crockford base32 characters. Consecutive users get unrelated codes, and the
+codes can never match the eight-character ones generated before.
+
+The database can hand a rolled back block id out again, so the rest of a
+block reserved inside a transaction only joins the pool when that
+transaction commits; until then only the code returned to the caller comes
+from it.
+
+``resolve`` maps a code to its user's id through an in-process LRU cache.
+Unknown codes are cached too, for ``REFERRAL_CODE_NEGATIVE_CACHE_TIMEOUT``
+seconds, so repeated invalid codes don't reach the database.
+"""
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+
+from accounts.cache import LRUCache
+from accounts.metrics import cache_requests_total
+from accounts.models import ReferralCodeBlock, User
+
+logger = logging.getLogger(__name__)
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+CODE_LENGTH = 9
+CODE_SPACE = 32 ** CODE_LENGTH
+
+# Changing either of these would hand out codes that earlier blocks already used
+BLOCK_SIZE = 1024
+MULTIPLIER = 0x1D3F84A5B7
+
+
+def get_cache_size():
+    return getattr(settings, 'REFERRAL_CODE_CACHE_SIZE', 10000)
+
+
+def get_cache_timeout():
+    return getattr(settings, 'REFERRAL_CODE_CACHE_TIMEOUT', 300)
+
+
+def get_negative_cache_timeout():
+    return getattr(settings, 'REFERRAL_CODE_NEGATIVE_CACHE_TIMEOUT', 60)
+
+
+def encode(number):
+    """The referral code for code number ``number``"""
+    value = number * MULTIPLIER % CODE_SPACE
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+class CodePool:
+    """Code numbers of the blocks this process reserved"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._numbers = deque()
+        self._pid = os.getpid()
+
+    def take(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker must not reuse its parent's numbers
+                self._numbers.clear()
+                self._pid = os.getpid()
+            if self._numbers:
+                return self._numbers.popleft()
+        return self._reserve()
+
+    def _reserve(self):
+        block = ReferralCodeBlock.objects.create()
+        numbers = range(block.pk * BLOCK_SIZE, (block.pk + 1) * BLOCK_SIZE)
+        logger.info(f"Reserved referral code block {block.pk}")
+        transaction.on_commit(lambda: self._extend(numbers[1:]))
+        return numbers[0]
+
+    def _extend(self, numbers):
+        with self._lock:
+            if self._pid == os.getpid():
+                self._numbers.extend(numbers)
+
+    def clear(self):
+        with self._lock:
+            self._numbers.clear()
+
+
+_pool = CodePool()
+
+
+def next_code():
+    """A referral code no other user has"""
+    return encode(_pool.take())
+
+
+_lookups = LRUCache(get_cache_size())
+
+
+def normalize(code):
+    return (code or '').strip()
+
+
+def resolve(code):
+    """The id of the user whose referral code is ``code``, or None"""
+    code = normalize(code)
+    if not code:
+        return None
+    found, user_id = _lookups.get(code)
+    if found:
+        cache_requests_total.inc(namespace='referral-code', result='hit' if user_id else 'negative')
+        return user_id
+
+    cache_requests_total.inc(namespace='referral-code', result='miss')
+    user_id = User.objects.filter(referral_code=code).values_list('pk', flat=True).first()
+    timeout = get_cache_timeout() if user_id else get_negative_cache_timeout()
+    _lookups.set(code, user_id, timeout)
+    return user_id
+
+
+def forget(code):
+    """Drop ``code`` from this process's lookup cache"""
+    _lookups.delete(normalize(code))
@@ -0,0 +1,71 @@
+"""
+Payment reminder scheduling.
+
+Each open pairing carries its own reminder state: how many reminders were
+sent, when the last one went out and when the next one is due. Reminders are
+spaced by ``PAYMENT_REMINDER_INTERVALS`` (measured from the pairing, then
+from the previous reminder) and stop once the list is exhausted, so the
+periodic job only reads the rows whose indexed ``next_reminder_at`` has
+passed instead of every unpaid pairing.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from accounts.locks import write_transaction
+from accounts.models import Pairing
+
+DEFAULT_REMINDER_INTERVALS = [timedelta(hours=1), timedelta(hours=4), timedelta(hours=12)]
+
+
+def get_reminder_intervals():
+    return getattr(settings, 'PAYMENT_REMINDER_INTERVALS', DEFAULT_REMINDER_INTERVALS)
+
+
+def get_batch_size():
+    return getattr(settings, 'PAYMENT_REMINDER_BATCH_SIZE', 100)
+
+
+def next_reminder_at(reminder_count, now):
+    """When the reminder after ``reminder_count`` sent ones is due, or None when done"""
+    intervals = get_reminder_intervals()
+    if reminder_count >= len(intervals):
+        return None
+    return now + intervals[reminder_count]
+
+
+def due_reminders(now):
+    """Open, unconfirmed pairings whose next reminder is due"""
+    return Pairing.objects.filter(
+        next_reminder_at__lte=now,
+        status__in=Pairing.OPEN_STATUSES,
+        payment_status='pending',
+        is_confirmed=False
+    )
+
+
+def claim_due_reminders(now=None, batch_size=None):
+    """
+    Lock up to ``batch_size`` due reminders, advance their schedule and
+    return them with both users joined in.
+
+    Rows held by a concurrent run are skipped, and the schedule is advanced
+    before anything is sent, so each reminder is claimed by exactly one run.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or get_batch_size()
+
+    with write_transaction():
+        pairings = list(
+            due_reminders(now).select_related(
+                'matured_investment__user', 'new_investment_id__user'
+            ).select_for_update(skip_locked=True, of=('self',)).order_by('next_reminder_at', 'id')[:batch_size]
+        )
+        for pairing in pairings:
+            pairing.reminder_count += 1
+            pairing.last_reminded_at = now
+            pairing.next_reminder_at = next_reminder_at(pairing.reminder_count, now)
+        Pairing.objects.bulk_update(pairings, ['reminder_count', 'last_reminded_at', 'next_reminder_at'])
+
+    return pairings
@@ -0,0 +1,89 @@
+"""
+Read replica routing.
+
+Views wrapped in ``replica_reads`` send their reads to the
+``DATABASE_REPLICA_ALIAS`` database when it is configured. These are the
+read-only dashboard, overview, list and statement views, sync or async.
+Every other read, and every write, goes to ``default``: matching,
+payments, admission and all Celery tasks run on the primary.
+
+Replica reads can lag the primary by the replication delay. Values that get
+cached must not be built from such reads: a dashboard rebuilt right after
+an invalidation would keep the stale data for its whole timeout. Cached
+payloads are therefore built inside ``read_from_primary`` (see
+``accounts.dashboard``).
+"""
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def get_replica_alias():
+    return getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+
+
+@contextmanager
+def read_from_replica():
+    """Route reads made inside the block to the replica, if there is one"""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+@contextmanager
+def read_from_primary():
+    """Route reads made inside the block to the primary, even within ``replica_reads``"""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def replica_reads(view):
+    """View decorator running the view inside ``read_from_replica``"""
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            # Async ORM calls run in a copy of this context, so they see the flag
+            with read_from_replica():
+                return await view(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with read_from_replica():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        alias = get_replica_alias()
+        if _use_replica.get() and alias in settings.DATABASES:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        databases = {'default', get_replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema through replication
+        if db == get_replica_alias():
+            return False
+        return None
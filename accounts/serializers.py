@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from django.db import transaction
 from .models import ReferralHistory, Investment, User
 from django.utils import timezone
 from decimal import Decimal
+from .referrals import next_code, resolve
+from .services import InvestmentService
 
 User = get_user_model()
 
@@ -18,29 +19,19 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             'password': {'write_only': True},
         }
 
-    @transaction.atomic
     def create(self, validated_data):
         referral_code = validated_data.pop('referral_code', None)
-        
-        # Create user
-        user = User.objects.create_user(
+
+        # Resolve the referrer and take the new user's code up front, so
+        # creating the user is a single insert
+        return User.objects.create_user(
             username=validated_data['username'],
             email=validated_data['email'],
             phone_number=validated_data['phone_number'],
-            password=validated_data['password']
+            password=validated_data['password'],
+            referral_code=next_code(),
+            referred_by_id=resolve(referral_code)
         )
-        
-        # Handle referral if code provided
-        if referral_code:
-            try:
-                referrer = User.objects.get(referral_code=referral_code)
-                if referrer != user:  # Prevent self-referral
-                    user.referred_by = referrer
-                    user.save()
-            except User.DoesNotExist:
-                pass  # Invalid referral code, ignore
-        
-        return user
 
 class UserLoginSerializer(serializers.Serializer):
     phone_number = serializers.CharField(required=True)
@@ -107,33 +98,15 @@ class InvestmentSerializer(serializers.ModelSerializer):
         
         return value
 
-    @transaction.atomic
     def create(self, validated_data):
         """
         Create and return a new Investment instance.
         """
-        user = self.context['request'].user
-        investment = Investment.objects.create(
-            user=user,
-            **validated_data
+        return InvestmentService.place(
+            self.context['request'].user,
+            validated_data['amount'],
+            validated_data['maturity_period']
         )
-        
-        # Handle referral bonus if user was referred
-        if user.referred_by and user.referral_earnings > 0:
-            if investment.amount >= user.referral_earnings:
-                investment.referral_bonus_used = user.referral_earnings
-                user.referral_earnings = 0
-                user.save()
-                
-                # Mark referral history as used
-                ReferralHistory.objects.filter(
-                    referrer=user.referred_by,
-                    referred=user,
-                    status='pending'
-                ).update(status='used', used_at=timezone.now())
-        
-        investment.save()
-        return investment
 
 
 class ReferralHistorySerializer(serializers.ModelSerializer):
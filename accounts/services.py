@@ -0,0 +1,52 @@
+"""
+Investment placement.
+
+Every path that creates an investment goes through
+``InvestmentService.place``:
+
+* ``InvestmentCreateView`` and ``buy_shares``, directly or through the
+  admission writer;
+* ``create_investment``;
+* ``InvestmentSerializer.create``.
+
+The user's referral bonus balance is applied up to the investment amount
+and redeemed with one ``accounts.ledger`` entry, so placement takes a fixed
+number of queries.
+"""
+from decimal import Decimal
+
+from accounts import ledger
+from accounts.locks import write_transaction
+from accounts.models import Investment, User
+from accounts.pricing import calculate_return_amount
+
+
+class InvestmentService:
+
+    @staticmethod
+    def place(user, amount, maturity_period, ticket=None):
+        """
+        Create a pending investment for ``user``, redeeming their referral
+        bonus up to ``amount``. Locks the user's row for the balance update.
+        """
+        amount = Decimal(amount)
+        with write_transaction():
+            balance = User.objects.select_for_update().values_list(
+                'referral_earnings', flat=True
+            ).get(pk=user.pk)
+            bonus = min(balance, amount) if balance > 0 else Decimal('0')
+
+            investment = Investment.objects.create(
+                user=user,
+                amount=amount,
+                maturity_period=maturity_period,
+                status='pending',
+                return_amount=calculate_return_amount(amount, maturity_period, bonus),
+                referral_bonus_used=bonus,
+                ticket=ticket
+            )
+            if bonus:
+                ledger.redeem(user, bonus, investment, balance=balance)
+            else:
+                user.referral_earnings = balance
+        return investment
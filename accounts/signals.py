@@ -1,8 +1,24 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.db import transaction
+from django.conf import settings
 from decimal import Decimal
-from accounts.models import ReferralHistory, Investment
+import logging
+from accounts.models import ReferralHistory, Investment, User
+from accounts.authentication import CLAIM_FIELDS, revoke_user
+from accounts.bidding import invalidate_calendar
+from accounts.cache import track_model_versions
+from accounts.dashboard import OVERVIEW_MODELS, invalidate_user_dashboards
+from accounts.events import publish as publish_events
+from accounts.ledger import credit_referral_bonus
+from accounts.locks import write_transaction
+from accounts.referrals import forget as forget_referral_code
+from core.validators import is_within_bidding_window
+
+logger = logging.getLogger(__name__)
+
+# Move the cached system overview's key on after every change
+track_model_versions(*OVERVIEW_MODELS)
 
 @receiver(post_save, sender='accounts.Investment')
 def investment_post_save(sender, instance, created, **kwargs):
@@ -12,7 +28,7 @@ def investment_post_save(sender, instance, created, **kwargs):
     """
     if created:
         try:
-            with transaction.atomic():
+            with write_transaction():
                 # Handle new investment creation
                 # Process referral bonus for the entire chain
                 current_user = instance.user
@@ -21,21 +37,110 @@ def investment_post_save(sender, instance, created, **kwargs):
                     referrer = current_user.referred_by
                     bonus_amount = instance.amount * Decimal('0.03')  # 3% referral bonus
                     
-                    # Create referral history entry
-                    ReferralHistory.objects.create(
+                    # Create referral history entry and credit it to the referrer's ledger
+                    history = ReferralHistory.objects.create(
                         referrer=referrer,
                         referred=instance.user,
                         amount_invested=instance.amount,
                         bonus_earned=bonus_amount,
                         status='pending'
                     )
-                    
-                    # Add bonus to referrer's earnings
-                    referrer.referral_earnings += bonus_amount
-                    referrer.save()
+                    credit_referral_bonus(history)
                     
                     # Move up the chain
                     current_user = referrer
         except Exception as e:
             # Log the error but don't raise it to prevent the investment creation from failing
-            print(f"Error processing referral bonus: {str(e)}") 
\ No newline at end of file
+            print(f"Error processing referral bonus: {str(e)}") 
+
+@receiver(post_save, sender='accounts.Investment')
+def pair_investment_on_commit(sender, instance, created, **kwargs):
+    """
+    Signal handler for Investment post_save
+    - During a bidding window, match a new investment against the matured
+      queue as soon as it is committed instead of waiting for the next
+      pairing job run
+    """
+    if not created or instance.status != 'pending':
+        return
+    if not getattr(settings, 'PAIRING_ON_INVESTMENT', True) or not is_within_bidding_window():
+        return
+
+    def enqueue():
+        from accounts.tasks import pair_new_investment
+        try:
+            pair_new_investment.delay(instance.id)
+        except Exception as e:
+            logger.error(f"Failed to queue pairing for investment {instance.id}: {str(e)}")
+
+    transaction.on_commit(enqueue)
+
+@receiver(post_save, sender='accounts.BiddingHoliday')
+@receiver(post_delete, sender='accounts.BiddingHoliday')
+@receiver(post_save, sender='accounts.BiddingWindowOverride')
+@receiver(post_delete, sender='accounts.BiddingWindowOverride')
+def bidding_calendar_changed(sender, **kwargs):
+    """Rebuild the bidding calendar after a holiday or window override changes"""
+    transaction.on_commit(invalidate_calendar)
+
+@receiver(post_save, sender='accounts.Investment')
+@receiver(post_save, sender='accounts.ReferralHistory')
+@receiver(post_save, sender='accounts.Payment')
+def dashboard_data_changed(sender, instance, **kwargs):
+    """
+    Drop the cached dashboards of the users a saved row shows up for and
+    push them the change
+    """
+    if sender is Investment:
+        user_ids = [instance.user_id, instance.paired_to_id]
+        deltas = [(instance.user_id, 'investment', {'id': instance.id, 'status': instance.status})]
+    elif sender is ReferralHistory:
+        user_ids = [instance.referrer_id]
+        deltas = [(instance.referrer_id, 'referral', {'id': instance.id, 'bonus_earned': instance.bonus_earned})]
+    else:
+        user_ids = [instance.to_user_id, instance.from_user_id]
+        payment = {'id': instance.id, 'status': instance.status, 'amount': instance.amount}
+        deltas = [(user_id, 'payment', payment) for user_id in user_ids]
+    transaction.on_commit(lambda: invalidate_user_dashboards(user_ids))
+    publish_events(deltas)
+
+@receiver(post_save, sender='accounts.User')
+@receiver(post_save, sender='accounts.ClaimsUser')
+@receiver(post_delete, sender='accounts.User')
+@receiver(post_delete, sender='accounts.ClaimsUser')
+def referral_code_changed(sender, instance, update_fields=None, **kwargs):
+    """Drop a new, edited or deleted user's code from the lookup cache"""
+    if update_fields is None or 'referral_code' in update_fields:
+        forget_referral_code(instance.referral_code)
+
+@receiver(pre_save, sender='accounts.User')
+@receiver(pre_save, sender='accounts.ClaimsUser')
+def user_claims_changing(sender, instance, update_fields=None, **kwargs):
+    """Note whether a save deactivates the user or changes what their tokens claim"""
+    instance._revoke_tokens = False
+    if instance._state.adding:
+        return
+    fields = {'is_active', *CLAIM_FIELDS} - instance.get_deferred_fields()
+    if update_fields is not None:
+        fields &= set(update_fields)
+    if not fields:
+        return
+    previous = User.objects.filter(pk=instance.pk).values(*fields).first()
+    instance._revoke_tokens = previous is not None and any(
+        previous[field] != getattr(instance, field) for field in fields
+    )
+
+@receiver(post_save, sender='accounts.User')
+@receiver(post_save, sender='accounts.ClaimsUser')
+def user_claims_changed(sender, instance, **kwargs):
+    """Revoke the tokens of a user whose claims changed"""
+    if getattr(instance, '_revoke_tokens', False):
+        transaction.on_commit(lambda: revoke_user(instance.pk))
+
+@receiver(post_delete, sender='accounts.User')
+@receiver(post_delete, sender='accounts.ClaimsUser')
+def user_deleted(sender, instance, **kwargs):
+    """Revoke a deleted user's tokens"""
+    # delete() clears instance.pk before the transaction commits
+    user_id = instance.pk
+    transaction.on_commit(lambda: revoke_user(user_id))
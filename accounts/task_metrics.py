@@ -0,0 +1,182 @@
+"""
+Celery task instrumentation.
+
+Hooks ``task_prerun``/``task_postrun`` to measure runtime, broker queue wait,
+SQL query count and rows written for every task in the instrumented modules.
+Results are exported to the metrics registry of the worker process and kept
+in the rolling ``TaskRun`` table so they can be inspected from the admin.
+
+The web process's ``/metrics`` never sees a worker's registry, so with
+``TASK_METRICS_PORT`` set each worker process serves its own registry in the
+Prometheus text format on ``TASK_METRICS_ADDRESS``, at the port plus its pool
+index. Prefork children start it on ``worker_process_init``; pools that run
+tasks in the worker process itself (solo, threads, eventlet, gevent) start
+it on ``worker_ready``.
+``manage.py start_workers`` gives each queue's workers their own block of
+ports.
+"""
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from billiard.process import current_process
+from celery.concurrency.prefork import TaskPool as PreforkPool
+from celery.signals import before_task_publish, task_prerun, task_postrun, worker_process_init, worker_ready
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from accounts import metrics
+from accounts.metrics import QueryCollector
+
+logger = logging.getLogger(__name__)
+
+_runs = {}
+_runs_lock = threading.Lock()
+_exporter = None
+
+
+def get_exporter_port():
+    """Base exporter port, as set for this worker by ``start_workers`` or in settings"""
+    port = os.environ.get('TASK_METRICS_PORT') or getattr(settings, 'TASK_METRICS_PORT', None)
+    return int(port) if port else None
+
+
+def get_exporter_address():
+    return getattr(settings, 'TASK_METRICS_ADDRESS', '127.0.0.1')
+
+
+def is_instrumented(task_name):
+    prefixes = getattr(settings, 'TASK_METRICS_PREFIXES', ('accounts.tasks.', 'core.tasks.'))
+    return bool(task_name) and task_name.startswith(tuple(prefixes))
+
+
+@before_task_publish.connect
+def stamp_published_at(sender=None, headers=None, **kwargs):
+    """Stamp outgoing task messages so the worker can measure queue wait"""
+    if headers is not None and is_instrumented(sender):
+        headers.setdefault('published_at', time.time())
+
+
+@task_prerun.connect
+def start_task_run(task_id=None, task=None, **kwargs):
+    if task is None or not is_instrumented(task.name):
+        return
+
+    now = time.time()
+    queue_wait = None
+    published_at = task.request.get('published_at')
+    if published_at is not None:
+        queue_wait = max(now - float(published_at), 0.0)
+
+    # Count queries on every alias, as RequestMetricsMiddleware does
+    collector = QueryCollector()
+    for connection in connections.all():
+        connection.execute_wrappers.append(collector)
+    with _runs_lock:
+        _runs[task_id] = {
+            'collector': collector,
+            'started_at': timezone.now(),
+            'start': time.perf_counter(),
+            'queue_wait': queue_wait,
+        }
+
+
+@task_postrun.connect
+def finish_task_run(task_id=None, task=None, state=None, **kwargs):
+    with _runs_lock:
+        run = _runs.pop(task_id, None)
+    if run is None:
+        return
+
+    runtime = time.perf_counter() - run['start']
+    collector = run['collector']
+    for connection in connections.all():
+        if collector in connection.execute_wrappers:
+            connection.execute_wrappers.remove(collector)
+
+    state = state or 'UNKNOWN'
+    metrics.celery_task_runs_total.inc(task=task.name, state=state)
+    metrics.celery_task_duration_seconds.observe(runtime, task=task.name)
+    metrics.celery_task_db_queries.observe(collector.count, task=task.name)
+    metrics.celery_task_rows_touched_total.inc(collector.rows_touched, task=task.name)
+    if run['queue_wait'] is not None:
+        metrics.celery_task_queue_wait_seconds.observe(run['queue_wait'], task=task.name)
+
+    try:
+        record_task_run(
+            task_name=task.name,
+            task_id=task_id,
+            state=state,
+            started_at=run['started_at'],
+            runtime=runtime,
+            queue_wait=run['queue_wait'],
+            db_queries=collector.count,
+            db_time=collector.duration,
+            rows_touched=collector.rows_touched,
+        )
+    except Exception as e:
+        logger.error(f"Failed to record task run for {task.name}: {str(e)}")
+
+
+def record_task_run(**fields):
+    """Store a task run and trim the table to the newest TASK_METRICS_RETENTION rows per task"""
+    from accounts.models import TaskRun
+
+    TaskRun.objects.create(**fields)
+
+    retention = getattr(settings, 'TASK_METRICS_RETENTION', 500)
+    cutoff = TaskRun.objects.filter(
+        task_name=fields['task_name']
+    ).order_by('-id').values_list('id', flat=True)[retention:retention + 1]
+    cutoff = list(cutoff)
+    if cutoff:
+        TaskRun.objects.filter(task_name=fields['task_name'], id__lte=cutoff[0]).delete()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Render the worker's metrics registry for any GET"""
+
+    def do_GET(self):
+        body = metrics.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_exporter(port, address=None):
+    """Serve the metrics registry on ``port`` from a daemon thread"""
+    server = ThreadingHTTPServer((address or get_exporter_address(), port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='task-metrics-exporter', daemon=True).start()
+    return server
+
+
+@worker_process_init.connect
+def start_worker_exporter(**kwargs):
+    global _exporter
+    port = get_exporter_port()
+    if port is None or _exporter is not None:
+        return
+
+    port += getattr(current_process(), 'index', 0)
+    try:
+        _exporter = start_exporter(port)
+    except OSError as e:
+        logger.error(f"Failed to start task metrics exporter on port {port}: {str(e)}")
+    else:
+        logger.info(f"Serving task metrics on port {port}")
+
+
+@worker_ready.connect
+def start_pool_exporter(sender=None, **kwargs):
+    """Serve from the worker process itself when its pool has no child processes"""
+    if isinstance(getattr(sender, 'pool', None), PreforkPool):
+        return
+    start_worker_exporter()
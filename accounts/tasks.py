@@ -1,10 +1,11 @@
-from celery import shared_task
+from celery import chord, shared_task
 from django.utils import timezone
 from django.db import transaction, models
 from datetime import timedelta
 from decimal import Decimal
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection, send_mail
 from django.template.loader import render_to_string
+from django.utils.dateparse import parse_datetime
 from django.conf import settings
 from django.apps import apps
 import pdfkit # type: ignore
@@ -13,11 +14,19 @@ import logging
 from django.db.models import Sum, Count
 import random
 
-from accounts.models import Investment, PairedInvestment, Pairing, ReferralHistory, User
+from accounts.models import Investment, PairedInvestment, Pairing, Queue, ReferralHistory, User
+from accounts.locks import Lease, LeaseLost, get_lease_ttl, single_flight
+from accounts.pairing import expire_overdue_pairings, get_shard_count, pair_investment, pair_shard
+from accounts.archive import archive_terminal_rows
+from accounts.ledger import credit_referral_bonus, total_redeemed
+from accounts.reminders import claim_due_reminders, get_batch_size as get_reminder_batch_size
+from accounts.warmup import open_connections, warm_up
+from referral_system.celery import WORKER_POOLS
 
 logger = logging.getLogger(__name__)
 
 @shared_task
+@single_flight('maturity')
 def check_matured_investments():
     """Check for investments that have reached maturity"""
     now = timezone.now()
@@ -32,6 +41,12 @@ def check_matured_investments():
         if now >= maturity_date:
             investment.status = 'matured'
             investment.save()
+            # Join the matured-investor queue for pairing
+            Queue.objects.create(
+                user=investment.user,
+                investment=investment,
+                amount_remaining=investment.return_amount or investment.calculate_return_amount()
+            )
             # Send maturity notification
             send_maturity_notification.delay(investment.id)
 
@@ -73,9 +88,8 @@ def send_maturity_notification(investment_id=None):
                 fail_silently=False,
             )
             
-            # Mark notification as sent
-            investment.maturity_notification_sent = True
-            investment.save()
+            # Mark notification as sent without rewriting the rest of the row
+            Investment.objects.filter(pk=investment.pk).update(maturity_notification_sent=True)
             
             logger.info(f"Sent maturity notification for investment {investment.id}")
     except Exception as e:
@@ -92,19 +106,16 @@ def process_referral_bonus(investment_id):
             # Calculate referral bonus (3% of investment amount)
             bonus_amount = investment.amount * Decimal('0.03')
             
-            # Update referrer's earnings
+            # Create referral history entry and credit it to the referrer's ledger
             referrer = user.referred_by
-            referrer.referral_earnings += bonus_amount
-            referrer.save()
-            
-            # Create referral history entry
-            ReferralHistory.objects.create(
+            history = ReferralHistory.objects.create(
                 referrer=referrer,
                 referred=user,
                 amount_invested=investment.amount,
                 bonus_earned=bonus_amount,
                 status='pending'
             )
+            credit_referral_bonus(history)
             
             # Send notification
             send_referral_bonus_notification.delay(referrer.id, investment.id, float(bonus_amount))
@@ -177,6 +188,15 @@ def generate_investment_statement(investment_id):
         logger.error(f"Failed to generate investment statement for investment {investment_id}: {str(e)}")
         return None
 
+@shared_task
+def cleanup_old_queue_entries():
+    """Archive terminal queue entries, investments and pairings past the retention window"""
+    try:
+        return archive_terminal_rows()
+    except Exception as e:
+        logger.error(f"Failed to archive old rows: {str(e)}")
+        raise
+
 @shared_task
 def calculate_daily_statistics():
     """Calculate daily statistics for the system"""
@@ -186,9 +206,7 @@ def calculate_daily_statistics():
         total_amount = Investment.objects.aggregate(total=Sum('amount'))['total'] or 0
         
         # Get total referral bonuses
-        total_referral_bonuses = ReferralHistory.objects.filter(
-            status='used'
-        ).aggregate(total=Sum('bonus_earned'))['total'] or 0
+        total_referral_bonuses = total_redeemed()
         
         # Get total matured investments
         matured_investments = Investment.objects.filter(
@@ -208,105 +226,98 @@ def calculate_daily_statistics():
 @shared_task
 def run_pairing_job():
     """
-    Task to match matured investments with new investments
+    Task to match matured investments with new investments.
+
+    With PAIRING_SHARD_BOUNDARIES configured, each amount bucket is paired in
+    its own subtask and a final reconcile pass matches the leftovers. The
+    'pairing' lease is held from dispatch until the reconcile pass finishes.
     """
-    try:
-        # Get matured investments that haven't been paired yet
-        matured_investments = Investment.objects.filter(
-            status='matured',
-            paired_to__isnull=True
-        ).order_by('created_at')
+    lease = Lease.acquire('pairing', get_lease_ttl('pairing'))
+    if lease is None:
+        logger.info("Skipping pairing job: another run holds the pairing lease")
+        return
 
-        # Get new investments that are pending
-        new_investments = Investment.objects.filter(
-            status='pending'
-        ).order_by('created_at')
+    shard_count = get_shard_count()
+    try:
+        if shard_count <= 1:
+            try:
+                with lease:
+                    matches = pair_shard(0, 1, lease=lease)
+            except LeaseLost as e:
+                logger.warning(str(e))
+                return
+            send_match_notifications(matches)
+            logger.info(f"Pairing job completed successfully with {len(matches)} pairings")
+            return
 
-        # Process each matured investment
-        for matured in matured_investments:
-            remaining_return = matured.return_amount
-            matured_paired = False
+        # A failed shard skips reconcile_pairing, so its error callback
+        # releases the lease instead
+        chord(
+            pair_investment_shard.s(shard, shard_count, lease.owner, lease.token)
+            for shard in range(shard_count)
+        )(reconcile_pairing.s(lease.owner, lease.token).on_error(
+            release_pairing_lease.s(lease.owner, lease.token)
+        ))
+        logger.info(f"Dispatched {shard_count} pairing shards")
+    except Exception as e:
+        lease.release()
+        logger.error(f"Failed to run pairing job: {str(e)}")
+        raise
 
-            # Try to pair with new investments until return amount is exhausted
-            for new in new_investments:
-                if new.status == 'paired':
-                    continue
+@shared_task
+def pair_investment_shard(shard, shard_count, lease_owner, lease_token):
+    """Pair one amount bucket of the queue under the dispatching run's lease"""
+    lease = Lease('pairing', lease_owner, lease_token)
+    try:
+        matches = pair_shard(shard, shard_count, lease=lease)
+    except LeaseLost as e:
+        logger.warning(str(e))
+        return 0
+    send_match_notifications(matches)
+    return len(matches)
 
-                if remaining_return >= new.amount:
-                    # Full pairing of new investment
-                    new.status = 'paired'
-                    new.paired_to = matured.user
-                    new.paired_investment = PairedInvestment.objects.create(
-                        matured_investor=matured.user,
-                        new_investor=new.user,
-                        amount_paired=new.amount,
-                        status='paired',
-                        payment_status='pending',
-                        paired_at=timezone.now(),
+@shared_task
+def reconcile_pairing(shard_results, lease_owner, lease_token):
+    """Match leftovers across amount buckets, then release the pairing lease"""
+    lease = Lease('pairing', lease_owner, lease_token)
+    try:
+        with lease:
+            matches = pair_shard(0, 1, lease=lease)
+    except LeaseLost as e:
+        logger.warning(str(e))
+        return
+    send_match_notifications(matches)
+    logger.info(
+        f"Pairing job completed successfully: {sum(shard_results)} sharded "
+        f"and {len(matches)} reconciled pairings"
+    )
 
-                    )
-                    new.save()
-                    
-                    remaining_return -= new.amount
-                    send_pairing_notification.delay(matured.user.id, new.user.id)
-                    
-                    if remaining_return == 0:
-                        matured.status = 'paired'
-                        matured.paired_to = new.user
-                        matured.save()
-                        matured_paired = True
-                        break
-                        
-                else:
-                    
-                   
-                    
-                    # Update original new investment
-                    new.amount -= remaining_return
-                    matured.status='paired'
-                    
-                    
-                    send_pairing_notification.delay(matured.user.id, new.user.id)
-                    
-                    matured.status = 'paired'
-                    matured.paired_to = new.user
-                    matured.paired_investment = PairedInvestment.objects.create(
-                        matured_investor=matured.user,
-                        new_investor=new.user,
-                        amount_paired=new.amount,
-                        status='paired',
-                        payment_status='pending',)
-                    matured.save()
-                    matured_paired = True
-                    break
+@shared_task
+def release_pairing_lease(request, exc, traceback, lease_owner, lease_token):
+    """Chord error callback: release the pairing lease once the chord has failed"""
+    logger.error(f"Pairing job failed, releasing the pairing lease: {str(exc)}")
+    Lease('pairing', lease_owner, lease_token).release()
 
-            if not matured_paired and remaining_return > 0:
-                # Look for another matured investment to combine with
-                for other_matured in matured_investments:
-                    if other_matured != matured and other_matured.status == 'matured':
-                        combined_return = remaining_return + other_matured.return_amount
-                        # Try pairing again with combined amount
-                        for new in new_investments:
-                            if new.status != 'paired' and new.amount <= combined_return:
-                                new.status = 'paired'
-                                new.paired_to = matured.user
-                                new.save()
-                                
-                                matured.status = 'paired'
-                                matured.paired_to = new.user
-                                matured.save()
-                                
-                                other_matured.status = 'paired'
-                                other_matured.paired_to = new.user
-                                other_matured.save()
-                                
-                                send_pairing_notification.delay(matured.user.id, new.user.id)
-                                send_pairing_notification.delay(other_matured.user.id, new.user.id)
-                                break
-        logger.info("Pairing job completed successfully")
+@shared_task
+def pair_new_investment(investment_id):
+    """Match a freshly committed investment against the head of the queue"""
+    try:
+        matches = pair_investment(investment_id)
     except Exception as e:
-        logger.error(f"Failed to run pairing job: {str(e)}")
-        raise
+        # The periodic pairing job will pick the investment up
+        logger.error(f"Failed to pair investment {investment_id} on arrival: {str(e)}")
+        return 0
+    send_match_notifications(matches)
+    return len(matches)
+
+def send_match_notifications(matches):
+    """Queue one pairing notification per matured/new investor pair"""
+    notified = set()
+    for match in matches:
+        users = (match.entry.user_id, match.investment.user_id)
+        if users not in notified:
+            notified.add(users)
+            send_pairing_notification.delay(*users)
 
 @shared_task
 def send_pairing_notification(matured_user_id, new_user_id):
@@ -355,121 +366,101 @@ def send_pairing_notification(matured_user_id, new_user_id):
 
 @shared_task
 def send_payment_reminders():
-    """Send payment reminders to users who need to make payments"""
+    """Send the payment reminders that are due, one mail connection per batch"""
     try:
-        # Get all pending pairings where payment is due
-        pending_pairings = Pairing.objects.filter(
-            status='pending',
-            payment_due_date__lte=timezone.now()
-        )
-        
-        for pairing in pending_pairings:
-            # Get the users involved
-            matured_user = pairing.matured_investment.user
-            new_user = pairing.new_investment_id.user
-            
-            # Send reminder to new user
-            subject = 'Payment Reminder - Investment Pairing'
-            message = render_to_string('accounts/email/payment_reminder.txt', {
-                'user': new_user,
-                'matured_user': matured_user,
-                'amount': pairing.amount_paired,
-                'due_date': pairing.payment_due_date,
-            })
-            
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [new_user.email],
-                fail_silently=False,
-            )
-            
-            logger.info(f"Payment reminder sent to {new_user.email}")
-            
+        sent = 0
+        while True:
+            pairings = claim_due_reminders()
+            if not pairings:
+                break
+
+            messages = []
+            for pairing in pairings:
+                # Remind the new investor who owes the payment
+                new_user = pairing.new_investment_id.user
+                message = render_to_string('accounts/email/payment_reminder.txt', {
+                    'user': new_user,
+                    'matured_user': pairing.matured_investment.user,
+                    'amount': pairing.amount_paired,
+                    'due_date': pairing.payment_due_date,
+                })
+                messages.append(EmailMessage(
+                    'Payment Reminder - Investment Pairing',
+                    message,
+                    settings.DEFAULT_FROM_EMAIL,
+                    [new_user.email],
+                ))
+
+            get_connection(fail_silently=False).send_messages(messages)
+            sent += len(messages)
+            if len(pairings) < get_reminder_batch_size():
+                break
+
+        logger.info(f"Sent {sent} payment reminders")
+        return sent
     except Exception as e:
         logger.error(f"Error sending payment reminders: {str(e)}")
         raise
 
 @shared_task
 def check_admin_pairing():
-    """Check for admin pairing requests and process them"""
+    """Fail overdue pairings and return their investments to the pool"""
     try:
-        # Get all pending pairings that need admin review
-        pending_pairings = Pairing.objects.filter(
-            status='pending',
-            is_confirmed=False
-        ).select_related(
-            'matured_investment',
-            'new_investment_id',
-            'matured_investment__user',
-            'new_investment_id__user'
-        )
-        
-        for pairing in pending_pairings:
-            # Check if payment is overdue
-            if pairing.payment_due_date and pairing.payment_due_date <= timezone.now():
-                # Update pairing status to failed
-                pairing.status = 'failed'
-                pairing.save()
-                
-                # Send notification to both users
-                send_pairing_failed_notification.delay(
-                    pairing.matured_investment.user.id,
-                    pairing.new_investment_id.user.id,
-                    pairing.id
-                )
-                
-                logger.info(f"Pairing {pairing.id} marked as failed due to overdue payment")
-            
-        logger.info("Admin pairing check completed")
+        failures = expire_overdue_pairings()
+        if failures:
+            send_pairing_failed_notifications.delay(failures)
+        logger.info(f"Admin pairing check completed: {len(failures)} pairings failed")
     except Exception as e:
         logger.error(f"Error in check_admin_pairing: {str(e)}")
         raise
 
 @shared_task
-def send_pairing_failed_notification(matured_user_id, new_user_id, pairing_id):
-    """Send notification when a pairing fails"""
-    try:
-        matured_user = User.objects.get(id=matured_user_id)
-        new_user = User.objects.get(id=new_user_id)
-        pairing = Pairing.objects.get(id=pairing_id)
-        
-        # Send notification to matured user
-        subject = 'Pairing Failed - Payment Overdue'
-        message = render_to_string('accounts/email/pairing_failed.txt', {
-            'user': matured_user,
-            'new_user': new_user,
-            'amount': pairing.amount_paired,
-            'due_date': pairing.payment_due_date,
-        })
-        
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [matured_user.email],
-            fail_silently=False,
-        )
-        
-        # Send notification to new user
-        subject = 'Pairing Failed - Payment Overdue'
-        message = render_to_string('accounts/email/pairing_failed.txt', {
-            'user': new_user,
-            'matured_user': matured_user,
-            'amount': pairing.amount_paired,
-            'due_date': pairing.payment_due_date,
-        })
-        
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [new_user.email],
-            fail_silently=False,
-        )
-        
-        logger.info(f"Pairing failed notifications sent for pairing {pairing_id}")
-    except Exception as e:
-        logger.error(f"Error sending pairing failed notifications: {str(e)}")
-        raise 
\ No newline at end of file
+def send_pairing_failed_notifications(failures):
+    """Send notifications for failed pairings from the payloads built at expiry"""
+    subject = 'Pairing Failed - Payment Overdue'
+    failed = 0
+    for failure in failures:
+        due_date = parse_datetime(failure['due_date'])
+        # Notify both sides, each naming the other party; one failed send
+        # must not keep the others from going out
+        for user, other_user in (
+            (failure['matured_user'], failure['new_user']),
+            (failure['new_user'], failure['matured_user']),
+        ):
+            try:
+                message = render_to_string('accounts/email/pairing_failed.txt', {
+                    'user': user,
+                    'other_user': other_user,
+                    'amount': failure['amount'],
+                    'due_date': due_date,
+                })
+                send_mail(
+                    subject,
+                    message,
+                    settings.DEFAULT_FROM_EMAIL,
+                    [user['email']],
+                    fail_silently=False,
+                )
+            except Exception as e:
+                failed += 1
+                logger.error(
+                    f"Error sending pairing failed notification for pairing {failure['pairing_id']} "
+                    f"to {user['email']}: {str(e)}"
+                )
+        logger.info(f"Pairing failed notifications processed for pairing {failure['pairing_id']}")
+    return failed
+
+@shared_task
+def warm_up_bidding_window():
+    """Warm caches and connections a few minutes before a bidding window opens"""
+    summary = warm_up()
+    # One connection warm-up per pool process of every worker that serves the peak
+    for queue, pool in WORKER_POOLS.items():
+        for _ in range(pool['concurrency']):
+            warm_connections.apply_async(queue=queue)
+    return summary
+
+@shared_task
+def warm_connections():
+    """Open this worker process's database and broker connections"""
+    return open_connections()
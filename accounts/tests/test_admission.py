@@ -0,0 +1,170 @@
+import os
+import uuid
+from decimal import Decimal
+from unittest import mock, skipUnless
+import redis
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from accounts import admission
+from accounts.admission import RedisStreamIntake, apply_orders, drain, get_intake, process_batch, submit_order
+from accounts.ledger import credit_referral_bonus
+from accounts.models import User, Investment, ReferralHistory
+
+REDIS_URL = os.environ.get('INVESTMENT_INTAKE_TEST_URL', 'redis://localhost:6379/15')
+
+
+def redis_available():
+    try:
+        return redis.Redis.from_url(REDIS_URL, socket_connect_timeout=0.5).ping()
+    except redis.RedisError:
+        return False
+
+
+class AdmissionTestMixin:
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='investor',
+            email='investor@example.com',
+            phone_number='0712345690',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def order(self, **kwargs):
+        order = {
+            'ticket': str(uuid.uuid4()),
+            'user_id': self.user.pk,
+            'amount': '500.00',
+            'maturity_period': 3,
+        }
+        order.update(kwargs)
+        return order
+
+
+@override_settings(INVESTMENT_INTAKE_URL=None)
+class InvestmentAdmissionTest(AdmissionTestMixin, TestCase):
+    def test_order_is_placed_without_intake(self):
+        """Test orders are placed in the request when no durable intake is configured"""
+        self.assertIsNone(get_intake())
+
+        response = self.client.post('/api/investments/create/', {'amount': '500.00', 'maturity_period': 3})
+
+        self.assertEqual(response.status_code, 201)
+        investment = Investment.objects.get()
+        self.assertEqual(response.data['investment']['id'], investment.id)
+        self.assertEqual(investment.return_amount, Decimal('530.00'))
+
+    def test_writer_applies_referral_bonus(self):
+        """Test the referral bonus balance is redeemed when the order is placed"""
+        referred = User.objects.create_user(
+            username='referred',
+            email='referred@example.com',
+            phone_number='0712345691',
+            password='testpass123'
+        )
+        for bonus in ('30.00', '20.00'):
+            credit_referral_bonus(ReferralHistory.objects.create(
+                referrer=self.user, referred=referred, amount_invested=Decimal('1000.00'),
+                bonus_earned=Decimal(bonus), status='pending'
+            ))
+
+        apply_orders([self.order()])
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.referral_earnings, Decimal('0'))
+        self.assertEqual(Investment.objects.get().referral_bonus_used, Decimal('50.00'))
+
+    def test_redelivered_order_is_placed_once(self):
+        """Test an order applied again after its batch committed is not placed twice"""
+        order = self.order()
+        apply_orders([order])
+        statuses = apply_orders([order])
+
+        self.assertEqual(Investment.objects.count(), 1)
+        self.assertEqual(statuses[order['ticket']]['status'], 'placed')
+
+    def test_rejected_order_does_not_undo_batch(self):
+        """Test an order that cannot be placed is rejected on its own"""
+        rejected, placed = self.order(user_id=self.user.pk + 100), self.order()
+        statuses = apply_orders([rejected, placed])
+
+        self.assertEqual(statuses[rejected['ticket']]['status'], 'rejected')
+        self.assertEqual(statuses[placed['ticket']]['status'], 'placed')
+        self.assertEqual(Investment.objects.count(), 1)
+
+    def test_other_users_ticket_is_not_found(self):
+        """Test a ticket can only be polled by the user who submitted it"""
+        ticket = self.order()['ticket']
+        apply_orders([self.order(ticket=ticket)])
+        other = User.objects.create_user(
+            username='other',
+            email='other@example.com',
+            phone_number='0712345692',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=other)
+
+        response = self.client.get(f'/api/investments/orders/{ticket}/')
+        self.assertEqual(response.status_code, 404)
+
+
+@skipUnless(redis_available(), f'No Redis server at {REDIS_URL}')
+class StreamIntakeTest(AdmissionTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        stream = f'investment-orders-test-{uuid.uuid4()}'
+        settings = override_settings(INVESTMENT_INTAKE_URL=REDIS_URL, INVESTMENT_INTAKE_STREAM=stream)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(admission._intakes.clear)
+        self.addCleanup(redis.Redis.from_url(REDIS_URL).delete, stream)
+
+    def test_order_is_queued_then_placed(self):
+        """Test the create endpoint returns a ticket and the writer places the order"""
+        response = self.client.post('/api/investments/create/', {'amount': '500.00', 'maturity_period': 3})
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Investment.objects.exists())
+
+        status_url = response.data['status_url']
+        self.assertEqual(self.client.get(status_url).data['status'], 'queued')
+
+        self.assertEqual(drain(), 1)
+        investment = Investment.objects.get()
+        self.assertEqual(str(investment.ticket), response.data['ticket'])
+        self.assertEqual(investment.return_amount, Decimal('530.00'))
+
+        data = self.client.get(status_url).data
+        self.assertEqual(data['status'], 'placed')
+        self.assertEqual(data['investment']['id'], investment.id)
+
+    @override_settings(INVESTMENT_INTAKE_BATCH_SIZE=2)
+    def test_orders_are_applied_in_batches(self):
+        """Test each batch holds at most INVESTMENT_INTAKE_BATCH_SIZE orders"""
+        for _ in range(3):
+            submit_order(self.user, Decimal('100.00'), 1)
+
+        self.assertEqual(process_batch(), 2)
+        self.assertEqual(process_batch(), 1)
+        self.assertEqual(process_batch(), 0)
+
+    def test_order_survives_intake_restart(self):
+        """Test an order read by a writer that died is placed by the next one"""
+        response = self.client.post('/api/investments/create/', {'amount': '500.00', 'maturity_period': 3})
+        self.assertEqual(response.status_code, 202)
+
+        # The first writer claims the order and dies before its batch commits
+        self.assertEqual(len(get_intake().read(10)), 1)
+        admission._intakes.clear()
+
+        restarted = RedisStreamIntake(REDIS_URL, admission.get_stream())
+        restarted.consumer = 'restarted-writer'
+        self.assertEqual(restarted.read(10, block=None), [])
+        with mock.patch('accounts.admission.RECLAIM_IDLE_MS', 0):
+            self.assertEqual(drain(restarted), 1)
+
+        investment = Investment.objects.get()
+        self.assertEqual(str(investment.ticket), response.data['ticket'])
+        self.assertEqual(drain(restarted), 0)
@@ -0,0 +1,134 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.models import (
+    User, Investment, Queue, Pairing, ArchivedInvestment, ArchivedPairing, ReferralLedgerEntry
+)
+from accounts.dashboard import build_system_overview, build_user_dashboard
+from accounts.tasks import cleanup_old_queue_entries
+
+
+@override_settings(ARCHIVE_RETENTION_DAYS=30, ARCHIVE_BATCH_SIZE=2)
+class ArchiveTest(TestCase):
+    def setUp(self):
+        self.old = timezone.now() - timedelta(days=40)
+        self.user1 = User.objects.create_user(
+            username='testuser1',
+            email='test1@example.com',
+            phone_number='0712345678',
+            password='testpass123'
+        )
+        self.user2 = User.objects.create_user(
+            username='testuser2',
+            email='test2@example.com',
+            phone_number='0787654321',
+            password='testpass123'
+        )
+
+    def create_investment(self, user, status, created_at=None):
+        investment = Investment.objects.create(
+            user=user,
+            amount=Decimal('1000.00'),
+            maturity_period=1,
+            status=status,
+            return_amount=Decimal('1020.00')
+        )
+        Investment.objects.filter(pk=investment.pk).update(created_at=created_at or self.old)
+        return investment
+
+    def test_terminal_rows_are_archived(self):
+        """Test that settled pairings and completed investments move to the archive"""
+        matured = self.create_investment(self.user1, 'completed')
+        new = self.create_investment(self.user2, 'completed')
+        entry = Queue.objects.create(user=self.user1, investment=matured, amount_remaining=Decimal('0'))
+        Queue.objects.filter(pk=entry.pk).update(created_at=self.old)
+        pairing = Pairing.objects.create(
+            matured_investment=matured,
+            new_investment_id=new,
+            amount_paired=Decimal('1000.00')
+        )
+        Pairing.objects.filter(pk=pairing.pk).update(paired_at=self.old, payment_status='paid')
+
+        counts = cleanup_old_queue_entries()
+
+        self.assertEqual(counts['queue_entries'], 1)
+        self.assertEqual(counts['pairings'], 1)
+        self.assertEqual(counts['investments'], 2)
+        self.assertFalse(Investment.objects.filter(pk__in=[matured.pk, new.pk]).exists())
+        self.assertEqual(ArchivedInvestment.objects.get(pk=matured.pk).return_amount, Decimal('1020.00'))
+        archived_pairing = ArchivedPairing.objects.get(pk=pairing.pk)
+        self.assertEqual(archived_pairing.new_investment_id, new.pk)
+
+    def test_archived_investments_still_count(self):
+        """Test dashboards, the overview and the ledger keep archived investments"""
+        self.create_investment(self.user1, 'completed')
+        live = self.create_investment(self.user1, 'completed', created_at=timezone.now())
+        redeemed = self.create_investment(self.user2, 'completed')
+        entry = ReferralLedgerEntry.objects.create(
+            user=self.user2, kind='adjustment', amount=Decimal('0'), balance=Decimal('0'), investment=redeemed
+        )
+        before = build_user_dashboard(self.user1), build_system_overview()
+
+        self.assertEqual(cleanup_old_queue_entries()['investments'], 2)
+
+        dashboard, overview = build_user_dashboard(self.user1), build_system_overview()
+        self.assertEqual(dashboard['statistics'], before[0]['statistics'])
+        self.assertEqual(dashboard['investments']['by_status'], before[0]['investments']['by_status'])
+        self.assertEqual(overview['user_details'], before[1]['user_details'])
+        self.assertEqual(dashboard['investments']['by_status']['completed'], 2)
+        self.assertEqual(dashboard['statistics']['total_returns'], 2040.0)
+        self.assertEqual(overview['investment_statistics']['total_investments'], 3)
+        self.assertTrue(Investment.objects.filter(pk=live.pk).exists())
+        entry.refresh_from_db()
+        self.assertEqual(entry.investment_id, redeemed.pk)
+
+    def test_live_rows_are_kept(self):
+        """Test that recent, open or still referenced rows stay in the live tables"""
+        recent = self.create_investment(self.user1, 'completed', created_at=timezone.now())
+        pending = self.create_investment(self.user1, 'pending')
+        owed = self.create_investment(self.user1, 'completed')
+        entry = Queue.objects.create(user=self.user1, investment=owed, amount_remaining=Decimal('500.00'))
+        Queue.objects.filter(pk=entry.pk).update(created_at=self.old)
+        referenced = self.create_investment(self.user2, 'completed')
+        pairing = Pairing.objects.create(
+            matured_investment=referenced,
+            new_investment_id=pending,
+            amount_paired=Decimal('1000.00')
+        )
+        Pairing.objects.filter(pk=pairing.pk).update(paired_at=self.old)
+
+        counts = cleanup_old_queue_entries()
+
+        self.assertEqual(sum(counts.values()), 0)
+        self.assertEqual(Investment.objects.count(), 4)
+        self.assertTrue(Queue.objects.filter(pk=entry.pk).exists())
+        self.assertTrue(Pairing.objects.filter(pk=pairing.pk).exists())
+        self.assertTrue(Investment.objects.filter(pk=recent.pk).exists())
+
+    def test_batches_cover_all_rows(self):
+        """Test that rows beyond the first batch are archived too"""
+        for _ in range(5):
+            self.create_investment(self.user1, 'completed')
+
+        counts = cleanup_old_queue_entries()
+
+        self.assertEqual(counts['investments'], 5)
+        self.assertEqual(ArchivedInvestment.objects.count(), 5)
+        # Running again is a no-op
+        self.assertEqual(cleanup_old_queue_entries()['investments'], 0)
+
+    def test_archived_investment_statement(self):
+        """Test that statements are still available for archived investments"""
+        investment = self.create_investment(self.user1, 'completed')
+        cleanup_old_queue_entries()
+        token = RefreshToken.for_user(self.user1).access_token
+
+        response = self.client.get(
+            f'/api/investments/{investment.pk}/statement/',
+            HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
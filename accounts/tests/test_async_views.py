@@ -0,0 +1,98 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from accounts import authentication
+from accounts.authentication import ClaimsRefreshToken
+from accounts.dashboard import build_system_overview
+from accounts.models import Investment, Payment, Queue, ReferralHistory, User
+
+
+class AsyncViewsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        authentication._revocations.clear()
+        self.user = User.objects.create_user(
+            username='async', email='async@example.com', password='testpass123', phone_number='0712345040'
+        )
+        self.other = User.objects.create_user(
+            username='other', email='other@example.com', password='testpass123', phone_number='0712345041'
+        )
+        matured = Investment.objects.create(
+            user=self.user, amount=Decimal('500.00'), maturity_period=1, status='matured'
+        )
+        Investment.objects.create(user=self.user, amount=Decimal('300.00'), maturity_period=1, status='pending')
+        Investment.objects.create(user=self.other, amount=Decimal('200.00'), maturity_period=1, status='completed')
+        Queue.objects.create(user=self.user, investment=matured, amount_remaining=Decimal('600.00'))
+        Payment.objects.create(from_user=self.other, to_user=self.user, amount=Decimal('200.00'))
+        ReferralHistory.objects.create(
+            referrer=self.user, referred=self.other, amount_invested=Decimal('200.00'),
+            bonus_earned=Decimal('20.00'), status='pending'
+        )
+
+        token = ClaimsRefreshToken.for_user(self.user).access_token
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    async def assert_same_payload(self, sync_url, async_url):
+        cache.clear()
+        response = await self.async_client.get(async_url, headers=self.headers)
+        cache.clear()
+        expected = (await self.async_client.get(sync_url, headers=self.headers)).json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected)
+        return expected
+
+    async def test_dashboard_matches_sync_view(self):
+        """Test the async dashboard renders the same payload as the sync one"""
+        dashboard = await self.assert_same_payload('/api/user-dashboard/', '/api/async/user-dashboard/')
+        self.assertEqual(dashboard['investments']['by_status'], {'completed': 0, 'pending': 1, 'paired': 0, 'matured': 1})
+        self.assertEqual(dashboard['statistics']['pending_payments'], 1)
+        self.assertEqual(dashboard['statistics']['active_investments'], 1)
+
+    async def test_overview_matches_sync_view(self):
+        """Test the async overview renders the same payload as the sync one"""
+        overview = await self.assert_same_payload('/api/system-overview/', '/api/async/system-overview/')
+        self.assertEqual(overview['queue_statistics']['total_entries'], 1)
+
+    async def test_lists_match_sync_views(self):
+        """Test the async lists render the same rows as the sync ones"""
+        investments = await self.assert_same_payload('/api/investments/', '/api/async/investments/')
+        self.assertEqual(len(investments), 2)
+        referrals = await self.assert_same_payload('/api/referrals/', '/api/async/referrals/')
+        self.assertEqual(len(referrals), 1)
+
+    async def test_requests_without_token_are_rejected(self):
+        """Test the async endpoints require a valid token"""
+        response = await self.async_client.get('/api/async/user-dashboard/')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+
+        response = await self.async_client.get('/api/async/investments/', headers={'Authorization': 'Bearer nonsense'})
+        self.assertEqual(response.status_code, 401)
+
+        response = await self.async_client.post('/api/async/investments/', headers=self.headers)
+        self.assertEqual(response.status_code, 405)
+
+    def test_overview_is_built_with_grouped_queries(self):
+        """Test the overview runs a fixed number of queries whatever the number of users"""
+        with self.assertNumQueries(9):
+            overview = build_system_overview()
+        for n in range(5):
+            user = User.objects.create_user(
+                username=f'extra{n}', email=f'extra{n}@example.com', password='testpass123',
+                phone_number=f'071234505{n}'
+            )
+            Investment.objects.create(user=user, amount=Decimal('100.00'), maturity_period=1)
+        with self.assertNumQueries(9):
+            build_system_overview()
+
+        self.assertEqual([user['username'] for user in overview['user_details']], ['async', 'other'])
+        details = overview['user_details'][0]
+        self.assertEqual(details['total_investments'], 2)
+        self.assertEqual(list(details['investments_by_status']), ['pending', 'matured'])
+        self.assertEqual(details['investments_by_status']['matured'], {'count': 1, 'total': 500.0})
+        self.assertEqual(details['payments']['received'], {'count': 1, 'total': 200.0})
+        self.assertEqual(details['payments']['made'], {'count': 0, 'total': 0})
+        self.assertEqual(overview['investment_statistics']['total_investments'], 3)
@@ -0,0 +1,101 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts import authentication
+from accounts.authentication import ClaimsRefreshToken, claims_user, get_revoked_at
+from accounts.models import User
+
+
+class ClaimsAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        authentication._revocations.clear()
+        self.user = User.objects.create_user(
+            username='claims', email='claims@example.com', password='testpass123', phone_number='0712345030'
+        )
+        self.client = APIClient()
+
+    def authorize(self, age=0):
+        """Authenticate the client with a token issued ``age`` seconds ago"""
+        refresh = ClaimsRefreshToken.for_user(self.user)
+        refresh['auth_time'] -= age
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_cached_endpoint_runs_no_auth_query(self):
+        """Test a request with a claims token does not load the user"""
+        self.authorize()
+        self.assertEqual(self.client.get('/api/user-dashboard/').status_code, 200)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/user-dashboard/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_tokens_without_claims_still_work(self):
+        """Test tokens issued before the claims were added load the user"""
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        response = self.client.get('/api/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'claims')
+
+    def test_other_fields_load_together(self):
+        """Test the first unclaimed field touched loads the rest in one query"""
+        user = claims_user(self.user.pk, {
+            'phone_number': self.user.phone_number,
+            'referral_code': self.user.referral_code,
+            'is_staff': False,
+        })
+
+        with self.assertNumQueries(0):
+            self.assertEqual(user.phone_number, '0712345030')
+            self.assertTrue(user.is_authenticated)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.username, 'claims')
+            self.assertEqual(user.email, 'claims@example.com')
+            self.assertEqual(user.referral_earnings, 0)
+
+    def test_deactivation_revokes_tokens(self):
+        """Test tokens issued before a user was deactivated are rejected"""
+        self.authorize(age=10)
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        self.assertEqual(self.client.get('/api/profile/').status_code, 401)
+
+    def test_claim_changes_revoke_but_other_updates_do_not(self):
+        """Test a profile edit keeps the token until a claimed field changes"""
+        self.authorize(age=10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/api/profile/', {'email': 'new@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/profile/', {'phone_number': '0712345031'})
+        self.assertEqual(self.client.get('/api/profile/').status_code, 401)
+
+    def test_revocations_survive_losing_the_cache(self):
+        """Test a revocation still applies once the shared cache has lost it"""
+        self.authorize(age=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        cache.clear()
+        authentication._revocations.clear()
+        self.assertEqual(self.client.get('/api/user-dashboard/').status_code, 401)
+
+    def test_unrevoked_users_are_looked_up_once(self):
+        """Test a cache miss reads the revocation table once and caches the answer"""
+        with self.assertNumQueries(1):
+            self.assertIsNone(get_revoked_at(self.user.pk))
+
+        authentication._revocations.clear()
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_revoked_at(self.user.pk))
@@ -0,0 +1,94 @@
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from accounts.bidding import BiddingCalendar, get_calendar, invalidate_calendar
+from accounts.models import BiddingHoliday, BiddingWindowOverride
+from core.validators import validate_bidding_window
+
+NAIROBI = ZoneInfo('Africa/Nairobi')
+
+
+@override_settings(BIDDING_TIME_ZONE='Africa/Nairobi', BIDDING_CALENDAR_DAYS=7)
+class BiddingCalendarTest(TestCase):
+    def setUp(self):
+        invalidate_calendar()
+        self.today = date(2026, 3, 2)
+
+    def at(self, day, hour, minute=0):
+        return datetime(2026, 3, day, hour, minute, tzinfo=NAIROBI)
+
+    def test_open_and_current_window(self):
+        """Test windows are open inclusively in the configured time zone"""
+        calendar = BiddingCalendar.build(self.today)
+
+        self.assertTrue(calendar.is_open(self.at(2, 9, 0)))
+        self.assertTrue(calendar.is_open(self.at(2, 9, 40)))
+        self.assertFalse(calendar.is_open(self.at(2, 9, 41)))
+        self.assertEqual(calendar.current_window_id(self.at(2, 17, 10)), '2026-03-02-evening')
+        # 09:10 UTC is 12:10 in Nairobi
+        self.assertFalse(calendar.is_open(datetime(2026, 3, 2, 9, 10, tzinfo=ZoneInfo('UTC'))))
+
+    def test_next_window(self):
+        """Test the next window is later today or the first window of a later day"""
+        calendar = BiddingCalendar.build(self.today)
+
+        self.assertEqual(calendar.next_window(self.at(2, 8)).id, '2026-03-02-morning')
+        self.assertEqual(calendar.next_window(self.at(2, 9, 10)).id, '2026-03-02-evening')
+        self.assertEqual(calendar.next_window(self.at(2, 18)).id, '2026-03-03-morning')
+
+    def test_holidays_and_overrides(self):
+        """Test holidays close a day and overrides replace its default windows"""
+        BiddingHoliday.objects.create(date=date(2026, 3, 3), name='Public holiday')
+        BiddingWindowOverride.objects.create(
+            date=date(2026, 3, 4), name='extended', start='10:00', end='12:00'
+        )
+        calendar = BiddingCalendar.build(self.today)
+
+        self.assertEqual(calendar.windows_on(date(2026, 3, 3)), ())
+        self.assertEqual([w.name for w in calendar.windows_on(date(2026, 3, 4))], ['extended'])
+        self.assertEqual(calendar.next_window(self.at(2, 18)).id, '2026-03-04-extended')
+        self.assertTrue(calendar.is_open(self.at(4, 11)))
+        self.assertFalse(calendar.is_open(self.at(4, 9, 10)))
+
+    def test_shared_calendar_is_cached(self):
+        """Test lookups after the first build run no queries"""
+        now = self.at(2, 9, 10)
+        get_calendar(now)
+        with self.assertNumQueries(0):
+            self.assertTrue(get_calendar(now).is_open(now))
+            self.assertIsNotNone(get_calendar(now).next_window(now))
+
+        invalidate_calendar()
+        with self.assertNumQueries(2):
+            get_calendar(now)
+
+    def test_validator_uses_calendar(self):
+        """Test validate_bidding_window follows the calendar, holidays included"""
+        now = timezone.now()
+        BiddingWindowOverride.objects.create(
+            date=now.astimezone(NAIROBI).date(), name='all-day', start='00:00', end='23:59:59.999999'
+        )
+        invalidate_calendar()
+        validate_bidding_window()
+
+        BiddingWindowOverride.objects.all().delete()
+        BiddingHoliday.objects.create(date=now.astimezone(NAIROBI).date())
+        invalidate_calendar()
+        with self.assertRaises(ValidationError):
+            validate_bidding_window()
+
+    def test_endpoint_sets_cache_headers(self):
+        """Test the public endpoint reports the calendar and is cacheable until the next change"""
+        response = self.client.get('/api/bidding-windows/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['time_zone'], 'Africa/Nairobi')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=', response['Cache-Control'])
+        self.assertIn('Expires', response)
+        max_age = int(response['Cache-Control'].split('max-age=')[1].split(',')[0])
+        self.assertLessEqual(max_age, 300)
+        self.assertTrue(response.data['windows'])
+        self.assertIsNotNone(response.data['next_window'])
@@ -0,0 +1,134 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from redis.exceptions import ConnectionError as RedisConnectionError
+from rest_framework.test import APIClient
+
+from accounts import cache as cache_helpers
+from accounts.cache import FallbackCache, get_or_set, set_value, versioned_key
+from accounts.metrics import cache_fallback_total, cache_requests_total, registry
+from accounts.models import Investment, Payment, User
+
+
+class GetOrSetTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+
+    def test_value_is_computed_once(self):
+        """Test a cached value is served without calling the builder again"""
+        builder = mock.Mock(return_value={'total': 3})
+
+        self.assertEqual(get_or_set('totals:1', builder, 60), {'total': 3})
+        self.assertEqual(get_or_set('totals:1', builder, 60), {'total': 3})
+        builder.assert_called_once()
+        self.assertEqual(cache_requests_total.get(namespace='totals', result='miss'), 1)
+        self.assertEqual(cache_requests_total.get(namespace='totals', result='hit'), 1)
+
+    def test_expensive_value_is_recomputed_early(self):
+        """Test a value close to expiry relative to its build time is recomputed ahead of time"""
+        set_value('totals:1', 'old', 1, delta=5.0)
+
+        with mock.patch('accounts.cache.random.random', return_value=0.5):
+            self.assertEqual(get_or_set('totals:1', lambda: 'new', 60), 'new')
+            self.assertEqual(get_or_set('totals:1', lambda: 'newer', 60), 'new')
+        self.assertEqual(cache_requests_total.get(namespace='totals', result='early'), 1)
+
+        set_value('totals:1', 'old', 1, delta=5.0)
+        self.assertEqual(get_or_set('totals:1', lambda: 'new', 60, beta=0), 'old')
+
+    def test_cold_key_waits_for_the_lock_holder(self):
+        """Test a reader that loses the lock race gets the winner's value"""
+        cache.add('totals:1:lock', 1, 10)
+        builder = mock.Mock(return_value='mine')
+
+        with mock.patch('accounts.cache.time.sleep', side_effect=lambda _: set_value('totals:1', 'theirs', 60)):
+            self.assertEqual(get_or_set('totals:1', builder, 60), 'theirs')
+        builder.assert_not_called()
+        self.assertEqual(cache_requests_total.get(namespace='totals', result='wait'), 1)
+
+        cache.clear()
+        cache.add('totals:1:lock', 1, 10)
+        with override_settings(CACHE_LOCK_TIMEOUT=0):
+            self.assertEqual(get_or_set('totals:1', builder, 60), 'mine')
+
+    def test_lock_is_released_when_the_builder_fails(self):
+        """Test a failing builder does not leave other readers waiting"""
+        with self.assertRaises(ValueError):
+            get_or_set('totals:1', mock.Mock(side_effect=ValueError), 60)
+        self.assertIsNone(cache.get('totals:1:lock'))
+
+
+class FallbackCacheTest(SimpleTestCase):
+    def setUp(self):
+        registry.clear()
+        caches['local'].clear()
+        self.cache = FallbackCache('', {'OPTIONS': {'PRIMARY': 'redis', 'FALLBACK': 'local', 'RETRY_AFTER': 30}})
+
+    def test_unreachable_primary_falls_back(self):
+        """Test calls go to the local cache, without retrying Redis, while Redis is down"""
+        with mock.patch.object(caches['redis'], 'set', side_effect=RedisConnectionError) as redis_set, \
+                mock.patch.object(caches['redis'], 'get') as redis_get:
+            self.cache.set('key', 'value', 60)
+            self.assertEqual(self.cache.get('key'), 'value')
+        redis_set.assert_called_once()
+        redis_get.assert_not_called()
+        self.assertEqual(caches['local'].get('key'), 'value')
+        self.assertEqual(cache_fallback_total.get(alias='local'), 2)
+
+    def test_primary_is_retried(self):
+        """Test Redis is used again once the retry delay has passed"""
+        with mock.patch.object(caches['redis'], 'get', side_effect=RedisConnectionError):
+            self.cache.get('key')
+        self.cache._down_until = 0.0
+        with mock.patch.object(caches['redis'], 'get', return_value='remote') as redis_get:
+            self.assertEqual(self.cache.get('key'), 'remote')
+        redis_get.assert_called_once()
+
+
+class VersionedKeyTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='overview', password='testpass123', phone_number='0712345001', is_staff=True
+        )
+        self.payer = User.objects.create_user(
+            username='payer', password='testpass123', phone_number='0712345002'
+        )
+        Payment.objects.create(
+            from_user=self.payer, to_user=self.user, amount=Decimal('100.00'), status='pending'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_committed_save_moves_the_key_on(self):
+        """Test saving a tracked model changes the keys versioned by it"""
+        key = versioned_key('system-overview', Investment, Payment)
+        self.assertEqual(versioned_key('system-overview', Investment, Payment), key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Investment.objects.create(user=self.user, amount=Decimal('300.00'), maturity_period=1)
+        self.assertNotEqual(versioned_key('system-overview', Investment, Payment), key)
+
+    def test_evicted_version_does_not_restart(self):
+        """Test a lost version counter never reuses a version handed out before"""
+        key = versioned_key('system-overview', Investment)
+        cache.delete(cache_helpers.VERSION_KEY.format(label='accounts.investment'))
+        self.assertNotEqual(versioned_key('system-overview', Investment), key)
+
+    def test_system_overview_is_cached_until_data_changes(self):
+        """Test the overview is served from cache and rebuilt after a save"""
+        response = self.client.get('/api/system-overview/')
+        self.assertEqual(response.data['payment_statistics']['total_payments'], 1)
+
+        with self.assertNumQueries(0):
+            self.client.get('/api/system-overview/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(
+                from_user=self.payer, to_user=self.user, amount=Decimal('50.00'), status='pending'
+            )
+        response = self.client.get('/api/system-overview/')
+        self.assertEqual(response.data['payment_statistics']['total_payments'], 2)
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.bidding import BiddingCalendar
+from accounts.cashflow import project_cashflow
+from accounts.models import User, Investment, BiddingHoliday
+
+
+class CashflowProjectionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.make_aware(datetime(2026, 3, 2, 8, 0))
+        self.user = User.objects.create_user(
+            username='testuser1',
+            email='test1@example.com',
+            phone_number='0712345678',
+            password='testpass123'
+        )
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            phone_number='0700000000',
+            password='adminpass123'
+        )
+
+    def create_investment(self, matures_at, amount='1000.00', status='pending'):
+        investment = Investment.objects.create(
+            user=self.user,
+            amount=Decimal(amount),
+            maturity_period=1,
+            status=status
+        )
+        Investment.objects.filter(pk=investment.pk).update(maturity_date=matures_at)
+        return investment
+
+    def at(self, day, hour, minute=0):
+        return timezone.make_aware(datetime(2026, 3, day, hour, minute))
+
+    def test_maturity_date_is_set_on_save(self):
+        """Test maturity_date and return_amount are filled in on save"""
+        investment = Investment.objects.create(
+            user=self.user, amount=Decimal('100.00'), maturity_period=5
+        )
+        self.assertAlmostEqual(
+            investment.maturity_date, investment.created_at + timedelta(days=5), delta=timedelta(seconds=1)
+        )
+        self.assertEqual(investment.return_amount, Decimal('110.00'))
+
+    def test_buckets_by_bidding_window(self):
+        """Test maturities are summed into the window that pays them out"""
+        self.create_investment(self.at(2, 8, 30))                      # morning window, same day
+        self.create_investment(self.at(2, 9, 20))                      # inside the morning window
+        self.create_investment(self.at(2, 12, 0), amount='500.00')     # evening window
+        self.create_investment(self.at(2, 20, 0), amount='250.00')     # next morning
+        self.create_investment(self.at(2, 10, 0), status='completed')  # no longer owed
+        self.create_investment(self.at(20, 10, 0))                     # beyond the horizon
+
+        calendar = BiddingCalendar.build(self.now.date())
+        with self.assertNumQueries(1):
+            projection = project_cashflow(7, now=self.now, calendar=calendar)
+
+        self.assertEqual(
+            [(w['window_start'], w['investments'], w['amount']) for w in projection['windows']],
+            [
+                (self.at(2, 9).isoformat(), 2, '2040.00'),
+                (self.at(2, 17).isoformat(), 1, '510.00'),
+                (self.at(3, 9).isoformat(), 1, '255.00'),
+            ]
+        )
+        self.assertEqual(projection['total_amount'], '2805.00')
+
+    def test_endpoint_validates_horizon_and_caches(self):
+        """Test the endpoint is admin-only, validates horizon and serves from cache"""
+        url = '/api/cashflow-projection/'
+        user_token = RefreshToken.for_user(self.user).access_token
+        response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {user_token}')
+        self.assertEqual(response.status_code, 403)
+
+        token = RefreshToken.for_user(self.admin).access_token
+        response = self.client.get(url, {'horizon': 'soon'}, HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(url, {'horizon': 1000}, HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 400)
+
+        self.create_investment(timezone.now() + timedelta(days=1))
+        response = self.client.get(url, {'horizon': 3}, HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['horizon_days'], 3)
+        self.assertEqual(response.data['total_amount'], '1020.00')
+
+        self.create_investment(timezone.now() + timedelta(days=1))
+        response = self.client.get(url, {'horizon': 3}, HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.data['total_amount'], '1020.00')
+
+    def test_holiday_moves_maturities_to_the_next_open_window(self):
+        """Test maturities due on a holiday are settled in the first window after it"""
+        BiddingHoliday.objects.create(date=self.now.date(), name='Public holiday')
+        self.create_investment(self.at(2, 8, 30))
+        self.create_investment(self.at(2, 12, 0))
+
+        projection = project_cashflow(7, now=self.now, calendar=BiddingCalendar.build(self.now.date()))
+
+        self.assertEqual(
+            [(w['window_id'], w['investments']) for w in projection['windows']],
+            [('2026-03-03-morning', 2)]
+        )
@@ -0,0 +1,131 @@
+import threading
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from accounts import authentication
+from accounts.authentication import ClaimsRefreshToken
+from accounts.events import RedisBroker, aredeem_ticket, get_broker, issue_ticket, publish
+from accounts.models import Investment, Payment, Queue, User
+from accounts.pairing import pair_investment
+
+
+@override_settings(EVENTS_BROKER='local', EVENTS_QUEUE_SIZE=3)
+class EventsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        authentication._revocations.clear()
+        self.users = [
+            User.objects.create_user(
+                username=f'events{i}', email=f'events{i}@example.com', password='testpass123',
+                phone_number=f'071234506{i}'
+            )
+            for i in range(2)
+        ]
+
+    def commit(self, action):
+        """Run ``action`` and its on-commit callbacks"""
+        with self.captureOnCommitCallbacks(execute=True):
+            return action()
+
+    async def test_events_reach_subscribers_from_other_threads(self):
+        """Test a delta published from a worker thread reaches only its user's stream"""
+        async with get_broker().subscribe(self.users[0].pk) as subscription:
+            thread = threading.Thread(target=self.commit, args=(lambda: publish([
+                (self.users[1].pk, 'payment', {'id': 1}),
+                (self.users[0].pk, 'payment', {'id': 2}),
+            ]),))
+            thread.start()
+            thread.join()
+
+            self.assertEqual(await subscription.get(1), {'event': 'payment', 'data': {'id': 2}})
+            self.assertIsNone(await subscription.get(0.01))
+
+    async def test_slow_stream_is_told_to_resync(self):
+        """Test a stream that falls too far behind gets a resync instead of its backlog"""
+        async with get_broker().subscribe(self.users[0].pk) as subscription:
+            get_broker().publish([(self.users[0].pk, {'event': 'payment', 'data': {'id': n}}) for n in range(4)])
+
+            self.assertEqual(await subscription.get(1), {'event': 'resync', 'data': {}})
+            self.assertIsNone(await subscription.get(0.01))
+
+    async def test_redis_outage_delivers_in_process(self):
+        """Test events still reach this process's streams while Redis is down"""
+        broker = RedisBroker('redis://localhost:1/0', retry_after=30)
+        with mock.patch.object(RedisBroker, 'start'):
+            async with broker.subscribe(self.users[0].pk) as subscription:
+                broker.publish([(self.users[0].pk, {'event': 'investment', 'data': {'id': 1}})])
+                self.assertEqual(await subscription.get(1), {'event': 'investment', 'data': {'id': 1}})
+
+    async def test_payment_and_pairing_sites_publish(self):
+        """Test saved payments and new pairings are pushed to both users"""
+        def pair():
+            investment = Investment.objects.create(
+                user=self.users[0], amount=Decimal('300.00'), maturity_period=1, status='matured'
+            )
+            Queue.objects.create(user=self.users[0], investment=investment, amount_remaining=Decimal('300.00'))
+            new = Investment.objects.create(
+                user=self.users[1], amount=Decimal('300.00'), maturity_period=1, status='pending'
+            )
+            return investment, new, self.commit(lambda: pair_investment(new.pk))
+
+        async with get_broker().subscribe(self.users[0].pk) as matured, \
+                get_broker().subscribe(self.users[1].pk) as paying:
+            investment, new, matches = await sync_to_async(pair)()
+            self.assertEqual(len(matches), 1)
+
+            self.assertEqual(await matured.get(1), {
+                'event': 'paired', 'data': {'investment_id': investment.pk, 'amount': Decimal('300.00')}
+            })
+            self.assertEqual(await paying.get(1), {
+                'event': 'paired', 'data': {'investment_id': new.pk, 'amount': Decimal('300.00')}
+            })
+
+            payment = await sync_to_async(self.commit)(lambda: Payment.objects.create(
+                from_user=self.users[1], to_user=self.users[0], amount=Decimal('300.00')
+            ))
+            delta = {'event': 'payment', 'data': {'id': payment.pk, 'status': 'pending', 'amount': Decimal('300.00')}}
+            self.assertEqual(await matured.get(1), delta)
+            self.assertEqual(await paying.get(1), delta)
+
+    @override_settings(EVENTS_HEARTBEAT_INTERVAL=0.01, EVENTS_STREAM_TIMEOUT=1)
+    async def test_stream_sends_events(self):
+        """Test the event stream opens with a ticket and sends SSE frames"""
+        token = ClaimsRefreshToken.for_user(self.users[0]).access_token
+        response = await self.async_client.post('/api/events/ticket/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 201)
+        ticket = response.json()['ticket']
+
+        response = await self.async_client.get(f'/api/events/?ticket={ticket}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        self.assertEqual(await anext(stream), b': keep-alive\n\n')
+        get_broker().publish([(self.users[0].pk, {'event': 'referral', 'data': {'id': 1, 'bonus_earned': Decimal('9.00')}})])
+        frame = await anext(stream)
+        while frame == b': keep-alive\n\n':
+            frame = await anext(stream)
+        self.assertEqual(frame, b'event: referral\ndata: {"id": 1, "bonus_earned": 9.0}\n\n')
+        await stream.aclose()
+
+    async def test_stream_rejects_tokens_and_used_tickets(self):
+        """Test the stream takes only an unused ticket, never the access token"""
+        token = ClaimsRefreshToken.for_user(self.users[0]).access_token
+        response = await self.async_client.get(f'/api/events/?token={token}')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/api/events/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 401)
+
+        response = await self.async_client.post('/api/events/ticket/')
+        self.assertEqual(response.status_code, 401)
+
+        ticket = await sync_to_async(issue_ticket)(self.users[0].pk)
+        self.assertEqual(await aredeem_ticket(ticket), self.users[0].pk)
+        self.assertIsNone(await aredeem_ticket(ticket))
+        response = await self.async_client.get(f'/api/events/?ticket={ticket}')
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,62 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.utils import timezone
+from accounts import ledger
+from accounts.models import User, Investment, ReferralHistory, ReferralLedgerEntry
+
+
+class ReferralLedgerTest(TestCase):
+    def setUp(self):
+        self.referrer = User.objects.create_user(
+            username='referrer',
+            email='referrer@example.com',
+            phone_number='0712345710',
+            password='testpass123'
+        )
+        self.referred = User.objects.create_user(
+            username='referred',
+            email='referred@example.com',
+            phone_number='0712345711',
+            password='testpass123',
+        )
+        self.referred.referred_by = self.referrer
+        self.referred.save()
+
+    def test_referral_bonus_is_credited(self):
+        """Test a referred investment appends a bonus entry without touching history status"""
+        Investment.objects.create(user=self.referred, amount=Decimal('1000.00'), maturity_period=1)
+
+        history = ReferralHistory.objects.get()
+        entry = ReferralLedgerEntry.objects.get(user=self.referrer)
+        self.assertEqual(entry.kind, 'bonus')
+        self.assertEqual(entry.referral, history)
+        self.assertEqual(entry.balance, Decimal('30.00'))
+        self.assertEqual(ledger.get_balance(self.referrer), Decimal('30.00'))
+        self.assertEqual(history.status, 'pending')
+
+    def test_running_balance(self):
+        """Test each entry records the balance after it and overdrafts are refused"""
+        ledger.append_entry(self.referrer, 'bonus', Decimal('30.00'))
+        ledger.append_entry(self.referrer, 'bonus', Decimal('20.00'))
+        ledger.append_entry(self.referrer, 'redemption', Decimal('-45.00'))
+
+        self.assertEqual(
+            list(ReferralLedgerEntry.objects.values_list('balance', flat=True)),
+            [Decimal('30.00'), Decimal('50.00'), Decimal('5.00')]
+        )
+        with self.assertRaises(ledger.InsufficientBalance):
+            ledger.append_entry(self.referrer, 'redemption', Decimal('-10.00'))
+        self.assertEqual(ledger.get_balance(self.referrer), Decimal('5.00'))
+
+    def test_statement_range(self):
+        """Test a statement carries the balance from before its range"""
+        now = timezone.now()
+        for days_ago, kind, amount in ((10, 'bonus', '30.00'), (5, 'bonus', '20.00'), (1, 'redemption', '-15.00')):
+            ledger.append_entry(self.referrer, kind, Decimal(amount), now=now - timedelta(days=days_ago))
+
+        opening_balance, entries = ledger.statement(self.referrer, now - timedelta(days=7), now - timedelta(days=2))
+        self.assertEqual(opening_balance, Decimal('30.00'))
+        self.assertEqual([entry.amount for entry in entries], [Decimal('20.00')])
+
+        self.assertEqual(ledger.total_redeemed(), Decimal('15.00'))
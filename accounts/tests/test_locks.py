@@ -0,0 +1,58 @@
+from unittest import mock
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from accounts.models import TaskLease
+from accounts.locks import Lease, single_flight
+from accounts.tasks import run_pairing_job
+
+
+class LeaseTest(TestCase):
+    def test_second_acquire_is_refused(self):
+        """Test that a held lease cannot be acquired again"""
+        lease = Lease.acquire('pairing')
+        self.assertIsNotNone(lease)
+        self.assertIsNone(Lease.acquire('pairing'))
+        self.assertTrue(lease.is_held())
+
+    def test_release_bumps_fencing_token(self):
+        """Test that every acquisition gets a higher fencing token"""
+        first = Lease.acquire('pairing')
+        first.release()
+        second = Lease.acquire('pairing')
+
+        self.assertIsNotNone(second)
+        self.assertGreater(second.token, first.token)
+        self.assertFalse(first.is_held())
+
+    def test_expired_lease_is_taken_over(self):
+        """Test that an expired lease can be taken over and the old holder is fenced off"""
+        stale = Lease.acquire('maturity')
+        TaskLease.objects.filter(name='maturity').update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        fresh = Lease.acquire('maturity')
+        self.assertIsNotNone(fresh)
+        self.assertFalse(stale.is_held())
+        self.assertFalse(stale.renew())
+
+        stale.release()
+        self.assertTrue(fresh.is_held())
+
+    def test_single_flight_skips_overlapping_run(self):
+        """Test that a job is skipped while another run holds its lease"""
+        job = mock.Mock(return_value='done', __name__='job')
+        wrapped = single_flight('pairing')(job)
+
+        with Lease.acquire('pairing'):
+            self.assertIsNone(wrapped())
+        job.assert_not_called()
+
+        self.assertEqual(wrapped(), 'done')
+        self.assertIsNone(Lease.acquire('pairing').release())
+
+    def test_pairing_task_is_single_flight(self):
+        """Test that run_pairing_job does not scan while the pairing lease is held"""
+        with Lease.acquire('pairing'):
+            with mock.patch('accounts.tasks.pair_shard') as pair_shard:
+                run_pairing_job()
+        pair_shard.assert_not_called()
@@ -0,0 +1,92 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.login import HashingPool, HashingPoolFull
+from accounts.models import User
+from accounts.throttling import parse_rate
+
+THROTTLES = {
+    'DEFAULT_AUTHENTICATION_CLASSES': ('rest_framework_simplejwt.authentication.JWTAuthentication',),
+    'DEFAULT_THROTTLE_RATES': {'login_ip': '100/min', 'login_phone': '2/min'},
+}
+
+
+class LoginTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='login', email='login@example.com', password='testpass123', phone_number='0712345020'
+        )
+        self.client = APIClient()
+
+    def login(self, password='testpass123', phone_number='0712345020', **extra):
+        return self.client.post('/api/login/', {'phone_number': phone_number, 'password': password}, **extra)
+
+    def test_login_returns_tokens(self):
+        """Test valid credentials get tokens and wrong or unknown ones a 401"""
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.data)
+
+        self.assertEqual(self.login(password='wrongpass').status_code, 401)
+        self.assertEqual(self.login(phone_number='0712349999').status_code, 401)
+
+    def test_outdated_hash_is_upgraded(self):
+        """Test a PBKDF2 password is rehashed with Argon2 on login"""
+        User.objects.filter(pk=self.user.pk).update(
+            password=make_password('testpass123', hasher='pbkdf2_sha256')
+        )
+
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('argon2$argon2id$'))
+        self.assertTrue(self.user.check_password('testpass123'))
+
+    @override_settings(REST_FRAMEWORK=THROTTLES)
+    def test_phone_throttle_rejects_before_hashing(self):
+        """Test attempts over the per-phone rate get a 429 without checking the password"""
+        self.assertEqual(self.login(password='wrongpass').status_code, 401)
+        self.assertEqual(self.login(password='wrongpass', REMOTE_ADDR='10.0.0.2').status_code, 401)
+
+        with mock.patch('accounts.login.verify_password') as verify:
+            response = self.login(REMOTE_ADDR='10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        verify.assert_not_called()
+
+        self.assertEqual(self.login(phone_number='0712345021').status_code, 401)
+
+    def test_full_pool_turns_logins_away(self):
+        """Test a login gets a 503 when the hashing pool has no room"""
+        with mock.patch('accounts.login.get_pool') as get_pool:
+            get_pool.return_value.run.side_effect = HashingPoolFull
+            response = self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+
+class HashingPoolTest(SimpleTestCase):
+    def test_pool_is_bounded(self):
+        """Test work beyond the workers and backlog is refused at once"""
+        pool = HashingPool(workers=1, backlog=1)
+        release = threading.Event()
+        running = [pool.submit(release.wait), pool.submit(release.wait)]
+
+        with self.assertRaises(HashingPoolFull):
+            pool.submit(release.wait)
+
+        release.set()
+        for future in running:
+            future.result(1)
+        self.assertEqual(pool.run(sum, [1, 2]), 3)
+        pool.shutdown()
+
+    def test_parse_rate(self):
+        """Test a DRF rate becomes a bucket capacity and refill speed"""
+        self.assertEqual(parse_rate('5/min'), (5, 5 / 60))
+        self.assertEqual(parse_rate('2/s'), (2, 2))
@@ -0,0 +1,82 @@
+from asgiref.sync import iscoroutinefunction
+from django.core.handlers.base import BaseHandler
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.models import User
+from accounts import metrics
+from accounts.middleware import RequestMetricsMiddleware
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        metrics.registry.clear()
+        self.user = User.objects.create_user(
+            username='testuser1',
+            email='test1@example.com',
+            phone_number='0712345678',
+            password='testpass123'
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def test_server_timing_header_on_api_view(self):
+        """Test that DRF views get a Server-Timing header and recorded metrics"""
+        response = self.client.get('/api/referrals/', **self.auth)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Server-Timing', response)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertEqual(
+            metrics.http_requests_total.get(view='referral_list', method='GET', status=200), 1
+        )
+        count, _ = metrics.http_request_db_queries.get(view='referral_list')
+        self.assertEqual(count, 1)
+
+    def test_metrics_endpoint_renders_registry(self):
+        """Test that /metrics exposes the recorded metrics in text format"""
+        self.client.get('/api/referrals/', **self.auth)
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_requests_total{view="referral_list",method="GET",status="200"} 1', body)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_metrics_endpoint_is_local_only(self):
+        """Test that /metrics rejects clients outside the allowed addresses"""
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(REQUEST_QUERY_BUDGET=1)
+    def test_query_budget_exceeded_is_logged(self):
+        """Test that requests over the query budget are logged and counted"""
+        with self.assertLogs('accounts.middleware', level='WARNING') as logs:
+            self.client.get('/api/referrals/', **self.auth)
+
+        self.assertIn('Query budget exceeded', logs.output[0])
+        self.assertEqual(metrics.http_query_budget_exceeded_total.get(view='referral_list'), 1)
+
+    @override_settings(DEBUG=True)
+    def test_async_chain_is_not_adapted(self):
+        """Test the middleware runs async under ASGI instead of being wrapped in a thread"""
+        with self.assertNoLogs('django.request', level='DEBUG'):
+            BaseHandler().load_middleware(is_async=True)
+
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(RequestMetricsMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(RequestMetricsMiddleware(lambda request: HttpResponse())))
+
+    async def test_async_requests_are_recorded(self):
+        """Test DRF views served over ASGI still get their metrics"""
+        response = await self.async_client.get('/api/referrals/', headers={'Authorization': self.auth['HTTP_AUTHORIZATION']})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Server-Timing', response)
+        count, _ = metrics.http_request_db_queries.get(view='referral_list')
+        self.assertEqual(count, 1)
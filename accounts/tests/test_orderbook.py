@@ -0,0 +1,141 @@
+import random
+from decimal import Decimal
+from django.test import TestCase, SimpleTestCase
+from accounts.models import User, Investment, Queue
+from accounts.orderbook import FenwickTree, MaxSegmentTree, OrderBook
+
+
+class FenwickTreeTest(SimpleTestCase):
+    def test_prefix_and_lower_bound_match_brute_force(self):
+        """Test prefix sums and search against a plain list"""
+        rng = random.Random(42)
+        values = [rng.randint(0, 5) for _ in range(50)]
+        tree = FenwickTree(values)
+
+        for _ in range(100):
+            index = rng.randrange(len(values))
+            delta = rng.randint(0, values[index])
+            values[index] -= delta
+            tree.add(index, -delta)
+
+            for end in range(len(values) + 1):
+                self.assertEqual(tree.prefix(end), sum(values[:end]))
+            target = rng.randint(1, max(sum(values), 1))
+            if target <= sum(values):
+                expected = next(i for i in range(len(values)) if sum(values[:i + 1]) >= target)
+                self.assertEqual(tree.lower_bound(target), expected)
+
+
+class MaxSegmentTreeTest(SimpleTestCase):
+    def test_first_at_least_matches_brute_force(self):
+        """Test first-fit search against a plain list"""
+        rng = random.Random(7)
+        values = [rng.randint(0, 20) for _ in range(37)]
+        tree = MaxSegmentTree(values)
+
+        for _ in range(200):
+            index = rng.randrange(len(values))
+            values[index] = rng.randint(0, values[index])
+            tree.update(index, values[index])
+
+            target = rng.randint(1, 21)
+            start = rng.randrange(len(values) + 1)
+            expected = next((i for i in range(start, len(values)) if values[i] >= target), None)
+            self.assertEqual(tree.first_at_least(target, start), expected)
+
+
+class OrderBookTest(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f'testuser{i}',
+                email=f'test{i}@example.com',
+                phone_number=f'071234567{i}',
+                password='testpass123'
+            )
+            for i in range(3)
+        ]
+        self.entries = [
+            self.add_to_queue(self.users[0], '300.00'),
+            self.add_to_queue(self.users[1], '0.00'),
+            self.add_to_queue(self.users[1], '500.00'),
+            self.add_to_queue(self.users[2], '250.50'),
+        ]
+
+    def add_to_queue(self, user, amount):
+        investment = Investment.objects.create(
+            user=user,
+            amount=Decimal(amount) or Decimal('1.00'),
+            maturity_period=1,
+            status='matured'
+        )
+        return Queue.objects.create(user=user, investment=investment, amount_remaining=Decimal(amount))
+
+    def test_load_skips_exhausted_entries(self):
+        """Test that the book is rebuilt from open entries only"""
+        book = OrderBook.load()
+
+        self.assertEqual(len(book.entries), 3)
+        self.assertEqual(book.total, Decimal('1050.50'))
+
+    def test_take_from_head_in_fifo_order(self):
+        """Test that takes consume the oldest entries first and skip exhausted ones"""
+        book = OrderBook(self.entries)
+
+        taken = book.take(Decimal('400.00'))
+
+        self.assertEqual(taken, [
+            (self.entries[0], Decimal('300.00')),
+            (self.entries[2], Decimal('100.00')),
+        ])
+        self.assertEqual(book.head, 2)
+        self.assertEqual(book.remaining(self.entries[2]), Decimal('400.00'))
+
+    def test_take_skips_excluded_user(self):
+        """Test that an investor's own entries are skipped"""
+        book = OrderBook(self.entries)
+
+        taken = book.take(Decimal('600.00'), exclude_user=self.users[1].id)
+
+        self.assertEqual([entry for entry, _ in taken], [self.entries[0], self.entries[3]])
+        self.assertEqual(sum(amount for _, amount in taken), Decimal('550.50'))
+        self.assertEqual(book.total, Decimal('500.00'))
+
+    def test_len_counts_open_entries(self):
+        """Test that exhausted entries drop out of the book's length"""
+        book = OrderBook(self.entries)
+        self.assertEqual(len(book), 3)
+
+        book.take(Decimal('300.00'))
+        self.assertEqual(len(book), 2)
+
+    def test_best_fit(self):
+        """Test that the oldest entry covering the amount is chosen"""
+        book = OrderBook(self.entries)
+
+        self.assertEqual(book.best_fit(Decimal('250.00')), self.entries[0])
+        self.assertEqual(book.best_fit(Decimal('300.01')), self.entries[2])
+        self.assertIsNone(book.best_fit(Decimal('500.01')))
+        self.assertEqual(book.best_fit(Decimal('250.00'), exclude_user=self.users[0].id), self.entries[2])
+        self.assertIsNone(book.best_fit(Decimal('300.01'), exclude_user=self.users[1].id))
+
+        entry, amount = book.take_best_fit(Decimal('300.00'))
+        self.assertEqual((entry, amount), (self.entries[0], Decimal('300.00')))
+        self.assertEqual(book.head, 2)
+        self.assertEqual(book.best_fit(Decimal('250.00'), exclude_user=self.users[1].id), self.entries[3])
+        self.assertEqual(book.total, Decimal('750.50'))
+
+    def test_flush_writes_behind(self):
+        """Test that balances only reach the Queue table on flush"""
+        book = OrderBook.load()
+        book.take(Decimal('350.00'))
+
+        self.entries[2].refresh_from_db()
+        self.assertEqual(self.entries[2].amount_remaining, Decimal('500.00'))
+
+        self.assertEqual(book.flush(), 2)
+        self.entries[0].refresh_from_db()
+        self.entries[2].refresh_from_db()
+        self.assertEqual(self.entries[0].amount_remaining, Decimal('0.00'))
+        self.assertEqual(self.entries[2].amount_remaining, Decimal('450.00'))
+        self.assertEqual(book.flush(), 0)
@@ -0,0 +1,368 @@
+from unittest import mock
+from datetime import timedelta
+from decimal import Decimal
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from accounts.models import User, Investment, Queue, Pairing
+from accounts.locks import Lease
+from accounts.pairing import (
+    match, pair_shard, pair_investment, amount_range, expire_overdue_pairings, supports_update_returning
+)
+from accounts.tasks import (
+    run_pairing_job, pair_investment_shard, reconcile_pairing, pair_new_investment,
+    check_admin_pairing, send_pairing_failed_notifications
+)
+
+
+@mock.patch('accounts.tasks.send_pairing_notification.delay')
+class PairingEngineTest(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f'testuser{i}',
+                email=f'test{i}@example.com',
+                phone_number=f'071234567{i}',
+                password='testpass123'
+            )
+            for i in range(4)
+        ]
+
+    def add_to_queue(self, user, amount):
+        investment = Investment.objects.create(
+            user=user,
+            amount=amount,
+            maturity_period=1,
+            status='matured',
+            return_amount=amount
+        )
+        return Queue.objects.create(user=user, investment=investment, amount_remaining=amount)
+
+    def invest(self, user, amount):
+        return Investment.objects.create(
+            user=user,
+            amount=amount,
+            maturity_period=1,
+            status='pending',
+            return_amount=amount * Decimal('1.02')
+        )
+
+    def test_match_splits_in_fifo_order(self, mock_delay):
+        """Test that an investment is split across queue entries in FIFO order"""
+        first = self.add_to_queue(self.users[0], Decimal('300.00'))
+        second = self.add_to_queue(self.users[1], Decimal('500.00'))
+        investment = self.invest(self.users[2], Decimal('600.00'))
+
+        matches, book = match([first, second], [investment])
+
+        self.assertEqual([(m.entry, m.amount) for m in matches], [
+            (first, Decimal('300.00')),
+            (second, Decimal('300.00')),
+        ])
+        self.assertEqual(book.remaining(second), Decimal('200.00'))
+
+    def test_match_skips_own_queue_entry(self, mock_delay):
+        """Test that an investor is never paired with their own queue entry"""
+        own = self.add_to_queue(self.users[0], Decimal('500.00'))
+        other = self.add_to_queue(self.users[1], Decimal('500.00'))
+        investment = self.invest(self.users[0], Decimal('500.00'))
+
+        matches, _ = match([own, other], [investment])
+
+        self.assertEqual([m.entry for m in matches], [other])
+
+    def test_pair_shard_persists_matches(self, mock_delay):
+        """Test that pairings, queue balances and statuses are written"""
+        entry = self.add_to_queue(self.users[0], Decimal('1000.00'))
+        small = self.invest(self.users[1], Decimal('400.00'))
+        large = self.invest(self.users[2], Decimal('800.00'))
+
+        matches = pair_shard()
+
+        self.assertEqual(len(matches), 2)
+        entry.refresh_from_db()
+        small.refresh_from_db()
+        large.refresh_from_db()
+        self.assertEqual(entry.amount_remaining, Decimal('0.00'))
+        self.assertEqual(small.status, 'paired')
+        self.assertEqual(small.paired_to, self.users[0])
+        # Only 600 of 800 could be covered, the rest waits for the next run
+        self.assertEqual(large.status, 'pending')
+        self.assertEqual(
+            Pairing.objects.get(new_investment_id=large).amount_paired, Decimal('600.00')
+        )
+        self.assertEqual(Investment.objects.get(pk=entry.investment_id).status, 'paired')
+
+        # A later run covers the remainder without re-pairing what was already matched
+        self.add_to_queue(self.users[3], Decimal('500.00'))
+        pair_shard()
+        large.refresh_from_db()
+        self.assertEqual(large.status, 'paired')
+        self.assertEqual(Pairing.objects.filter(new_investment_id=large).count(), 2)
+
+    @override_settings(PAIRING_SHARD_BOUNDARIES=[1000])
+    def test_shards_are_disjoint_and_reconciled(self, mock_delay):
+        """Test that each shard only pairs its amount bucket and reconcile pairs the rest"""
+        self.assertEqual(amount_range(0, 2), (None, Decimal('1000')))
+        self.assertEqual(amount_range(1, 2), (Decimal('1000'), None))
+
+        small_entry = self.add_to_queue(self.users[0], Decimal('500.00'))
+        large_entry = self.add_to_queue(self.users[1], Decimal('2000.00'))
+        small = self.invest(self.users[2], Decimal('1500.00'))
+
+        lease = Lease.acquire('pairing')
+        self.assertEqual(pair_investment_shard(0, 2, lease.owner, lease.token), 0)
+        self.assertEqual(pair_investment_shard(1, 2, lease.owner, lease.token), 1)
+        large_entry.refresh_from_db()
+        self.assertEqual(large_entry.amount_remaining, Decimal('500.00'))
+        small_entry.refresh_from_db()
+        self.assertEqual(small_entry.amount_remaining, Decimal('500.00'))
+
+        small_bid = self.invest(self.users[3], Decimal('800.00'))
+        reconcile_pairing([0, 1], lease.owner, lease.token)
+
+        small_bid.refresh_from_db()
+        self.assertEqual(small_bid.status, 'paired')
+        self.assertFalse(lease.is_held())
+
+    @override_settings(PAIRING_SHARD_BOUNDARIES=[1000])
+    def test_shard_with_lost_lease_writes_nothing(self, mock_delay):
+        """Test that a shard whose lease was taken over rolls back"""
+        self.add_to_queue(self.users[0], Decimal('500.00'))
+        self.invest(self.users[1], Decimal('500.00'))
+
+        lease = Lease.acquire('pairing')
+        lease.release()
+
+        self.assertEqual(pair_investment_shard(0, 2, lease.owner, lease.token), 0)
+        self.assertFalse(Pairing.objects.exists())
+
+    @override_settings(PAIRING_SHARD_BOUNDARIES=[1000])
+    def test_failed_shard_keeps_lease(self, mock_delay):
+        """Test that a shard raising leaves the lease to its siblings and the chord"""
+        lease = Lease.acquire('pairing')
+
+        with mock.patch('accounts.tasks.pair_shard', side_effect=RuntimeError('database is locked')):
+            with self.assertRaises(RuntimeError):
+                pair_investment_shard(0, 2, lease.owner, lease.token)
+
+        self.assertTrue(lease.is_held())
+        mock_delay.assert_not_called()
+
+    @override_settings(PAIRING_SHARD_BOUNDARIES=[1000])
+    def test_failed_chord_releases_lease(self, mock_delay):
+        """Test that the chord's error callback frees the lease the skipped reconcile pass would have released"""
+        with mock.patch('accounts.tasks.chord') as mock_chord:
+            run_pairing_job()
+        body = mock_chord.return_value.call_args[0][0]
+        lease = Lease('pairing', *body.args)
+        self.assertTrue(lease.is_held())
+
+        # Called the way Celery calls a chord body's errbacks
+        errback, = body.options['link_error']
+        errback(mock.Mock(), RuntimeError('database is locked'), None)
+
+        self.assertFalse(lease.is_held())
+        self.assertIsNotNone(Lease.acquire('pairing'))
+
+    @override_settings(PAIRING_SHARD_BOUNDARIES=[])
+    def test_run_pairing_job_unsharded(self, mock_delay):
+        """Test that the job pairs in-process without shards and notifies both users"""
+        self.add_to_queue(self.users[0], Decimal('500.00'))
+        self.invest(self.users[1], Decimal('500.00'))
+
+        run_pairing_job()
+
+        self.assertEqual(Pairing.objects.count(), 1)
+        mock_delay.assert_called_once_with(self.users[0].id, self.users[1].id)
+        self.assertIsNotNone(Lease.acquire('pairing'))
+
+    @override_settings(PAIRING_SHARD_BOUNDARIES=[])
+    def test_run_pairing_job_unsharded_checks_lease(self, mock_delay):
+        """Test that an unsharded run whose lease was lost writes nothing"""
+        self.add_to_queue(self.users[0], Decimal('500.00'))
+        self.invest(self.users[1], Decimal('500.00'))
+
+        with mock.patch.object(Lease, 'is_held', return_value=False):
+            run_pairing_job()
+
+        self.assertFalse(Pairing.objects.exists())
+        mock_delay.assert_not_called()
+
+    def test_pair_investment_reads_only_queue_head(self, mock_delay):
+        """Test that a new investment is matched against the oldest entries it needs"""
+        first = self.add_to_queue(self.users[0], Decimal('300.00'))
+        second = self.add_to_queue(self.users[1], Decimal('300.00'))
+        untouched = self.add_to_queue(self.users[3], Decimal('300.00'))
+        investment = self.invest(self.users[2], Decimal('500.00'))
+
+        matches = pair_investment(investment.id)
+
+        self.assertEqual([m.entry.pk for m in matches], [first.pk, second.pk])
+        investment.refresh_from_db()
+        self.assertEqual(investment.status, 'paired')
+        untouched.refresh_from_db()
+        self.assertEqual(untouched.amount_remaining, Decimal('300.00'))
+
+        # Already paired investments are left alone
+        self.assertEqual(pair_investment(investment.id), [])
+
+    def test_pair_new_investment_notifies(self, mock_delay):
+        """Test that the arrival task notifies both investors"""
+        self.add_to_queue(self.users[0], Decimal('500.00'))
+        investment = self.invest(self.users[1], Decimal('500.00'))
+
+        self.assertEqual(pair_new_investment(investment.id), 1)
+        mock_delay.assert_called_once_with(self.users[0].id, self.users[1].id)
+
+    @mock.patch('accounts.signals.is_within_bidding_window', return_value=True)
+    @mock.patch('accounts.tasks.pair_new_investment.delay')
+    def test_new_investment_is_queued_on_commit(self, mock_pair, mock_window, mock_delay):
+        """Test that creating an investment in a bidding window queues pairing after commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            investment = self.invest(self.users[1], Decimal('500.00'))
+            mock_pair.assert_not_called()
+
+        mock_pair.assert_called_once_with(investment.id)
+
+    @mock.patch('accounts.signals.is_within_bidding_window', return_value=False)
+    @mock.patch('accounts.tasks.pair_new_investment.delay')
+    def test_new_investment_outside_window_waits_for_job(self, mock_pair, mock_window, mock_delay):
+        """Test that investments outside bidding windows are left to the pairing job"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.invest(self.users[1], Decimal('500.00'))
+
+        mock_pair.assert_not_called()
+
+
+class PairingExpiryTest(TestCase):
+    def setUp(self):
+        self.matured_user = User.objects.create_user(
+            username='matured',
+            email='matured@example.com',
+            phone_number='0712345670',
+            password='testpass123'
+        )
+        self.new_user = User.objects.create_user(
+            username='newinvestor',
+            email='new@example.com',
+            phone_number='0712345671',
+            password='testpass123'
+        )
+        self.matured = Investment.objects.create(
+            user=self.matured_user,
+            amount=Decimal('500.00'),
+            maturity_period=1,
+            status='paired',
+            paired_to=self.new_user,
+            return_amount=Decimal('500.00')
+        )
+        self.entry = Queue.objects.create(
+            user=self.matured_user, investment=self.matured, amount_remaining=Decimal('0.00')
+        )
+        self.new = Investment.objects.create(
+            user=self.new_user,
+            amount=Decimal('500.00'),
+            maturity_period=1,
+            status='paired',
+            paired_to=self.matured_user
+        )
+
+    def pair(self, due_in, **kwargs):
+        pairing = Pairing.objects.create(
+            matured_investment=self.matured,
+            new_investment_id=self.new,
+            amount_paired=Decimal('500.00'),
+            payment_due_date=timezone.now() + due_in,
+            **kwargs
+        )
+        return pairing
+
+    def test_overdue_pairings_are_failed_and_returned_to_pool(self):
+        """Test overdue pairings fail and their amounts and investments become matchable again"""
+        overdue = self.pair(timedelta(hours=-1))
+        current = self.pair(timedelta(hours=1))
+        confirmed = self.pair(timedelta(hours=-1), is_confirmed=True)
+
+        with self.assertNumQueries(8):
+            failures = expire_overdue_pairings()
+
+        self.assertEqual([f['pairing_id'] for f in failures], [overdue.id])
+        self.assertEqual(failures[0]['matured_user']['email'], 'matured@example.com')
+        self.assertEqual(failures[0]['new_user']['username'], 'newinvestor')
+        self.assertEqual(failures[0]['amount'], '500.00')
+
+        statuses = dict(Pairing.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[overdue.id], 'failed')
+        self.assertEqual(statuses[current.id], 'paired')
+        self.assertEqual(statuses[confirmed.id], 'paired')
+
+        self.entry.refresh_from_db()
+        self.matured.refresh_from_db()
+        self.new.refresh_from_db()
+        self.assertEqual(self.entry.amount_remaining, Decimal('500.00'))
+        self.assertEqual((self.matured.status, self.matured.paired_to), ('matured', None))
+        self.assertEqual((self.new.status, self.new.paired_to), ('pending', None))
+
+        # The failed amount no longer counts towards the new investment
+        current.delete()
+        confirmed.delete()
+        self.assertEqual(len(pair_shard()), 1)
+
+    def test_nothing_overdue_is_one_query(self):
+        """Test the scan costs a single statement when nothing is overdue"""
+        self.pair(timedelta(hours=1))
+        with self.assertNumQueries(3):
+            self.assertEqual(expire_overdue_pairings(), [])
+
+    @mock.patch('accounts.tasks.send_pairing_failed_notifications.delay')
+    def test_check_admin_pairing_sends_one_batch(self, mock_delay):
+        """Test the task hands all failures to a single notification task"""
+        self.pair(timedelta(hours=-1))
+        self.pair(timedelta(hours=-2))
+
+        check_admin_pairing.apply()
+
+        mock_delay.assert_called_once()
+        self.assertEqual(len(mock_delay.call_args.args[0]), 2)
+
+    def test_failed_notifications_name_the_other_party(self):
+        """Test each side is emailed with the other party's name"""
+        self.pair(timedelta(hours=-1))
+        failures = expire_overdue_pairings()
+
+        send_pairing_failed_notifications.apply(args=[failures])
+
+        self.assertEqual([message.to for message in mail.outbox], [['matured@example.com'], ['new@example.com']])
+        self.assertIn('Other Party: newinvestor', mail.outbox[0].body)
+        self.assertIn('Other Party: matured', mail.outbox[1].body)
+
+    def test_failed_send_does_not_stop_the_others(self):
+        """Test an SMTP error on one message is logged and the rest are still sent"""
+        self.pair(timedelta(hours=-1))
+        failures = expire_overdue_pairings()
+
+        with mock.patch('accounts.tasks.send_mail', side_effect=[OSError('SMTP down'), 1]) as send, \
+                self.assertLogs('accounts.tasks', level='ERROR') as logs:
+            result = send_pairing_failed_notifications.apply(args=[failures])
+
+        self.assertEqual(result.result, 1)
+        self.assertEqual(send.call_count, 2)
+        self.assertIn('matured@example.com: SMTP down', logs.output[0])
+
+    def test_update_returning_support(self):
+        """Test UPDATE ... RETURNING is only used where the database has it"""
+        with mock.patch.object(connection, 'vendor', 'sqlite'), \
+                mock.patch('accounts.pairing.sqlite3.sqlite_version_info', (3, 34, 1)):
+            self.assertFalse(supports_update_returning())
+        with mock.patch.object(connection, 'vendor', 'sqlite'), \
+                mock.patch('accounts.pairing.sqlite3.sqlite_version_info', (3, 35, 0)):
+            self.assertTrue(supports_update_returning())
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            self.assertFalse(supports_update_returning())
+
+        self.pair(timedelta(hours=-1))
+        with mock.patch('accounts.pairing.supports_update_returning', return_value=False):
+            self.assertEqual(len(expire_overdue_pairings()), 1)
+        self.assertEqual(Pairing.objects.get().status, 'failed')
@@ -0,0 +1,53 @@
+import random
+from decimal import Decimal
+from django.test import SimpleTestCase
+from accounts import pricing
+from accounts.models import Investment
+
+
+class PricingTest(SimpleTestCase):
+    def test_scalar_return_amount(self):
+        """Test 2% daily interest on the principal plus referral bonus"""
+        self.assertEqual(pricing.calculate_interest(Decimal('1000.00'), 10), Decimal('200.00'))
+        self.assertEqual(
+            pricing.calculate_return_amount(Decimal('1000.00'), 10, Decimal('50.00')),
+            Decimal('1250.00')
+        )
+
+    def test_rounds_half_up_to_the_cent(self):
+        """Test interest is rounded half up rather than truncated"""
+        # 0.25 * 0.02 * 1 = 0.005 -> 0.01
+        self.assertEqual(pricing.calculate_interest(Decimal('0.25'), 1), Decimal('0.01'))
+        # 0.24 * 0.02 * 1 = 0.0048 -> 0.00
+        self.assertEqual(pricing.calculate_interest(Decimal('0.24'), 1), Decimal('0.00'))
+
+    def test_float_inputs_do_not_drift(self):
+        """Test float amounts price the same as their decimal spelling"""
+        self.assertEqual(
+            pricing.calculate_return_amount(0.1 + 0.2, 3),
+            pricing.calculate_return_amount(Decimal('0.30'), 3)
+        )
+
+    def test_batch_agrees_with_scalar(self):
+        """Test the batched cents API matches the scalar API for every row"""
+        rng = random.Random(7)
+        amounts = [Decimal(rng.randint(1, 10000000)) / 100 for _ in range(500)]
+        periods = [rng.randint(1, 30) for _ in range(500)]
+        bonuses = [Decimal(rng.randint(0, 50000)) / 100 for _ in range(500)]
+
+        batch = pricing.return_amounts(amounts, periods, bonuses)
+        scalar = [
+            pricing.calculate_return_amount(amount, period, bonus)
+            for amount, period, bonus in zip(amounts, periods, bonuses)
+        ]
+        self.assertEqual(batch, scalar)
+
+    def test_model_uses_pricing(self):
+        """Test Investment.calculate_return_amount delegates to the pricing module"""
+        investment = Investment(
+            amount=Decimal('1234.56'), maturity_period=7, referral_bonus_used=Decimal('10.00')
+        )
+        self.assertEqual(
+            investment.calculate_return_amount(),
+            pricing.calculate_return_amount(Decimal('1234.56'), 7, Decimal('10.00'))
+        )
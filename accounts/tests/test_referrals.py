@@ -0,0 +1,86 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts import referrals
+from accounts.models import ReferralCodeBlock, User
+from accounts.referrals import BLOCK_SIZE, CODE_LENGTH, encode, next_code, resolve
+
+
+class ReferralCodeTest(TestCase):
+    def setUp(self):
+        referrals._pool.clear()
+        referrals._lookups.clear()
+
+    def test_codes_are_unique_and_unlike_legacy_codes(self):
+        """Test consecutive numbers give distinct nine-character codes"""
+        codes = {encode(number) for number in range(BLOCK_SIZE, 20 * BLOCK_SIZE)}
+
+        self.assertEqual(len(codes), 19 * BLOCK_SIZE)
+        self.assertTrue(all(len(code) == CODE_LENGTH for code in codes))
+        self.assertNotEqual(encode(BLOCK_SIZE)[:4], encode(BLOCK_SIZE + 1)[:4])
+
+    def test_committed_block_serves_codes_from_memory(self):
+        """Test one insert reserves a block whose codes need no further queries"""
+        with self.captureOnCommitCallbacks(execute=True):
+            first = next_code()
+        self.assertEqual(ReferralCodeBlock.objects.count(), 1)
+
+        with self.assertNumQueries(0):
+            codes = [next_code() for _ in range(10)]
+        self.assertEqual(len({first, *codes}), 11)
+
+    def test_uncommitted_block_is_not_shared(self):
+        """Test the rest of a block reserved in an open transaction is not handed out"""
+        next_code()
+        with self.assertNumQueries(1):
+            next_code()
+        self.assertEqual(ReferralCodeBlock.objects.count(), 2)
+
+    def test_new_users_get_pool_codes(self):
+        """Test saving a user without a code assigns one from the pool"""
+        user = User.objects.create_user(username='pooled', password='testpass123', phone_number='0712345010')
+        self.assertEqual(len(user.referral_code), CODE_LENGTH)
+
+
+class ResolveTest(TestCase):
+    def setUp(self):
+        referrals._pool.clear()
+        referrals._lookups.clear()
+        self.referrer = User.objects.create_user(
+            username='referrer', email='referrer@example.com', password='testpass123', phone_number='0712345011'
+        )
+
+    def test_lookups_are_cached(self):
+        """Test known and unknown codes are answered from the cache after the first query"""
+        self.assertEqual(resolve(self.referrer.referral_code), self.referrer.pk)
+        self.assertIsNone(resolve('NOSUCHCODE'))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve(f' {self.referrer.referral_code} '), self.referrer.pk)
+            self.assertIsNone(resolve('NOSUCHCODE'))
+            self.assertIsNone(resolve(''))
+
+    def test_new_code_clears_negative_entry(self):
+        """Test a code cached as unknown resolves once a user has it"""
+        self.assertIsNone(resolve('CUSTOM01'))
+        self.referrer.referral_code = 'CUSTOM01'
+        self.referrer.save()
+
+        self.assertEqual(resolve('CUSTOM01'), self.referrer.pk)
+
+    def test_registration_links_referrer(self):
+        """Test registering with a code sets the referrer and an invalid code is ignored"""
+        client = APIClient()
+        data = {'username': 'new', 'email': 'new@example.com', 'password': 'testpass123'}
+
+        response = client.post('/api/register/', {
+            **data, 'phone_number': '0712345012', 'referral_code': self.referrer.referral_code
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(User.objects.get(phone_number='0712345012').referred_by, self.referrer)
+
+        response = client.post('/api/register/', {
+            **data, 'username': 'other', 'phone_number': '0712345013', 'referral_code': 'NOSUCHCODE'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(User.objects.get(phone_number='0712345013').referred_by)
@@ -0,0 +1,95 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from accounts.models import User, Investment, Pairing
+from accounts.reminders import claim_due_reminders
+from accounts.tasks import send_payment_reminders
+
+
+@override_settings(
+    PAYMENT_REMINDER_INTERVALS=[timedelta(hours=1), timedelta(hours=4)],
+    PAYMENT_REMINDER_BATCH_SIZE=2
+)
+class PaymentReminderTest(TestCase):
+    def setUp(self):
+        self.matured_user = User.objects.create_user(
+            username='matured',
+            email='matured@example.com',
+            phone_number='0712345670',
+            password='testpass123'
+        )
+        self.new_user = User.objects.create_user(
+            username='newinvestor',
+            email='new@example.com',
+            phone_number='0712345671',
+            password='testpass123'
+        )
+        self.matured = Investment.objects.create(
+            user=self.matured_user, amount=Decimal('500.00'), maturity_period=1, status='paired'
+        )
+        self.new = Investment.objects.create(
+            user=self.new_user, amount=Decimal('500.00'), maturity_period=1, status='paired'
+        )
+
+    def pair(self, **kwargs):
+        return Pairing.objects.create(
+            matured_investment=self.matured,
+            new_investment_id=self.new,
+            amount_paired=Decimal('500.00'),
+            payment_due_date=timezone.now() + timedelta(hours=24),
+            **kwargs
+        )
+
+    def test_new_pairing_is_scheduled(self):
+        """Test the first reminder is scheduled one interval after pairing"""
+        before = timezone.now()
+        pairing = self.pair()
+        self.assertGreaterEqual(pairing.next_reminder_at, before + timedelta(hours=1))
+        self.assertEqual(pairing.reminder_count, 0)
+
+    def test_reminders_escalate_then_stop(self):
+        """Test each claim pushes the next reminder further out until the schedule ends"""
+        pairing = self.pair()
+        now = timezone.now() + timedelta(hours=1, minutes=1)
+
+        self.assertEqual(claim_due_reminders(now), [pairing])
+        pairing.refresh_from_db()
+        self.assertEqual(pairing.reminder_count, 1)
+        self.assertEqual(pairing.last_reminded_at, now)
+        self.assertEqual(pairing.next_reminder_at, now + timedelta(hours=4))
+
+        # Not due again until the next interval has passed
+        self.assertEqual(claim_due_reminders(now + timedelta(hours=3)), [])
+
+        later = now + timedelta(hours=4)
+        self.assertEqual(claim_due_reminders(later), [pairing])
+        pairing.refresh_from_db()
+        self.assertEqual(pairing.reminder_count, 2)
+        self.assertIsNone(pairing.next_reminder_at)
+        self.assertEqual(claim_due_reminders(later + timedelta(days=1)), [])
+
+    def test_send_payment_reminders_batches_due_rows_only(self):
+        """Test only due, open pairings are emailed, with users joined in the claim query"""
+        due = [self.pair(next_reminder_at=timezone.now() - timedelta(minutes=1)) for _ in range(3)]
+        self.pair()
+        self.pair(next_reminder_at=timezone.now() - timedelta(minutes=1), status='failed')
+        self.pair(next_reminder_at=timezone.now() - timedelta(minutes=1), is_confirmed=True)
+
+        # Per batch: claim (savepoint, select, update, release), no per-row lookups
+        with self.assertNumQueries(8):
+            sent = send_payment_reminders()
+
+        self.assertEqual(sent, 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, ['new@example.com'])
+        self.assertIn('Recipient: matured', mail.outbox[0].body)
+        self.assertEqual(
+            set(Pairing.objects.filter(reminder_count=1).values_list('id', flat=True)),
+            {pairing.id for pairing in due}
+        )
+
+        # A second run within the interval sends nothing
+        send_payment_reminders()
+        self.assertEqual(len(mail.outbox), 3)
@@ -0,0 +1,110 @@
+import importlib
+import os
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from accounts.checks import check_connection_budget
+from accounts.dashboard import CACHE_KEY, aget_user_dashboard, get_user_dashboard
+from accounts.models import Investment
+from accounts.routers import ReplicaRouter, _use_replica, read_from_primary, read_from_replica, replica_reads
+from accounts.views import event_ticket, user_dashboard
+
+with_replica = mock.patch.dict(settings.DATABASES, {'replica': {**settings.DATABASES['default']}})
+
+
+class ReplicaRouterTest(SimpleTestCase):
+    @with_replica
+    def test_reads_inside_block_use_replica(self):
+        """Test only reads marked for the replica leave the primary"""
+        self.assertEqual(Investment.objects.all().db, 'default')
+        with read_from_replica():
+            self.assertEqual(Investment.objects.all().db, 'replica')
+            self.assertEqual(ReplicaRouter().db_for_write(Investment), 'default')
+        self.assertEqual(Investment.objects.all().db, 'default')
+
+    def test_without_replica_reads_stay_on_primary(self):
+        """Test the router is a no-op when no replica alias is configured"""
+        with read_from_replica():
+            self.assertEqual(Investment.objects.all().db, 'default')
+
+    @with_replica
+    def test_decorated_view_reads_from_replica(self):
+        """Test views wrapped in replica_reads route their queries to the replica"""
+        @replica_reads
+        def view(request):
+            return Investment.objects.all().db
+
+        self.assertEqual(view(None), 'replica')
+        self.assertEqual(Investment.objects.all().db, 'default')
+
+    @with_replica
+    def test_primary_block_overrides_replica_reads(self):
+        """Test reads inside read_from_primary stay on the primary within a replica view"""
+        with read_from_replica():
+            with read_from_primary():
+                self.assertEqual(Investment.objects.all().db, 'default')
+            self.assertEqual(Investment.objects.all().db, 'replica')
+
+    @with_replica
+    def test_cached_dashboards_are_built_on_primary(self):
+        """Test a dashboard cached from a replica view is built from the primary"""
+        async def abuild(user):
+            return Investment.objects.all().db
+
+        users = mock.Mock(pk=-1), mock.Mock(pk=-2)
+        for user in users:
+            self.addCleanup(cache.delete, CACHE_KEY.format(user_id=user.pk))
+
+        with read_from_replica(), \
+                mock.patch('accounts.dashboard.build_user_dashboard', side_effect=lambda user: Investment.objects.all().db), \
+                mock.patch('accounts.dashboard.abuild_user_dashboard', side_effect=abuild):
+            self.assertEqual(get_user_dashboard(users[0]), 'default')
+            self.assertEqual(async_to_sync(aget_user_dashboard)(users[1]), 'default')
+
+    def test_post_views_stay_on_primary(self):
+        """Test the event ticket POST reads from the primary and the dashboard GET from the replica"""
+        factory = APIRequestFactory()
+        user = mock.Mock(pk=1, is_authenticated=True)
+
+        request = factory.post('/api/events/ticket/')
+        force_authenticate(request, user=user)
+        with mock.patch('accounts.views.issue_ticket', side_effect=lambda user_id: _use_replica.get()):
+            self.assertIs(event_ticket(request).data['ticket'], False)
+
+        request = factory.get('/api/dashboard/')
+        force_authenticate(request, user=user)
+        with mock.patch('accounts.views.get_user_dashboard', side_effect=lambda user: {'replica': _use_replica.get()}):
+            self.assertEqual(user_dashboard(request).data, {'replica': True})
+
+    def test_replica_is_not_migrated(self):
+        router = ReplicaRouter()
+        self.assertFalse(router.allow_migrate('replica', 'accounts'))
+        self.assertIsNone(router.allow_migrate('default', 'accounts'))
+
+
+class PostgresProfileTest(SimpleTestCase):
+    def test_replica_mirrors_default_in_tests(self):
+        """Test the profile adds a replica alias that tests mirror onto default"""
+        with mock.patch.dict(os.environ, {'POSTGRES_REPLICA_HOST': 'replica.internal'}):
+            profile = importlib.reload(importlib.import_module('referral_system.settings_postgres'))
+
+        default, replica = profile.DATABASES['default'], profile.DATABASES['replica']
+        self.assertEqual(default['ENGINE'], 'django.db.backends.postgresql')
+        self.assertTrue(default['CONN_HEALTH_CHECKS'])
+        self.assertGreater(default['CONN_MAX_AGE'], 0)
+        self.assertEqual(replica['HOST'], 'replica.internal')
+        self.assertEqual(replica['TEST'], {'MIRROR': 'default'})
+
+    @override_settings(WEB_CONCURRENCY=4, WEB_THREADS=4, DATABASE_MAX_CONNECTIONS=20)
+    @mock.patch.dict('accounts.checks.WORKER_POOLS', {
+        'matching': {'concurrency': 2}, 'state': {'concurrency': 2},
+        'notifications': {'concurrency': 8}, 'reports': {'concurrency': 1},
+    }, clear=True)
+    def test_connection_budget_check(self):
+        """Test a warning when threads and pools need more connections than allowed"""
+        self.assertEqual([error.id for error in check_connection_budget(None)], ['accounts.W001'])
+        with self.settings(DATABASE_MAX_CONNECTIONS=100):
+            self.assertEqual(check_connection_budget(None), [])
@@ -0,0 +1,51 @@
+from decimal import Decimal
+from django.test import TestCase
+from accounts import ledger
+from accounts.models import User, Investment, ReferralLedgerEntry
+from accounts.services import InvestmentService
+
+
+class InvestmentServiceTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='referrer',
+            email='referrer@example.com',
+            phone_number='0712345700',
+            password='testpass123'
+        )
+
+    def test_place_without_bonus(self):
+        """Test an investment without bonus balance takes a lock and an insert"""
+        # savepoint, lock, insert, release, plus the referral signal's savepoint
+        with self.assertNumQueries(6):
+            investment = InvestmentService.place(self.user, Decimal('500.00'), 3)
+
+        self.assertEqual(investment.status, 'pending')
+        self.assertEqual(investment.return_amount, Decimal('530.00'))
+        self.assertEqual(investment.referral_bonus_used, Decimal('0'))
+
+    def test_bonus_redeemed_with_one_entry(self):
+        """Test the bonus is redeemed with one ledger insert and a balance update"""
+        ledger.append_entry(self.user, 'bonus', Decimal('60.00'))
+
+        # savepoint, lock, insert, signal savepoint, ledger savepoint,
+        # ledger insert, balance update, releases
+        with self.assertNumQueries(10):
+            investment = InvestmentService.place(self.user, Decimal('45.00'), 1)
+
+        self.assertEqual(investment.referral_bonus_used, Decimal('45.00'))
+        self.assertEqual(investment.return_amount, Decimal('45.90') + Decimal('45.00'))
+        self.assertEqual(self.user.referral_earnings, Decimal('15.00'))
+        self.assertEqual(ledger.get_balance(self.user), Decimal('15.00'))
+
+        entry = ReferralLedgerEntry.objects.latest('id')
+        self.assertEqual((entry.kind, entry.amount, entry.balance), ('redemption', Decimal('-45.00'), Decimal('15.00')))
+        self.assertEqual(entry.investment, investment)
+
+    def test_bonus_capped_at_amount(self):
+        """Test only as much bonus as the investment amount is applied"""
+        ledger.append_entry(self.user, 'bonus', Decimal('80.00'))
+        InvestmentService.place(self.user, Decimal('50.00'), 1)
+
+        self.assertEqual(ledger.get_balance(self.user), Decimal('30.00'))
+        self.assertEqual(Investment.objects.get().referral_bonus_used, Decimal('50.00'))
@@ -0,0 +1,73 @@
+from decimal import Decimal
+from unittest import mock
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from accounts.locks import write_transaction
+from accounts.models import User, Investment
+from accounts.tasks import send_maturity_notification
+from referral_system.celery import (
+    MATCHING_QUEUE, NOTIFICATIONS_QUEUE, REPORTS_QUEUE, SQLITE_WRITER_QUEUE, app, single_writer_routes
+)
+
+
+class SQLiteBackendTest(TransactionTestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        """Test new connections get the tuned synchronous, timeout and cache settings"""
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('busy_timeout'), 20000)
+        self.assertEqual(self.pragma('cache_size'), -64000)
+
+    def test_write_transactions_take_write_lock_up_front(self):
+        """Test write transactions begin immediate and leave later atomic blocks deferred"""
+        with CaptureQueriesContext(connection) as queries:
+            with write_transaction():
+                with transaction.atomic():
+                    User.objects.exists()
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+        self.assertFalse(connection.write_intent)
+
+    def test_other_transactions_are_deferred(self):
+        """Test plain atomic blocks do not queue on the write lock"""
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                User.objects.exists()
+        self.assertEqual(queries[0]['sql'], 'BEGIN')
+
+    def test_single_writer_takes_only_write_tasks(self):
+        """Test the single-writer routes move matching and state tasks and leave the other pools alone"""
+        routes = single_writer_routes(app.conf.task_routes)
+        for name in ('accounts.tasks.run_pairing_job', 'accounts.tasks.pair_investment_shard',
+                     'accounts.tasks.check_matured_investments'):
+            self.assertEqual(routes[name], {'queue': SQLITE_WRITER_QUEUE})
+        self.assertEqual(routes['accounts.tasks.send_*'], {'queue': NOTIFICATIONS_QUEUE})
+        self.assertEqual(routes['accounts.tasks.generate_investment_statement'], {'queue': REPORTS_QUEUE})
+        self.assertEqual(routes['accounts.tasks.warm_up_bidding_window'], {'queue': MATCHING_QUEUE})
+
+    def test_maturity_notification_only_writes_its_flag(self):
+        """Test the notifications pool does not overwrite state the single writer changed meanwhile"""
+        user = User.objects.create_user(
+            username='testuser1',
+            email='test1@example.com',
+            phone_number='0712345678',
+            password='testpass123'
+        )
+        investment = Investment.objects.create(
+            user=user, amount=Decimal('500.00'), maturity_period=1, status='matured'
+        )
+
+        def pair_while_sending(**kwargs):
+            Investment.objects.filter(pk=investment.pk).update(status='paired')
+
+        with mock.patch('accounts.tasks.render_to_string', return_value=''), \
+                mock.patch('accounts.tasks.send_mail', side_effect=pair_while_sending):
+            send_maturity_notification(investment.id)
+
+        investment.refresh_from_db()
+        self.assertEqual(investment.status, 'paired')
+        self.assertTrue(investment.maturity_notification_sent)
@@ -0,0 +1,160 @@
+import socket
+import urllib.request
+from unittest import mock
+from celery.concurrency import prefork, solo
+from celery.signals import worker_process_init, worker_ready
+from django.db import connection
+from django.test import TestCase
+from decimal import Decimal
+from accounts.models import User, Investment, TaskRun
+from accounts.tasks import calculate_daily_statistics, process_referral_bonus
+from accounts import metrics, task_metrics
+from accounts.management.commands.start_workers import Command as StartWorkersCommand
+
+
+class TaskMetricsTest(TestCase):
+    def setUp(self):
+        metrics.registry.clear()
+        self.user = User.objects.create_user(
+            username='testuser1',
+            email='test1@example.com',
+            phone_number='0712345678',
+            password='testpass123'
+        )
+        Investment.objects.create(
+            user=self.user,
+            amount=Decimal('1000.00'),
+            maturity_period=1,
+            status='pending',
+            return_amount=Decimal('1020.00')
+        )
+
+    def test_task_run_is_recorded(self):
+        """Test that a task run is stored with its query count"""
+        calculate_daily_statistics.apply()
+
+        run = TaskRun.objects.get(task_name='accounts.tasks.calculate_daily_statistics')
+        self.assertEqual(run.state, 'SUCCESS')
+        self.assertEqual(run.db_queries, 4)
+        self.assertGreaterEqual(run.runtime, 0)
+        self.assertEqual(
+            metrics.celery_task_runs_total.get(
+                task='accounts.tasks.calculate_daily_statistics', state='SUCCESS'
+            ),
+            1
+        )
+
+    @mock.patch('accounts.tasks.send_referral_bonus_notification.delay')
+    def test_rows_touched(self, mock_delay):
+        """Test that rows written by a task are counted"""
+        referred = User.objects.create_user(
+            username='testuser2',
+            email='test2@example.com',
+            phone_number='0787654321',
+            password='testpass123',
+            referred_by=self.user
+        )
+        investment = Investment.objects.create(
+            user=referred,
+            amount=Decimal('500.00'),
+            maturity_period=1,
+            status='pending'
+        )
+        process_referral_bonus.apply(args=[investment.id])
+
+        run = TaskRun.objects.get(task_name='accounts.tasks.process_referral_bonus')
+        self.assertEqual(run.state, 'SUCCESS')
+        # The referrer balance update; SQLite reports no rowcount for the
+        # ReferralHistory and ledger INSERT ... RETURNING statements
+        self.assertEqual(run.rows_touched, 1)
+
+    def test_queries_on_every_alias_are_counted(self):
+        """Test that the query collector is attached to every database alias for the run"""
+        replica = mock.Mock(execute_wrappers=[])
+        task = mock.Mock()
+        task.name = 'accounts.tasks.calculate_daily_statistics'
+        task.request.get.return_value = None
+
+        with mock.patch.object(task_metrics.connections, 'all', return_value=[connection, replica]):
+            task_metrics.start_task_run(task_id='run-1', task=task)
+            collector = task_metrics._runs['run-1']['collector']
+            self.assertIn(collector, connection.execute_wrappers)
+            self.assertIn(collector, replica.execute_wrappers)
+
+            task_metrics.finish_task_run(task_id='run-1', task=task, state='SUCCESS')
+
+        self.assertNotIn(collector, connection.execute_wrappers)
+        self.assertEqual(replica.execute_wrappers, [])
+
+    def test_rolling_retention(self):
+        """Test that only the newest runs per task are kept"""
+        with self.settings(TASK_METRICS_RETENTION=3):
+            for _ in range(5):
+                calculate_daily_statistics.apply()
+
+        self.assertEqual(
+            TaskRun.objects.filter(task_name='accounts.tasks.calculate_daily_statistics').count(),
+            3
+        )
+
+    def test_worker_exporter_serves_registry(self):
+        """Test a worker process serves its task metrics on its own port"""
+        calculate_daily_statistics.apply()
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        with mock.patch.dict('os.environ', {'TASK_METRICS_PORT': str(port)}):
+            worker_process_init.send(sender=None)
+        self.addCleanup(setattr, task_metrics, '_exporter', None)
+        self.addCleanup(task_metrics._exporter.server_close)
+        self.addCleanup(task_metrics._exporter.shutdown)
+
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics') as response:
+            body = response.read().decode()
+        self.assertIn(
+            'celery_task_runs_total{task="accounts.tasks.calculate_daily_statistics",state="SUCCESS"} 1', body
+        )
+
+    def test_solo_worker_serves_registry_once(self):
+        """Test a solo worker serves its task metrics from the worker process itself"""
+        calculate_daily_statistics.apply()
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        with mock.patch.dict('os.environ', {'TASK_METRICS_PORT': str(port)}), \
+                mock.patch.object(task_metrics, 'start_exporter', wraps=task_metrics.start_exporter) as mock_start:
+            worker_ready.send(sender=mock.Mock(pool=solo.TaskPool()))
+            worker_ready.send(sender=mock.Mock(pool=solo.TaskPool()))
+        self.addCleanup(setattr, task_metrics, '_exporter', None)
+        self.addCleanup(task_metrics._exporter.server_close)
+        self.addCleanup(task_metrics._exporter.shutdown)
+
+        mock_start.assert_called_once_with(port)
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics') as response:
+            body = response.read().decode()
+        self.assertIn('celery_task_runs_total{task="accounts.tasks.calculate_daily_statistics"', body)
+
+    def test_prefork_parent_does_not_serve_registry(self):
+        """Test a prefork worker leaves its exporters to the child processes"""
+        with mock.patch.dict('os.environ', {'TASK_METRICS_PORT': '9540'}), \
+                mock.patch.object(task_metrics, 'start_exporter') as mock_start:
+            worker_ready.send(sender=mock.Mock(pool=mock.Mock(spec=prefork.TaskPool)))
+
+        mock_start.assert_not_called()
+
+    def test_start_workers_gives_each_queue_its_ports(self):
+        """Test every worker process of every queue gets its own exporter port"""
+        pools = {
+            'matching': {'concurrency': 2, 'prefetch_multiplier': 1},
+            'notifications': {'concurrency': 8, 'prefetch_multiplier': 4},
+            'reports': {'concurrency': 1, 'prefetch_multiplier': 1},
+        }
+        with mock.patch.dict('accounts.management.commands.start_workers.WORKER_POOLS', pools, clear=True), \
+                self.settings(TASK_METRICS_PORT=9000):
+            ports = StartWorkersCommand().metrics_ports()
+        self.assertEqual(ports, {'matching': 9000, 'notifications': 9002, 'reports': 9010})
+
+        with self.settings(TASK_METRICS_PORT=None):
+            self.assertEqual(StartWorkersCommand().metrics_ports(), {})
@@ -0,0 +1,114 @@
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock
+from zoneinfo import ZoneInfo
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.bidding import invalidate_calendar, render_bidding_windows
+from accounts.dashboard import CACHE_KEY
+from accounts.models import User, Investment, Queue
+from accounts.tasks import warm_connections, warm_up_bidding_window
+from accounts.warmup import warm_up
+from referral_system.celery import WORKER_POOLS, app
+
+NAIROBI = ZoneInfo('Africa/Nairobi')
+
+
+@override_settings(BIDDING_TIME_ZONE='Africa/Nairobi')
+class BiddingWarmUpTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_calendar()
+        self.user = User.objects.create_user(
+            username='active',
+            email='active@example.com',
+            phone_number='0712345680',
+            password='testpass123'
+        )
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        self.idle = User.objects.create_user(
+            username='idle',
+            email='idle@example.com',
+            phone_number='0712345681',
+            password='testpass123'
+        )
+        investment = Investment.objects.create(
+            user=self.user, amount=Decimal('500.00'), maturity_period=1, status='matured'
+        )
+        Queue.objects.create(user=self.user, investment=investment, amount_remaining=Decimal('600.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_warm_up_primes_active_dashboards(self):
+        """Test the warm-up caches dashboards of active users only"""
+        summary = warm_up(datetime(2026, 3, 2, 8, 57, tzinfo=NAIROBI))
+
+        self.assertEqual(summary['window'], '2026-03-02-morning')
+        self.assertEqual(summary['dashboards'], 1)
+        self.assertIsNone(cache.get(CACHE_KEY.format(user_id=self.idle.pk)))
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/user-dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['investments']['by_status']['matured'], 1)
+
+    def test_bidding_windows_payload_is_prerendered(self):
+        """Test the payload for the moment the window opens is already cached"""
+        warm_up(datetime(2026, 3, 2, 8, 57, tzinfo=NAIROBI))
+        opening = datetime(2026, 3, 2, 9, 0, tzinfo=NAIROBI)
+
+        with mock.patch('accounts.cache.set_value') as cache_set:
+            payload, valid_until = render_bidding_windows(opening)
+        cache_set.assert_not_called()
+        self.assertTrue(payload['is_open'])
+        self.assertEqual(valid_until, datetime(2026, 3, 2, 9, 40, tzinfo=NAIROBI))
+
+    def test_investment_save_invalidates_dashboard(self):
+        """Test a new investment drops its owner's cached dashboard"""
+        self.client.get('/api/user-dashboard/')
+        key = CACHE_KEY.format(user_id=self.user.pk)
+        self.assertIsNotNone(cache.get(key))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Investment.objects.create(user=self.user, amount=Decimal('300.00'), maturity_period=1)
+
+        self.assertIsNone(cache.get(key))
+        response = self.client.get('/api/user-dashboard/')
+        self.assertEqual(response.data['investments']['by_status']['pending'], 1)
+
+    @mock.patch('accounts.tasks.warm_up', return_value={})
+    @mock.patch.object(warm_connections, 'apply_async')
+    def test_task_warms_every_pool_process(self, apply_async, _):
+        """Test one connection warm-up is sent per process of each worker pool"""
+        warm_up_bidding_window()
+
+        self.assertEqual(
+            apply_async.call_count,
+            sum(pool['concurrency'] for pool in WORKER_POOLS.values())
+        )
+        queues = {call.kwargs['queue'] for call in apply_async.call_args_list}
+        self.assertEqual(queues, set(WORKER_POOLS))
+
+    def test_readiness_probe_opens_connections(self):
+        """Test the readiness probe opens the web process's connections, or reports 503"""
+        response = self.client.get('/ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ready', 'databases': 1})
+
+        with mock.patch('accounts.warmup.open_database_connections', side_effect=OSError('unreachable')), \
+                self.assertLogs('accounts.views', level='ERROR'):
+            response = self.client.get('/ready')
+        self.assertEqual(response.status_code, 503)
+
+    def test_warm_up_is_scheduled_before_each_window(self):
+        """Test beat runs the warm-up a few minutes before every window opens"""
+        schedule = app.conf.beat_schedule
+
+        morning = schedule['warm-up-morning-window']
+        self.assertEqual(morning['task'], 'accounts.tasks.warm_up_bidding_window')
+        self.assertEqual(morning['schedule'].hour, {8})
+        self.assertEqual(morning['schedule'].minute, {57})
+        self.assertEqual(schedule['warm-up-evening-window']['schedule'].hour, {16})
@@ -0,0 +1,81 @@
+"""
+Token-bucket throttles for the login endpoint.
+
+A rate of ``N/period`` in ``DEFAULT_THROTTLE_RATES`` gives a bucket of N
+tokens that refills at N per period. Every request takes a token. A request
+that finds its bucket empty gets a 429 before the view runs, so rejecting
+abusive traffic costs one cache round trip and no password hashing.
+
+Buckets are kept in the default cache and shared by every worker. Two
+requests that read the same bucket at once can both take its last token, so
+a burst may get a request or two past the limit.
+"""
+import math
+import time
+
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+CACHE_KEY = 'throttle:{scope}:{ident}'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """``(capacity, tokens per second)`` for a DRF rate such as ``'5/min'``"""
+    count, period = rate.split('/')
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    scope = None
+
+    def __init__(self):
+        self._wait = None
+
+    def get_bucket_ident(self, request):
+        """The client's bucket within ``scope``, or None to skip throttling"""
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        ident = self.get_bucket_ident(request)
+        if rate is None or ident is None:
+            return True
+
+        capacity, refill = parse_rate(rate)
+        key = CACHE_KEY.format(scope=self.scope, ident=ident)
+        now = time.time()
+        tokens, updated = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        else:
+            self._wait = (1 - tokens) / refill
+        # An untouched bucket is full again after one period
+        cache.set(key, (tokens, now), math.ceil(capacity / refill))
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class LoginIPThrottle(TokenBucketThrottle):
+    """Login attempts per client address"""
+    scope = 'login_ip'
+
+    def get_bucket_ident(self, request):
+        return self.get_ident(request)
+
+
+class LoginPhoneThrottle(TokenBucketThrottle):
+    """Login attempts per phone number, whichever address they come from"""
+    scope = 'login_phone'
+
+    def get_bucket_ident(self, request):
+        phone_number = request.data.get('phone_number')
+        if not isinstance(phone_number, str) or not phone_number.strip():
+            return None
+        return phone_number.strip()[:20]
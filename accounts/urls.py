@@ -1,10 +1,12 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
+from . import async_views
 from .views import (
     UserRegistrationView, UserLoginView, UserProfileView,
     InvestmentCreateView, InvestmentListView,
     ReferralHistoryListView, InvestmentStatementPDFView,
     ReferralStatementPDFView, system_overview, user_dashboard,
+    cashflow_projection, bidding_windows, investment_order_status, event_ticket,
     DashboardView, BuySharesView, SellSharesView, ReferralsView,
     CustomLoginView, CustomLogoutView, MyInvestmentsView
 )
@@ -19,6 +21,7 @@ urlpatterns = [
     # Investment endpoints
     path('investments/create/', InvestmentCreateView.as_view(), name='investment_create'),
     path('investments/', InvestmentListView.as_view(), name='investment_list'),
+    path('investments/orders/<uuid:ticket>/', investment_order_status, name='investment_order_status'),
     
     # Referral endpoints
     path('referrals/', ReferralHistoryListView.as_view(), name='referral_list'),
@@ -30,9 +33,25 @@ urlpatterns = [
     # System overview endpoint
     path('system-overview/', system_overview, name='system_overview'),
 
+    # Bidding calendar endpoint
+    path('bidding-windows/', bidding_windows, name='bidding_windows'),
+
+    # Maturity cash-flow projection endpoint
+    path('cashflow-projection/', cashflow_projection, name='cashflow_projection'),
+
     # User dashboard endpoint
     path('user-dashboard/', user_dashboard, name='user_dashboard'),
 
+    # Async read endpoints, for ASGI workers
+    path('async/user-dashboard/', async_views.user_dashboard, name='async_user_dashboard'),
+    path('async/system-overview/', async_views.system_overview, name='async_system_overview'),
+    path('async/investments/', async_views.investment_list, name='async_investment_list'),
+    path('async/referrals/', async_views.referral_list, name='async_referral_list'),
+
+    # Server-sent dashboard events
+    path('events/', async_views.events, name='events'),
+    path('events/ticket/', event_ticket, name='event_ticket'),
+
     # Template-based views
     path('', DashboardView.as_view(), name='dashboard'),
     path('buy-shares/', BuySharesView.as_view(), name='buy_shares'),
@@ -2,15 +2,18 @@ from django.shortcuts import render, get_object_or_404
 from rest_framework import status, generics
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from django.utils import timezone
 from django.db import transaction
 from decimal import Decimal
+import logging
 from datetime import datetime, timedelta
 from django.template.loader import render_to_string
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_response_headers
+from django.urls import reverse
+from django.utils.decorators import method_decorator
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -20,13 +23,29 @@ from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, UserSerializer,
     InvestmentSerializer, ReferralHistorySerializer
 )
-from .models import User, Investment, ReferralHistory, Payment
-from rest_framework.decorators import api_view, permission_classes
+from .models import User, Investment, ReferralHistory, Payment, Queue
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from django.views.generic import TemplateView
 from django.contrib.auth.views import LoginView, LogoutView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
-from django.db.models import Sum, Count, Avg
+from django.db.models import Sum
+from accounts import ledger, metrics
+from accounts.admission import PLACED, REJECTED, get_intake, get_order_status, submit_order
+from accounts.archive import get_investment_for_statement
+from accounts.authentication import ClaimsRefreshToken
+from accounts.bidding import get_cache_timeout as get_bidding_cache_timeout, render_bidding_windows
+from accounts.cashflow import get_cashflow_projection, get_default_horizon, get_max_horizon
+from accounts.dashboard import get_system_overview, get_user_dashboard
+from accounts.events import issue_ticket
+from accounts.login import HashingPoolFull, authenticate_credentials
+from accounts.pricing import calculate_interest
+from accounts.routers import replica_reads
+from accounts.services import InvestmentService
+from accounts.throttling import LoginIPThrottle, LoginPhoneThrottle
+from accounts.warmup import warm_web_process
+
+logger = logging.getLogger(__name__)
 
 # Create your views here.
 
@@ -81,7 +100,7 @@ class UserRegistrationView(generics.CreateAPIView):
                 try:
                     user = serializer.save()
                     print("User created successfully:", user.username)
-                    refresh = RefreshToken.for_user(user)
+                    refresh = ClaimsRefreshToken.for_user(user)
                     response_data = {
                         'user': UserSerializer(user).data,
                         'refresh': str(refresh),
@@ -112,34 +131,36 @@ class UserRegistrationView(generics.CreateAPIView):
 
 class UserLoginView(APIView):
     permission_classes = (AllowAny,)
+    # Throttles run before post(), so rejected attempts never hash a password
+    throttle_classes = (LoginIPThrottle, LoginPhoneThrottle)
     serializer_class = UserLoginSerializer
 
     def post(self, request):
-        print("Login request received:", request.data)  # Debug print
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
-            print("Serializer is valid")  # Debug print
             try:
-                user = authenticate(
-                    phone_number=serializer.validated_data['phone_number'],
-                    password=serializer.validated_data['password']
+                user = authenticate_credentials(
+                    serializer.validated_data['phone_number'],
+                    serializer.validated_data['password']
                 )
-                print("Authentication result:", user)  # Debug print
                 if user:
-                    refresh = RefreshToken.for_user(user)
+                    refresh = ClaimsRefreshToken.for_user(user)
                     response_data = {
                         'user': UserSerializer(user).data,
                         'refresh': str(refresh),
                         'access': str(refresh.access_token),
                     }
-                    print("Sending response:", response_data)  # Debug print
                     return Response(response_data)
-                print("Authentication failed")  # Debug print
                 return Response({'error': 'Invalid phone number or password'}, status=status.HTTP_401_UNAUTHORIZED)
+            except HashingPoolFull:
+                return Response(
+                    {'error': 'Too many logins in progress, please try again'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={'Retry-After': '1'}
+                )
             except Exception as e:
-                print("Authentication error:", str(e))  # Debug print
+                logger.error(f"Authentication error: {str(e)}")
                 return Response({'error': 'Authentication failed'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        print("Serializer errors:", serializer.errors)  # Debug print
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class UserProfileView(generics.RetrieveUpdateAPIView):
@@ -153,84 +174,31 @@ class InvestmentCreateView(generics.CreateAPIView):
     serializer_class = InvestmentSerializer
     permission_classes = [IsAuthenticated]
 
-    @transaction.atomic
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        user = request.user
         amount = serializer.validated_data['amount']
         maturity_period = serializer.validated_data['maturity_period']
+        if get_intake() is None:
+            investment = InvestmentService.place(request.user, amount, maturity_period)
+            return Response({
+                'status': PLACED,
+                'investment': self.get_serializer(investment).data,
+                'message': 'Investment placed successfully'
+            }, status=status.HTTP_201_CREATED)
 
-        # Calculate return amount (2% per day)
-        daily_interest_rate = Decimal('0.02')
-        interest_amount = amount * daily_interest_rate * maturity_period
-        return_amount = amount + interest_amount
-        referral_bonus_used = Decimal('0')
-
-        # Check and apply referral bonus if available
-        if user.referral_earnings > 0 and amount >= user.referral_earnings:
-            referral_bonus_used = user.referral_earnings
-            return_amount += referral_bonus_used
-            
-            # Update referral history records
-            referral_histories = ReferralHistory.objects.filter(
-                referrer=user,
-                status='pending'
-            ).order_by('created_at')
-
-            remaining_bonus = referral_bonus_used
-            for history in referral_histories:
-                if remaining_bonus <= 0:
-                    break
-                
-                if history.bonus_earned <= remaining_bonus:
-                    history.status = 'used'
-                    history.used_at = timezone.now()
-                    history.save()
-                    remaining_bonus -= history.bonus_earned
-                else:
-                    # Split the history record
-                    used_amount = remaining_bonus
-                    ReferralHistory.objects.create(
-                        referrer=history.referrer,
-                        referred=history.referred,
-                        amount_invested=history.amount_invested * (used_amount / history.bonus_earned),
-                        bonus_earned=used_amount,
-                        status='used',
-                        used_at=timezone.now()
-                    )
-                    history.amount_invested = history.amount_invested * ((history.bonus_earned - used_amount) / history.bonus_earned)
-                    history.bonus_earned -= used_amount
-                    history.save()
-                    remaining_bonus = 0
-
-            # Reset user's referral earnings
-            user.referral_earnings = 0
-            user.save()
-
-        # Create investment
-        investment = Investment.objects.create(
-            user=user,
-            amount=amount,
-            maturity_period=maturity_period,
-            status='pending',
-            return_amount=return_amount,
-            referral_bonus_used=referral_bonus_used,
-            maturity_date=timezone.now() + timedelta(days=maturity_period)
-        )
-
-        response_data = {
-            'id': investment.id,
-            'amount': amount,
-            'return_amount': return_amount,
-            'maturity_period': maturity_period,
-            'referral_bonus_applied': referral_bonus_used,
-            'message': 'Investment created successfully'
-        }
+        # Placed by the batched order writer, see accounts.admission
+        ticket = submit_order(request.user, amount, maturity_period)
 
-        return Response(response_data, status=status.HTTP_201_CREATED)
+        return Response({
+            'ticket': ticket,
+            'status': 'queued',
+            'status_url': reverse('investment_order_status', args=[ticket]),
+            'message': 'Investment order received'
+        }, status=status.HTTP_202_ACCEPTED)
 
+@method_decorator(replica_reads, name='dispatch')
 class InvestmentListView(generics.ListAPIView):
     permission_classes = (IsAuthenticated,)
     serializer_class = InvestmentSerializer
@@ -238,6 +206,7 @@ class InvestmentListView(generics.ListAPIView):
     def get_queryset(self):
         return Investment.objects.filter(user=self.request.user)
 
+@method_decorator(replica_reads, name='dispatch')
 class ReferralHistoryListView(generics.ListAPIView):
     permission_classes = (IsAuthenticated,)
     serializer_class = ReferralHistorySerializer
@@ -253,60 +222,33 @@ def create_investment(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        with transaction.atomic():
-            # Create the investment
-            investment = Investment.objects.create(
-                user=request.user,
-                amount=serializer.validated_data['amount'],
-                maturity_period=serializer.validated_data['maturity_period'],
-                status='pending'
-            )
-            
-            # Calculate return amount (2% per day)
-            daily_interest = 0.02  # 2%
-            interest = investment.amount * daily_interest * investment.maturity_period
-            investment.return_amount = investment.amount + interest
-            
-            # Check and apply referral bonus if available
-            if request.user.referral_earnings > 0 and investment.amount >= request.user.referral_earnings:
-                investment.referral_bonus_used = request.user.referral_earnings
-                investment.return_amount += request.user.referral_earnings
-                
-                # Reset user's referral earnings and mark related history as used
-                request.user.referral_earnings = 0
-                request.user.save()
-                
-                # Mark referral history as used
-                ReferralHistory.objects.filter(
-                    referrer=request.user,
-                    status='pending'
-                ).update(
-                    status='used',
-                    used_at=timezone.now()
-                )
-            
-            investment.save()
-            
-            return Response({
-                'message': 'Investment created successfully',
-                'investment': InvestmentSerializer(investment).data
-            }, status=status.HTTP_201_CREATED)
-            
+        investment = InvestmentService.place(
+            request.user,
+            serializer.validated_data['amount'],
+            serializer.validated_data['maturity_period']
+        )
+        return Response({
+            'message': 'Investment created successfully',
+            'investment': InvestmentSerializer(investment).data
+        }, status=status.HTTP_201_CREATED)
+
     except Exception as e:
         return Response({
             'error': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@method_decorator(replica_reads, name='dispatch')
 class InvestmentStatementPDFView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request, investment_id):
-        # Get the investment or return 404
-        investment = get_object_or_404(Investment, id=investment_id, user=request.user)
+        # Get the investment, live or archived, or return 404
+        investment = get_investment_for_statement(request.user, investment_id)
+        if investment is None:
+            raise Http404('Investment not found')
         
         # Calculate interest earned
-        daily_interest_rate = Decimal('0.02')
-        interest_earned = investment.amount * daily_interest_rate * investment.maturity_period
+        interest_earned = calculate_interest(investment.amount, investment.maturity_period)
         
         # Create the HttpResponse object with PDF headers
         response = HttpResponse(content_type='application/pdf')
@@ -364,22 +306,31 @@ class InvestmentStatementPDFView(APIView):
         doc.build(story)
         return response
 
+@method_decorator(replica_reads, name='dispatch')
 class ReferralStatementPDFView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         user = request.user
-        
-        # Get all referral history for the user
-        referral_history = ReferralHistory.objects.filter(referrer=user).order_by('-created_at')
-        
+
+        # Optional statement period, ?start=YYYY-MM-DD&end=YYYY-MM-DD (inclusive)
+        try:
+            start = request.query_params.get('start')
+            end = request.query_params.get('end')
+            start = timezone.make_aware(datetime.fromisoformat(start)) if start else None
+            end = timezone.make_aware(datetime.fromisoformat(end)) + timedelta(days=1) if end else None
+        except ValueError:
+            return Response({'error': 'start and end must be dates (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Ledger entries in the period with the balance carried into it
+        opening_balance, entries = ledger.statement(user, start, end)
+
         # Calculate totals
-        total_referrals = referral_history.count()
-        active_referrals = referral_history.filter(status='pending').count()
-        total_earnings = sum(history.bonus_earned for history in referral_history)
-        available_balance = user.referral_earnings
-        redeemed_amount = sum(history.bonus_earned for history in referral_history.filter(status='used'))
-        
+        total_referrals = ReferralHistory.objects.filter(referrer=user).count()
+        total_earnings = sum(entry.amount for entry in entries if entry.amount > 0)
+        redeemed_amount = -sum(entry.amount for entry in entries if entry.amount < 0)
+        closing_balance = entries[-1].balance if entries else opening_balance
+
         # Create the HttpResponse object with PDF headers
         response = HttpResponse(content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="referral_statement_{user.id}.pdf"'
@@ -409,10 +360,10 @@ class ReferralStatementPDFView(APIView):
         summary_data = [
             ['Earnings Summary', ''],
             ['Total Referrals', str(total_referrals)],
-            ['Active Referrals', str(active_referrals)],
+            ['Opening Balance', f'${opening_balance:,.2f}'],
             ['Total Earnings', f'${total_earnings:,.2f}'],
-            ['Available Balance', f'${available_balance:,.2f}'],
-            ['Redeemed Amount', f'${redeemed_amount:,.2f}']
+            ['Redeemed Amount', f'${redeemed_amount:,.2f}'],
+            ['Closing Balance', f'${closing_balance:,.2f}']
         ]
         
         summary_table = Table(summary_data, colWidths=[4*inch, 2*inch])
@@ -432,16 +383,16 @@ class ReferralStatementPDFView(APIView):
         story.append(summary_table)
         story.append(Spacer(1, 20))
         
-        # Referral history table
-        if referral_history:
-            history_data = [['Referred User', 'Date', 'Investment', 'Bonus', 'Status']]
-            for history in referral_history:
+        # Ledger table
+        if entries:
+            history_data = [['Date', 'Entry', 'Referred User', 'Amount', 'Balance']]
+            for entry in entries:
                 history_data.append([
-                    history.referred.username,
-                    history.created_at.strftime('%b %d, %Y'),
-                    f'${history.amount_invested:,.2f}',
-                    f'${history.bonus_earned:,.2f}',
-                    history.status.title()
+                    entry.created_at.strftime('%b %d, %Y'),
+                    entry.get_kind_display(),
+                    entry.referral.referred.username if entry.referral else '',
+                    f'${entry.amount:,.2f}',
+                    f'${entry.balance:,.2f}'
                 ])
             
             history_table = Table(history_data, colWidths=[2*inch, 1.5*inch, 1.5*inch, 1.5*inch, 1.5*inch])
@@ -457,7 +408,7 @@ class ReferralStatementPDFView(APIView):
                 ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
                 ('FONTSIZE', (0, 1), (-1, -1), 10),
                 ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ALIGN', (2, 1), (3, -1), 'RIGHT')
+                ('ALIGN', (3, 1), (4, -1), 'RIGHT')
             ]))
             story.append(Paragraph("Referral History", styles['Heading2']))
             story.append(Spacer(1, 10))
@@ -467,6 +418,7 @@ class ReferralStatementPDFView(APIView):
         doc.build(story)
         return response
 
+@method_decorator(replica_reads, name='dispatch')
 class DashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'accounts/dashboard.html'
 
@@ -518,12 +470,7 @@ class BuySharesView(LoginRequiredMixin, TemplateView):
             messages.error(request, 'Invalid amount or maturity period')
             return redirect('buy_shares')
         
-        # Create investment
-        investment = Investment.objects.create(
-            user=request.user,
-            amount=amount,
-            maturity_period=maturity_period
-        )
+        InvestmentService.place(request.user, amount, maturity_period)
         
         messages.success(request, 'Investment placed successfully!')
         return redirect('dashboard')
@@ -561,6 +508,7 @@ class SellSharesView(LoginRequiredMixin, TemplateView):
             
         return redirect('sell_shares')
 
+@method_decorator(replica_reads, name='dispatch')
 class ReferralsView(LoginRequiredMixin, TemplateView):
     template_name = 'accounts/referrals.html'
 
@@ -571,6 +519,7 @@ class ReferralsView(LoginRequiredMixin, TemplateView):
         context['referral_link'] = f"{self.request.scheme}://{self.request.get_host()}/register/?ref={user.referral_code}"
         return context
 
+@method_decorator(replica_reads, name='dispatch')
 class MyInvestmentsView(LoginRequiredMixin, TemplateView):
     template_name = 'accounts/my_investments.html'
 
@@ -603,221 +552,58 @@ class CustomLoginView(LoginView):
 class CustomLogoutView(LogoutView):
     next_page = 'login'
 
+@replica_reads
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def system_overview(request):
     """Get comprehensive system overview data"""
-    # User Statistics
-    total_users = User.objects.count()
-    
-    # Investment Statistics
-    investments = Investment.objects.all()
-    total_investments = investments.count()
-    
-    # Investment Status Breakdown
-    status_counts = investments.values('status').annotate(
-        count=Count('id'),
-        total_amount=Sum('amount'),
-        avg_amount=Avg('amount')
-    )
-    
-    # Payment Statistics
-    payments = Payment.objects.all()
-    payment_stats = payments.aggregate(
-        total_count=Count('id'),
-        total_amount=Sum('amount'),
-        avg_amount=Avg('amount')
-    )
-    
-    # Queue Statistics
-    queue_stats = Queue.objects.aggregate(
-        total_count=Count('id'),
-        total_amount=Sum('amount_remaining'),
-        avg_amount=Avg('amount_remaining')
-    )
-    
-    # User Investment Details
-    user_details = []
-    for user in User.objects.all():
-        user_investments = Investment.objects.filter(user=user)
-        if user_investments.exists():
-            user_data = {
-                'username': user.username,
-                'phone_number': user.phone_number,
-                'total_investments': user_investments.count(),
-                'investments_by_status': {},
-                'payments': {
-                    'made': {
-                        'count': 0,
-                        'total': 0
-                    },
-                    'received': {
-                        'count': 0,
-                        'total': 0
-                    }
-                }
-            }
-            
-            # Investment amounts by status
-            for status in ['pending', 'matured', 'paired', 'completed']:
-                status_investments = user_investments.filter(status=status)
-                if status_investments.exists():
-                    total = status_investments.aggregate(total=Sum('amount'))['total']
-                    user_data['investments_by_status'][status] = {
-                        'count': status_investments.count(),
-                        'total': float(total)
-                    }
-            
-            # Payment details
-            payments_made = Payment.objects.filter(from_user=user)
-            payments_received = Payment.objects.filter(to_user=user)
-            
-            if payments_made.exists():
-                total_sent = payments_made.aggregate(total=Sum('amount'))['total']
-                user_data['payments']['made'] = {
-                    'count': payments_made.count(),
-                    'total': float(total_sent)
-                }
-            
-            if payments_received.exists():
-                total_received = payments_received.aggregate(total=Sum('amount'))['total']
-                user_data['payments']['received'] = {
-                    'count': payments_received.count(),
-                    'total': float(total_received)
-                }
-            
-            user_details.append(user_data)
-    
-    return Response({
-        'user_statistics': {
-            'total_users': total_users
-        },
-        'investment_statistics': {
-            'total_investments': total_investments,
-            'status_breakdown': list(status_counts)
-        },
-        'payment_statistics': {
-            'total_payments': payment_stats['total_count'],
-            'total_amount': float(payment_stats['total_amount']),
-            'average_amount': float(payment_stats['avg_amount'])
-        },
-        'queue_statistics': {
-            'total_entries': queue_stats['total_count'],
-            'total_amount': float(queue_stats['total_amount']),
-            'average_amount': float(queue_stats['avg_amount'])
-        },
-        'user_details': user_details
-    })
+    return Response(get_system_overview())
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def user_dashboard(request):
+@permission_classes([IsAdminUser])
+def cashflow_projection(request):
+    """Get the return amounts maturing in each upcoming bidding window"""
+    horizon = request.query_params.get('horizon', get_default_horizon())
     try:
-        print("Starting user_dashboard view")  # Debug log
-        
-        # Get user's investments
-        investments = Investment.objects.filter(user=request.user)
-        print(f"Found {investments.count()} investments")  # Debug log
-        
-        # Calculate statistics
-        total_returns = investments.filter(status='completed').aggregate(
-            total=Sum('return_amount')
-        )['total'] or 0
-        print(f"Total returns: {total_returns}")  # Debug log
+        horizon = int(horizon)
+    except (TypeError, ValueError):
+        return Response({'error': 'horizon must be a whole number of days'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= horizon <= get_max_horizon():
+        return Response(
+            {'error': f'horizon must be between 1 and {get_max_horizon()} days'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(get_cashflow_projection(horizon))
 
-        # Get total referral earnings from ReferralHistory
-        total_referral_earnings = ReferralHistory.objects.filter(
-            referrer=request.user,
-            status='pending'
-        ).aggregate(
-            total=Sum('bonus_earned')
-        )['total'] or 0
-        print(f"Total referral earnings: {total_referral_earnings}")  # Debug log
-
-        # Get due earnings from matured investments
-        due_earnings = investments.filter(
-            status='matured'
-        ).aggregate(
-            total=Sum('return_amount')
-        )['total'] or 0
-        print(f"Due earnings: {due_earnings}")  # Debug log
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def bidding_windows(request):
+    """Get the bidding calendar: whether bidding is open and the upcoming windows"""
+    now = timezone.now()
+    payload, valid_until = render_bidding_windows(now)
+    response = Response(payload)
+
+    # Cacheable until the window opens or closes, or the calendar is rebuilt
+    max_age = get_bidding_cache_timeout()
+    if valid_until is not None:
+        max_age = min(max_age, max(int((valid_until - now).total_seconds()), 1))
+    patch_response_headers(response, cache_timeout=max_age)
+    patch_cache_control(response, public=True)
+    return response
 
-        # Get active investments count
-        active_investments = investments.filter(
-            status__in=['pending', 'paired']
-        ).count()
-        print(f"Active investments: {active_investments}")  # Debug log
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def event_ticket(request):
+    """Issue a single-use ticket for opening the user's event stream"""
+    return Response({'ticket': issue_ticket(request.user.pk)}, status=status.HTTP_201_CREATED)
 
-        # Get pending payments count
-        pending_payments = Payment.objects.filter(
-            to_user=request.user,
-            status='pending'
-        ).count()
-        print(f"Pending payments: {pending_payments}")  # Debug log
-
-        # Get recent investments
-        recent_investments = list(investments.order_by('-created_at')[:5].values(
-            'id', 'amount', 'status', 'created_at', 'return_amount',
-            'paired_to__username', 'payment_confirmed_at'
-        ))
-        print(f"Recent investments: {len(recent_investments)}")  # Debug log
-
-        # Get payment data for sell shares section
-        payments = list(Payment.objects.filter(
-            to_user=request.user,
-            status='pending'
-        ).select_related('from_user').values(
-            'id',
-            'amount',
-            'created_at',
-            'status',
-            'from_user__username',
-            'from_user__phone_number'
-        ).order_by('-created_at'))
-        print(f"Payments: {len(payments)}")  # Debug log
-
-        # Get referral data
-        referrals = list(ReferralHistory.objects.filter(referrer=request.user).select_related(
-            'referred'
-        ).values(
-            'referred__username',
-            'referred__phone_number',
-            'status',
-            'bonus_earned'
-        ))
-        print(f"Referrals: {len(referrals)}")  # Debug log
-
-        # Calculate investment status counts
-        investment_status_counts = {
-            'completed': investments.filter(status='completed').count(),
-            'pending': investments.filter(status='pending').count(),
-            'paired': investments.filter(status='paired').count(),
-            'matured': investments.filter(status='matured').count()
-        }
-        print(f"Investment status counts: {investment_status_counts}")  # Debug log
-
-        data = {
-            'statistics': {
-                'total_returns': float(total_returns),
-                'total_referral_earnings': float(total_referral_earnings),
-                'due_earnings': float(due_earnings),
-                'active_investments': active_investments,
-                'pending_payments': pending_payments
-            },
-            'investments': {
-                'recent': recent_investments,
-                'by_status': investment_status_counts
-            },
-            'payments': payments,  # Add payments data
-            'referral': {
-                'total_referrals': len(referrals),
-                'referrals': referrals
-            }
-        }
-        
-        print("Sending response data:", data)  # Debug log
-        return Response(data)
-        
+@replica_reads
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_dashboard(request):
+    try:
+        return Response(get_user_dashboard(request.user))
     except Exception as e:
         import traceback
         print(f"Dashboard error: {str(e)}")  # Error log
@@ -826,3 +612,40 @@ def user_dashboard(request):
             {'error': f'Failed to fetch dashboard data: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def investment_order_status(request, ticket):
+    """Get the status of a queued investment order"""
+    order = get_order_status(ticket, request.user)
+    if order is None:
+        return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    data = {'ticket': ticket, 'status': order['status']}
+    if 'investment' in order:
+        data['investment'] = InvestmentSerializer(order['investment']).data
+    if order['status'] == REJECTED:
+        data['error'] = order['error']
+    return Response(data)
+
+
+def metrics_view(request):
+    """Expose the in-process metrics registry in Prometheus text format"""
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden('Metrics are only available locally')
+    return HttpResponse(
+        metrics.registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+def readiness_view(request):
+    """Readiness probe: open this process's connections, 503 until they are up"""
+    try:
+        summary = warm_web_process()
+    except Exception as e:
+        logger.error(f"Readiness check failed: {str(e)}")
+        return JsonResponse({'status': 'unavailable'}, status=503)
+    return JsonResponse({'status': 'ready', **summary})
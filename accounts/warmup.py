@@ -0,0 +1,89 @@
+"""
+Warm-up ahead of each bidding window.
+
+Every window opens with a burst of logins, dashboards and ``buy_shares``
+calls. A few minutes before it opens (``BIDDING_WARMUP_LEAD_MINUTES``) the
+warm-up task:
+
+* primes the dashboard cache of users active in the last
+  ``BIDDING_WARMUP_ACTIVE_DAYS`` days;
+* renders the ``/api/bidding-windows/`` payload as it will be when the
+  window opens;
+* opens database and broker connections on the workers.
+
+Web processes open their database and cache connections from the ``/ready``
+readiness probe (``warm_web_process``), so a worker only receives traffic
+once its connections are up.
+"""
+import logging
+
+from celery import current_app
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+from accounts.bidding import get_calendar, render_bidding_windows
+from accounts.dashboard import active_users, prime_user_dashboard
+
+logger = logging.getLogger(__name__)
+
+
+def get_active_days():
+    return getattr(settings, 'BIDDING_WARMUP_ACTIVE_DAYS', 7)
+
+
+def get_max_users():
+    return getattr(settings, 'BIDDING_WARMUP_MAX_USERS', 5000)
+
+
+def prime_dashboards(days=None, limit=None):
+    """Fill the dashboard cache of recently active users, returns how many were primed"""
+    count = 0
+    for user in active_users(days or get_active_days(), limit or get_max_users()).iterator():
+        prime_user_dashboard(user)
+        count += 1
+    return count
+
+
+def prerender_bidding_windows(now=None):
+    """Render the bidding-window payload for the moment the next window opens"""
+    window = get_calendar(now).next_window(now)
+    if window is None:
+        return None
+    render_bidding_windows(window.start)
+    return window
+
+
+def open_database_connections():
+    """Open this thread's connection to every configured database"""
+    for connection in connections.all():
+        connection.ensure_connection()
+    return len(connections.all())
+
+
+def open_connections():
+    """Open every configured database connection and a broker connection"""
+    count = open_database_connections()
+    with current_app.connection_for_write() as connection:
+        connection.ensure_connection(max_retries=1)
+    return count
+
+
+def warm_web_process():
+    """Open a web process's database and cache connections, returns what was opened"""
+    databases = open_database_connections()
+    cache.get('warm-up')
+    return {'databases': databases}
+
+
+def warm_up(now=None):
+    """Run every warm-up step, returns a summary of what was warmed"""
+    now = now or timezone.now()
+    window = prerender_bidding_windows(now)
+    summary = {
+        'window': window.id if window else None,
+        'dashboards': prime_dashboards(),
+    }
+    logger.info(f"Bidding window warm-up completed: {summary}")
+    return summary
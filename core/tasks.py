@@ -1,26 +1,17 @@
 from celery import shared_task
 from django.utils import timezone
-from datetime import timedelta, time
+from datetime import timedelta
 from decimal import Decimal
-from .models import Investment, Queue, ReferralHistory, Payment
+from accounts.models import Investment, Queue, ReferralHistory, Payment
 from django.db.models import F
 from django.core.mail import send_mail
 from django.conf import settings
-
-def is_within_bidding_window():
-    """Check if current time is within bidding windows (9:00-9:40 AM or 5:00-5:40 PM)"""
-    current_time = timezone.localtime().time()
-    morning_start = time(9, 0)
-    morning_end = time(9, 40)
-    evening_start = time(17, 0)
-    evening_end = time(17, 40)
-    
-    return (
-        (morning_start <= current_time <= morning_end) or
-        (evening_start <= current_time <= evening_end)
-    )
+from accounts.locks import single_flight
+from accounts.pairing import pair_shard
+from core.validators import is_within_bidding_window
 
 @shared_task
+@single_flight('maturity')
 def check_matured_investments():
     """Check for investments that have reached maturity and move them to queue"""
     today = timezone.now()
@@ -35,6 +26,7 @@ def check_matured_investments():
         # Create queue entry
         Queue.objects.create(
             user=investment.user,
+            investment=investment,
             amount_remaining=investment.return_amount
         )
         
@@ -46,59 +38,14 @@ def check_matured_investments():
         send_maturity_email.delay(investment.id)
 
 @shared_task
+@single_flight('pairing')
 def run_pairing_job():
     """Pair matured investments with new investments during bidding windows"""
     if not is_within_bidding_window():
         return
         
-    # Get all matured investments in queue
-    queue_entries = Queue.objects.all().order_by('created_at')
-    
-    # Get all pending investments from the current bidding window
-    current_time = timezone.now()
-    window_start = current_time.replace(
-        hour=9 if current_time.hour < 12 else 17,
-        minute=0,
-        second=0,
-        microsecond=0
-    )
-    
-    pending_investments = Investment.objects.filter(
-        status='pending',
-        created_at__gte=window_start
-    ).order_by('created_at')
-    
-    for queue_entry in queue_entries:
-        if queue_entry.amount_remaining <= 0:
-            continue
-            
-        for investment in pending_investments:
-            if investment.status != 'pending':
-                continue
-                
-            # Calculate matching amount
-            match_amount = min(queue_entry.amount_remaining, investment.amount)
-            
-            if match_amount > 0:
-                # Update queue entry
-                queue_entry.amount_remaining -= match_amount
-                queue_entry.save()
-                
-                # Update investment
-                investment.status = 'paired'
-                investment.paired_to = queue_entry.user
-                investment.save()
-                
-                # Create payment record
-                Payment.objects.create(
-                    from_user=investment.user,
-                    to_user=queue_entry.user,
-                    investment=investment,
-                    amount=match_amount
-                )
-                
-                if queue_entry.amount_remaining <= 0:
-                    break
+    # Match against the open queue entries only, through the order book
+    pair_shard()
 
 @shared_task
 def send_maturity_email(investment_id):
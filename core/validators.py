@@ -1,20 +1,14 @@
 from django.core.exceptions import ValidationError
-from django.utils import timezone
-from datetime import time
+from accounts.bidding import get_calendar, get_default_windows
+
+def is_within_bidding_window():
+    """Check if current time is within a bidding window of the bidding calendar"""
+    return get_calendar().is_open()
 
 def validate_bidding_window():
     """Validate that the current time is within bidding windows"""
-    current_time = timezone.localtime().time()
-    morning_start = time(9, 0)
-    morning_end = time(9, 40)
-    evening_start = time(17, 0)
-    evening_end = time(17, 40)
-    
-    if not (
-        (morning_start <= current_time <= morning_end) or
-        (evening_start <= current_time <= evening_end)
-    ):
-        raise ValidationError(
-            "Investments can only be made during bidding windows: "
-            "9:00 AM - 9:40 AM or 5:00 PM - 5:40 PM"
-        ) 
\ No newline at end of file
+    if not is_within_bidding_window():
+        windows = ' or '.join(
+            f"{start:%I:%M %p} - {end:%I:%M %p}" for name, start, end in get_default_windows()
+        )
+        raise ValidationError(f"Investments can only be made during bidding windows: {windows}") 
\ No newline at end of file
@@ -3,13 +3,17 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db import transaction
 from django.db.models import Sum, Count
 from django.utils import timezone
-from .models import Investment, Queue, ReferralHistory
+from .models import Investment, Queue
 from .serializers import InvestmentSerializer
 from .validators import validate_bidding_window
 from decimal import Decimal
+from django.urls import reverse
+from accounts.admission import get_intake, submit_order
+from accounts.bidding import get_calendar
+from accounts.ledger import get_balance
+from accounts.services import InvestmentService
 
 class InvestmentViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
@@ -35,11 +39,8 @@ class InvestmentViewSet(viewsets.ModelViewSet):
                 amount_remaining__gt=0
             ).count()
             
-            # Get total referral earnings
-            total_referral_earnings = ReferralHistory.objects.filter(
-                referrer=user,
-                status='pending'
-            ).aggregate(total=Sum('bonus_earned'))['total'] or 0
+            # Get the referral bonus balance from the ledger snapshot
+            total_referral_earnings = get_balance(user)
             
             # Get total returns
             total_returns = Investment.objects.filter(
@@ -95,24 +96,8 @@ class InvestmentViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            with transaction.atomic():
-                # Create investment
-                investment = Investment.objects.create(
-                    user=request.user,
-                    amount=amount,
-                    maturity_period=maturity_period,
-                    status='pending'
-                )
-                
-                # Handle referral bonus if applicable
-                if request.user.referral_earnings > 0:
-                    bonus_to_use = min(request.user.referral_earnings, amount)
-                    investment.referral_bonus_used = bonus_to_use
-                    investment.return_amount += bonus_to_use
-                    request.user.referral_earnings -= bonus_to_use
-                    request.user.save()
-                    investment.save()
-                
+            if get_intake() is None:
+                investment = InvestmentService.place(request.user, amount, maturity_period)
                 return Response(
                     {
                         'message': 'Investment placed successfully',
@@ -121,6 +106,20 @@ class InvestmentViewSet(viewsets.ModelViewSet):
                     },
                     status=status.HTTP_201_CREATED
                 )
+
+            # Placed by the batched order writer, see accounts.admission
+            ticket = submit_order(request.user, amount, maturity_period)
+
+            return Response(
+                {
+                    'message': 'Investment order received',
+                    'ticket': ticket,
+                    'status': 'queued',
+                    'status_url': reverse('investment_order_status', args=[ticket]),
+                    'next_bidding_window': self._get_next_bidding_window()
+                },
+                status=status.HTTP_202_ACCEPTED
+            )
                 
         except ValidationError as e:
             return Response(
@@ -135,29 +134,11 @@ class InvestmentViewSet(viewsets.ModelViewSet):
     
     def _get_next_bidding_window(self):
         """Get information about the next bidding window"""
-        from django.utils import timezone
-        from datetime import datetime, time
-        
-        current_time = timezone.localtime()
-        current_hour = current_time.hour
-        
-        if current_hour < 9:
-            return {
-                'window': 'morning',
-                'start': current_time.replace(hour=9, minute=0).strftime('%Y-%m-%d %H:%M'),
-                'end': current_time.replace(hour=9, minute=40).strftime('%Y-%m-%d %H:%M')
-            }
-        elif current_hour < 17:
-            return {
-                'window': 'evening',
-                'start': current_time.replace(hour=17, minute=0).strftime('%Y-%m-%d %H:%M'),
-                'end': current_time.replace(hour=17, minute=40).strftime('%Y-%m-%d %H:%M')
-            }
-        else:
-            # If after 5:40 PM, return next day's morning window
-            next_day = current_time + timezone.timedelta(days=1)
-            return {
-                'window': 'morning',
-                'start': next_day.replace(hour=9, minute=0).strftime('%Y-%m-%d %H:%M'),
-                'end': next_day.replace(hour=9, minute=40).strftime('%Y-%m-%d %H:%M')
-            } 
\ No newline at end of file
+        window = get_calendar().next_window()
+        if window is None:
+            return None
+        return {
+            'window': window.name,
+            'start': window.start.strftime('%Y-%m-%d %H:%M'),
+            'end': window.end.strftime('%Y-%m-%d %H:%M')
+        }
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../contexts/AuthContext';
 import axios from 'axios';
+import { subscribeToDashboard } from '../../services/api';
 import {
     Box,
     Grid,
@@ -78,8 +79,8 @@ const Dashboard = () => {
             return;
         }
         fetchDashboardData();
-        const interval = setInterval(fetchDashboardData, 60000); // Refresh every minute
-        return () => clearInterval(interval);
+        // Follow the changes the server pushes instead of polling
+        return subscribeToDashboard(setDashboardData, fetchDashboardData, token);
     }, [token]);
 
     const copyReferralLink = () => {
@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { CircularProgress, Alert } from '@mui/material';
 import { useNavigate } from 'react-router-dom';
 import api from '../../services/api';
-import { authService } from '../../services/api';
+import { authService, subscribeToDashboard } from '../../services/api';
 import StatCards from './StatCards';
 import ReferralSection from './ReferralSection';
 import RecentInvestments from './RecentInvestments';
@@ -41,6 +41,8 @@ const UserDashboard = () => {
     };
 
     fetchData();
+    // Follow the changes the server pushes
+    return subscribeToDashboard(setData, fetchData);
   }, [navigate]);
 
   if (loading) {
@@ -210,4 +210,145 @@ export const authService = {
   }
 };
 
+// Dashboard events pushed by the server (/api/events/). Each connection is opened
+// with a single-use ticket from /api/events/ticket/, so the access token never
+// ends up in a URL. Calls onEvent(type, data) for each change and with 'resync'
+// after reconnecting, as events may have been missed meanwhile. Returns a
+// function closing the stream.
+const EVENTS_RECONNECT_DELAY = 3000;
+
+export const subscribeToEvents = (onEvent, token = localStorage.getItem('token')) => {
+    let source = null;
+    let timer = null;
+    let closed = false;
+    let connected = false;
+
+    const reconnect = () => {
+        if (!closed) {
+            timer = setTimeout(connect, EVENTS_RECONNECT_DELAY);
+        }
+    };
+
+    const connect = async () => {
+        let ticket;
+        try {
+            const response = await api.post('/api/events/ticket/', null, {
+                headers: { Authorization: `Bearer ${token}` },
+            });
+            ticket = response.data.ticket;
+        } catch (error) {
+            reconnect();
+            return;
+        }
+        if (closed) {
+            return;
+        }
+        source = new EventSource(
+            `${api.defaults.baseURL}/api/events/?ticket=${encodeURIComponent(ticket)}`
+        );
+        source.onopen = () => {
+            if (connected) {
+                onEvent('resync', {});
+            }
+            connected = true;
+        };
+        source.onerror = () => {
+            // The ticket is spent, so reconnect with a new one instead of
+            // letting EventSource retry the same URL
+            source.close();
+            reconnect();
+        };
+        ['investment', 'paired', 'pairing_failed', 'payment', 'referral', 'resync'].forEach((type) => {
+            source.addEventListener(type, (event) => onEvent(type, JSON.parse(event.data)));
+        });
+    };
+
+    connect();
+    return () => {
+        closed = true;
+        clearTimeout(timer);
+        if (source) {
+            source.close();
+        }
+    };
+};
+
+// Applies an event to a /api/user-dashboard/ payload. Returns the updated payload,
+// or null when the event changes figures the payload cannot be updated from.
+export const applyDashboardEvent = (data, type, payload) => {
+    if (type === 'investment') {
+        const investment = data.investments.recent.find((row) => row.id === payload.id);
+        if (!investment) {
+            return null;
+        }
+        if (investment.status === payload.status) {
+            return data;
+        }
+        // Returns and due earnings move once an investment matures
+        if (![investment.status, payload.status].every((status) => ['pending', 'paired'].includes(status))) {
+            return null;
+        }
+        const byStatus = data.investments.by_status;
+        return {
+            ...data,
+            investments: {
+                ...data.investments,
+                recent: data.investments.recent.map((row) => (
+                    row.id === payload.id ? { ...row, status: payload.status } : row
+                )),
+                by_status: {
+                    ...byStatus,
+                    [investment.status]: byStatus[investment.status] - 1,
+                    [payload.status]: byStatus[payload.status] + 1,
+                },
+            },
+        };
+    }
+    if (type === 'payment') {
+        const payment = data.payments.find((row) => row.id === payload.id);
+        if (!payment) {
+            return null;
+        }
+        if (payload.status === 'pending') {
+            return data;
+        }
+        const payments = data.payments.filter((row) => row.id !== payload.id);
+        return {
+            ...data,
+            payments,
+            statistics: { ...data.statistics, pending_payments: payments.length },
+        };
+    }
+    return null;
+};
+
+// Keeps a dashboard current from the event stream: events applyDashboardEvent
+// handles update it in place, and the others, resyncs included, are coalesced
+// into one refetch DASHBOARD_REFETCH_DELAY after the last of them. Returns a
+// function closing the stream.
+const DASHBOARD_REFETCH_DELAY = 1000;
+
+export const subscribeToDashboard = (setData, refetch, token) => {
+    let timer = null;
+    // Resetting the timer is idempotent, so the updater stays safe to re-run
+    const scheduleRefetch = () => {
+        clearTimeout(timer);
+        timer = setTimeout(refetch, DASHBOARD_REFETCH_DELAY);
+    };
+    const unsubscribe = subscribeToEvents((type, payload) => {
+        setData((data) => {
+            const updated = data && type !== 'resync' && applyDashboardEvent(data, type, payload);
+            if (updated) {
+                return updated;
+            }
+            scheduleRefetch();
+            return data;
+        });
+    }, token);
+    return () => {
+        clearTimeout(timer);
+        unsubscribe();
+    };
+};
+
 export default api; 
\ No newline at end of file
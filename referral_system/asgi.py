@@ -2,6 +2,10 @@
 ASGI config for referral_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The async endpoints under ``/api/async/`` and the ``/api/events/`` stream are
+meant to be served from it, e.g.
+
+    gunicorn referral_system.asgi:application -k uvicorn.workers.UvicornWorker
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
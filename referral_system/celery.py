@@ -1,7 +1,11 @@
 from __future__ import absolute_import, unicode_literals
 import os
+from datetime import time
+from zoneinfo import ZoneInfo
 from celery import Celery
 from celery.schedules import crontab
+from django_celery_beat.tzcrontab import TzAwareCrontab
+from kombu import Exchange, Queue
 from django.conf import settings
 
 # Set the default Django settings module
@@ -17,6 +21,121 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
 
+# Task queues
+# Time-critical matching must never wait behind SMTP sends or PDF rendering,
+# so every class of work gets its own queue and its own worker pool.
+MATCHING_QUEUE = 'matching'
+STATE_QUEUE = 'state'
+NOTIFICATIONS_QUEUE = 'notifications'
+REPORTS_QUEUE = 'reports'
+
+app.conf.task_default_queue = STATE_QUEUE
+app.conf.task_queues = tuple(
+    Queue(name, Exchange(name), routing_key=name)
+    for name in (MATCHING_QUEUE, STATE_QUEUE, NOTIFICATIONS_QUEUE, REPORTS_QUEUE)
+)
+app.conf.task_routes = {
+    # Pairing inside the 40-minute bidding windows
+    'accounts.tasks.run_pairing_job': {'queue': MATCHING_QUEUE},
+    'core.tasks.run_pairing_job': {'queue': MATCHING_QUEUE},
+    'accounts.tasks.pair_investment_shard': {'queue': MATCHING_QUEUE},
+    'accounts.tasks.reconcile_pairing': {'queue': MATCHING_QUEUE},
+    'accounts.tasks.pair_new_investment': {'queue': MATCHING_QUEUE},
+    # Warm-up ahead of each window, fanning connection warm-ups out to every pool
+    'accounts.tasks.warm_up_bidding_window': {'queue': MATCHING_QUEUE},
+    # Maturity sweeps and other state transitions
+    'accounts.tasks.check_matured_investments': {'queue': STATE_QUEUE},
+    'core.tasks.check_matured_investments': {'queue': STATE_QUEUE},
+    'accounts.tasks.check_admin_pairing': {'queue': STATE_QUEUE},
+    'accounts.tasks.process_referral_bonus': {'queue': STATE_QUEUE},
+    # Email fan-out
+    'accounts.tasks.send_*': {'queue': NOTIFICATIONS_QUEUE},
+    'core.tasks.send_*': {'queue': NOTIFICATIONS_QUEUE},
+    # PDF statements and statistics
+    'accounts.tasks.generate_investment_statement': {'queue': REPORTS_QUEUE},
+    'accounts.tasks.calculate_daily_statistics': {'queue': REPORTS_QUEUE},
+    'accounts.tasks.cleanup_old_queue_entries': {'queue': REPORTS_QUEUE},
+}
+
+# Worker pool per queue, started separately by `manage.py start_workers`.
+# Matching runs with prefetch 1 so a long pairing run never holds back the
+# next one; notifications prefetch more since each send is short and I/O bound.
+WORKER_POOLS = {
+    MATCHING_QUEUE: {'concurrency': 2, 'prefetch_multiplier': 1},
+    STATE_QUEUE: {'concurrency': 2, 'prefetch_multiplier': 1},
+    NOTIFICATIONS_QUEUE: {'concurrency': 8, 'prefetch_multiplier': 4},
+    REPORTS_QUEUE: {'concurrency': 1, 'prefetch_multiplier': 1},
+}
+
+# Single-node SQLite installs (SQLITE_SINGLE_WRITER) send the tasks that write
+# matching and investment state to one single-process worker, so those writes
+# are applied one at a time and never hit "database is locked". Emails, reports
+# and the warm-up keep their own pools and never wait behind matching.
+#
+# A few tasks on those pools still write, and stay there so SMTP sends and
+# archiving never hold up matching:
+# - send_maturity_notification sets maturity_notification_sent with a
+#   one-column UPDATE;
+# - send_payment_reminders advances the reminder schedule of the rows it
+#   claims (accounts.reminders);
+# - cleanup_old_queue_entries moves terminal rows to the archive tables in
+#   batches (accounts.archive);
+# - every instrumented task records its TaskRun (accounts.task_metrics).
+# Each of these is a single autocommit statement or a write_transaction(),
+# which takes the write lock when it begins (accounts.backends.sqlite3). It
+# waits on the lock for up to busy_timeout instead of failing, so these tasks
+# only see "database is locked" if the writer holds the lock longer than that.
+SQLITE_WRITER_QUEUE = 'sqlite-writer'
+WRITER_QUEUES = (MATCHING_QUEUE, STATE_QUEUE)
+WRITER_EXEMPT_TASKS = ('accounts.tasks.warm_up_bidding_window',)
+
+def single_writer_routes(routes):
+    """``routes`` with the matching and state tasks sent to the writer queue"""
+    return {
+        task: {'queue': SQLITE_WRITER_QUEUE}
+        if route['queue'] in WRITER_QUEUES and task not in WRITER_EXEMPT_TASKS else route
+        for task, route in routes.items()
+    }
+
+if getattr(settings, 'SQLITE_SINGLE_WRITER', False):
+    app.conf.task_default_queue = SQLITE_WRITER_QUEUE
+    app.conf.task_queues = app.conf.task_queues + (
+        Queue(SQLITE_WRITER_QUEUE, Exchange(SQLITE_WRITER_QUEUE), routing_key=SQLITE_WRITER_QUEUE),
+    )
+    app.conf.task_routes = single_writer_routes(app.conf.task_routes)
+    WORKER_POOLS = {
+        SQLITE_WRITER_QUEUE: {'concurrency': 1, 'prefetch_multiplier': 1},
+        # Only the pre-window warm-up is left on the matching queue
+        MATCHING_QUEUE: {'concurrency': 1, 'prefetch_multiplier': 1},
+        NOTIFICATIONS_QUEUE: WORKER_POOLS[NOTIFICATIONS_QUEUE],
+        REPORTS_QUEUE: WORKER_POOLS[REPORTS_QUEUE],
+    }
+
+def bidding_window_crontab(start, end, every=5):
+    """Crontab firing every ``every`` minutes from ``start`` to ``end`` ('HH:MM') in BIDDING_TIME_ZONE"""
+    start, end = time.fromisoformat(start), time.fromisoformat(end)
+    if start.hour == end.hour:
+        minute, hour = f'{start.minute}-{end.minute}/{every}', start.hour
+    else:
+        minute, hour = f'*/{every}', f'{start.hour}-{end.hour}'
+    return TzAwareCrontab(minute=minute, hour=hour, tz=ZoneInfo(settings.BIDDING_TIME_ZONE))
+
+def bidding_warmup_crontab(start):
+    """Crontab firing BIDDING_WARMUP_LEAD_MINUTES before ``start`` ('HH:MM') in BIDDING_TIME_ZONE"""
+    start = time.fromisoformat(start)
+    minutes = (start.hour * 60 + start.minute - settings.BIDDING_WARMUP_LEAD_MINUTES) % (24 * 60)
+    return TzAwareCrontab(minute=minutes % 60, hour=minutes // 60, tz=ZoneInfo(settings.BIDDING_TIME_ZONE))
+
+@app.on_after_configure.connect
+def setup_bidding_warmup(sender, **kwargs):
+    """Schedule a warm-up before each of the daily bidding windows"""
+    for name, start, end in settings.BIDDING_WINDOWS:
+        sender.add_periodic_task(
+            bidding_warmup_crontab(start),
+            sender.signature('accounts.tasks.warm_up_bidding_window'),
+            name=f'warm-up-{name}-window'
+        )
+
 # Use database scheduler
 app.conf.beat_scheduler = 'django_celery_beat.schedulers:DatabaseScheduler'
 
@@ -26,13 +145,14 @@ app.conf.beat_schedule = {
         'task': 'core.tasks.check_matured_investments',
         'schedule': crontab(minute=0, hour='*/1'),  # Run every hour
     },
-    'run-morning-pairing': {
-        'task': 'core.tasks.run_pairing_job',
-        'schedule': crontab(minute='*/5', hour='9'),  # Run every 5 minutes during 9 AM hour
-    },
-    'run-evening-pairing': {
-        'task': 'core.tasks.run_pairing_job',
-        'schedule': crontab(minute='*/5', hour='17'),  # Run every 5 minutes during 5 PM hour
+    # Window-bound pairing every 5 minutes inside each daily bidding window;
+    # the task itself checks the bidding calendar for holidays and overrides
+    **{
+        f'run-{name}-pairing': {
+            'task': 'core.tasks.run_pairing_job',
+            'schedule': bidding_window_crontab(start, end),
+        }
+        for name, start, end in settings.BIDDING_WINDOWS
     },
 }
 
@@ -57,8 +57,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'accounts.middleware.RequestMetricsMiddleware',
 ]
 
+# Request instrumentation
+# Requests running more SQL queries than this are logged as N+1 suspects
+REQUEST_QUERY_BUDGET = 20
+# Client addresses allowed to scrape the /metrics endpoint
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:3000",  # React dev server
@@ -117,15 +124,47 @@ WSGI_APPLICATION = 'referral_system.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # SQLite with WAL and immediate transactions, see accounts.backends.sqlite3
+        'ENGINE': 'accounts.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
 
+# Overrides for the PRAGMAs applied to every SQLite connection
+SQLITE_PRAGMAS = {}
+# Opt in on single-node SQLite installs: run the matching and state tasks on
+# one single-process worker so their writes never compete for the SQLite
+# write lock (see referral_system.celery)
+SQLITE_SINGLE_WRITER = False
+
+# Read-only views read from this alias when it is configured, see
+# accounts.routers; settings_postgres is the PostgreSQL production profile
+DATABASE_ROUTERS = ['accounts.routers.ReplicaRouter']
+DATABASE_REPLICA_ALIAS = 'replica'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
+# Argon2id first; older hashes are upgraded when their users log in
+PASSWORD_HASHERS = [
+    'accounts.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+# Argon2 costs: passes, memory in KiB and lanes
+ARGON2_TIME_COST = 2
+ARGON2_MEMORY_COST = 19456
+ARGON2_PARALLELISM = 1
+
+# Login pipeline (accounts.login): password checks run on this many threads
+# per process, with at most LOGIN_HASHING_BACKLOG more waiting before logins
+# are turned away with a 503
+LOGIN_HASHING_WORKERS = 2
+LOGIN_HASHING_BACKLOG = 32
+LOGIN_HASHING_TIMEOUT = 10
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -178,9 +217,15 @@ AUTH_USER_MODEL = 'accounts.User'
 
 # Rest Framework settings
 REST_FRAMEWORK = {
+    # Builds request.user from the token claims, see accounts.authentication
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
     ),
+    # Token buckets of the login throttles (accounts.throttling)
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_phone': '5/min',
+    },
 }
 
 # JWT settings
@@ -207,6 +252,59 @@ SIMPLE_JWT = {
 
     'JTI_CLAIM': 'jti',
 }
+# How long each process trusts its last look at a user's token revocation,
+# in seconds (accounts.authentication)
+JWT_REVOCATION_CACHE_TIMEOUT = 5
+
+# Caches (accounts.cache). The default cache forwards to the Redis alias and,
+# while Redis is unreachable, to a per-process local-memory cache, retrying
+# Redis every RETRY_AFTER seconds
+CACHE_REDIS_URL = 'redis://localhost:6379/1'
+CACHES = {
+    'default': {
+        'BACKEND': 'accounts.cache.FallbackCache',
+        'OPTIONS': {
+            'PRIMARY': 'redis',
+            'FALLBACK': 'local',
+            'RETRY_AFTER': 30,
+        },
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+        'KEY_PREFIX': 'referral_system',
+        'OPTIONS': {
+            'socket_connect_timeout': 1,
+            'socket_timeout': 1,
+        },
+    },
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'referral-system',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+# get_or_set stampede protection: how eagerly hot keys are recomputed before
+# they expire (0 disables it), and how long a cold key's builder holds its lock
+CACHE_EARLY_EXPIRY_BETA = 1.0
+CACHE_LOCK_TIMEOUT = 10
+
+# Dashboard events (accounts.events): 'redis' publishes through Redis pub/sub so
+# events from Celery workers reach the ASGI processes, 'local' stays in process
+EVENTS_BROKER = 'redis'
+EVENTS_REDIS_URL = 'redis://localhost:6379/0'
+EVENTS_RETRY_AFTER = 30
+EVENTS_QUEUE_SIZE = 100
+# Event streams send a comment every EVENTS_HEARTBEAT_INTERVAL seconds and end
+# after EVENTS_STREAM_TIMEOUT seconds, when clients reconnect after
+# EVENTS_RECONNECT_DELAY seconds
+EVENTS_HEARTBEAT_INTERVAL = 15
+EVENTS_STREAM_TIMEOUT = 900
+EVENTS_RECONNECT_DELAY = 3
+# Lifetime in seconds of the single-use tickets event streams are opened with
+EVENTS_TICKET_TIMEOUT = 30
 
 # Celery Configuration
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
@@ -216,6 +314,83 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Africa/Nairobi'
 
+# Task instrumentation (accounts.task_metrics)
+TASK_METRICS_PREFIXES = ('accounts.tasks.', 'core.tasks.')
+TASK_METRICS_RETENTION = 500  # Task runs kept per task in the TaskRun table
+# Each worker process serves its metrics registry from this port plus its pool
+# index (manage.py start_workers gives every queue its own block); None disables
+TASK_METRICS_PORT = 9540
+TASK_METRICS_ADDRESS = '127.0.0.1'
+
+# Single-flight lease TTLs in seconds (accounts.locks), long enough to cover
+# the slowest run; an expired lease can be taken over by the next run
+TASK_LEASE_TTLS = {
+    'pairing': 600,
+    'maturity': 900,
+}
+
+# Pairing (accounts.pairing)
+# Amount bucket boundaries; each bucket is paired in its own parallel subtask
+# before a reconcile pass. An empty list pairs the whole queue in one task.
+PAIRING_SHARD_BOUNDARIES = [1000, 5000, 20000]
+PAIRING_PAYMENT_WINDOW = timedelta(hours=24)
+# Match new investments against the queue on commit during bidding windows;
+# the periodic pairing job then only reconciles leftovers
+PAIRING_ON_INVESTMENT = True
+
+# Archival (accounts.archive): terminal rows older than this move to the
+# Archived* tables in batches of ARCHIVE_BATCH_SIZE
+ARCHIVE_RETENTION_DAYS = 30
+ARCHIVE_BATCH_SIZE = 1000
+
+# Payment reminders (accounts.reminders): gaps before each successive
+# reminder for an unpaid pairing, and how many are sent per mail connection
+PAYMENT_REMINDER_INTERVALS = [timedelta(hours=1), timedelta(hours=4), timedelta(hours=12)]
+PAYMENT_REMINDER_BATCH_SIZE = 100
+
+# Bidding windows (accounts.bidding): default daily windows as
+# (name, start, end) in BIDDING_TIME_ZONE. Holidays and per-day overrides are
+# edited in the admin; the precomputed calendar covers BIDDING_CALENDAR_DAYS
+# ahead and is cached for BIDDING_CALENDAR_CACHE_TIMEOUT seconds.
+BIDDING_WINDOWS = [
+    ('morning', '09:00', '09:40'),
+    ('evening', '17:00', '17:40'),
+]
+BIDDING_TIME_ZONE = TIME_ZONE
+BIDDING_CALENDAR_DAYS = 14
+BIDDING_CALENDAR_CACHE_TIMEOUT = 300
+# Warm-up (accounts.warmup) this many minutes before each window, priming the
+# dashboards of users active in the last BIDDING_WARMUP_ACTIVE_DAYS days
+BIDDING_WARMUP_LEAD_MINUTES = 3
+BIDDING_WARMUP_ACTIVE_DAYS = 7
+BIDDING_WARMUP_MAX_USERS = 5000
+
+# Cached /api/user-dashboard/ and /api/system-overview/ payloads
+# (accounts.dashboard), in seconds
+DASHBOARD_CACHE_TIMEOUT = 300
+SYSTEM_OVERVIEW_CACHE_TIMEOUT = 60
+
+# Referral code lookups (accounts.referrals): in-process LRU size, and how
+# long known and unknown codes stay cached in seconds
+REFERRAL_CODE_CACHE_SIZE = 10000
+REFERRAL_CODE_CACHE_TIMEOUT = 300
+REFERRAL_CODE_NEGATIVE_CACHE_TIMEOUT = 60
+
+# Investment order intake (accounts.admission). Orders are appended to a Redis
+# stream at INVESTMENT_INTAKE_URL (e.g. CELERY_BROKER_URL) and placed by the
+# process_investment_orders command; None places each order in its request
+INVESTMENT_INTAKE_URL = None
+INVESTMENT_INTAKE_STREAM = 'investment-orders'
+INVESTMENT_INTAKE_BATCH_SIZE = 200
+# How long ticket statuses stay pollable, in seconds
+INVESTMENT_TICKET_TIMEOUT = 3600
+
+# Cash-flow projection (accounts.cashflow): default and maximum horizon in
+# days, and how long a computed projection is cached in seconds
+CASHFLOW_PROJECTION_HORIZON_DAYS = 7
+CASHFLOW_PROJECTION_MAX_HORIZON_DAYS = 90
+CASHFLOW_PROJECTION_CACHE_TIMEOUT = 300
+
 # Celery Beat Settings
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
@@ -226,7 +401,7 @@ CELERY_BEAT_SCHEDULE = {
     },
     'run-pairing-job': {
         'task': 'accounts.tasks.run_pairing_job',
-        'schedule': 60.0,  # Run every minute
+        'schedule': 300.0,  # Run every 5 minutes, new investments are paired on arrival
     },
     'check-admin-pairing': {
         'task': 'accounts.tasks.check_admin_pairing',
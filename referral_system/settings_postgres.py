@@ -0,0 +1,68 @@
+"""
+PostgreSQL production profile.
+
+    DJANGO_SETTINGS_MODULE=referral_system.settings_postgres
+
+Connection details come from the POSTGRES_* environment variables. Django
+4.2 has no connection pool of its own. Each gunicorn thread and each Celery
+pool process keeps one persistent connection (CONN_MAX_AGE), health-checked
+before reuse, so WEB_CONCURRENCY x WEB_THREADS plus the WORKER_POOLS
+concurrency is the pool size. The accounts.W001 check warns when that
+exceeds DATABASE_MAX_CONNECTIONS.
+
+With POSTGRES_REPLICA_HOST set, read-only views read from the replica alias
+(see accounts.routers). In tests the alias mirrors default, so the suite
+runs against one local Postgres.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASE_REPLICA_ALIAS
+
+
+def postgres_database(host, port):
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_DB', 'referral_system'),
+        'USER': os.environ.get('POSTGRES_USER', 'referral_system'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': host,
+        'PORT': port,
+        # Keep connections open between requests and check them before reuse
+        'CONN_MAX_AGE': int(os.environ.get('POSTGRES_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'connect_timeout': 5,
+            'application_name': 'referral_system',
+            # Detect dead peers on idle persistent connections
+            'keepalives': 1,
+            'keepalives_idle': 30,
+            'keepalives_interval': 10,
+            'keepalives_count': 3,
+            # Give up on statements stuck behind locks instead of pinning the connection
+            'options': f"-c statement_timeout={os.environ.get('POSTGRES_STATEMENT_TIMEOUT_MS', 30000)}",
+        },
+    }
+
+
+DATABASES = {
+    'default': postgres_database(
+        os.environ.get('POSTGRES_HOST', 'localhost'),
+        os.environ.get('POSTGRES_PORT', '5432')
+    ),
+}
+
+if os.environ.get('POSTGRES_REPLICA_HOST'):
+    DATABASES[DATABASE_REPLICA_ALIAS] = postgres_database(
+        os.environ['POSTGRES_REPLICA_HOST'],
+        os.environ.get('POSTGRES_REPLICA_PORT', '5432')
+    )
+    DATABASES[DATABASE_REPLICA_ALIAS]['TEST'] = {'MIRROR': 'default'}
+
+# One worker pool per task queue, see referral_system.celery
+SQLITE_SINGLE_WRITER = False
+
+# Connection budget per node, see accounts.checks
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 4))
+WEB_THREADS = int(os.environ.get('WEB_THREADS', 4))
+DATABASE_MAX_CONNECTIONS = int(os.environ.get('POSTGRES_MAX_CONNECTIONS', 100))
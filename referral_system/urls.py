@@ -19,10 +19,13 @@ from django.urls import path, include, re_path
 from django.views.generic import TemplateView
 from django.conf import settings
 from django.conf.urls.static import static
+from accounts.views import metrics_view, readiness_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('accounts.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('ready', readiness_view, name='ready'),
     # Serve static files and media in development
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
@@ -1,3 +1,3 @@
 @echo off
-echo Starting Celery worker with solo pool...
-celery -A referral_system worker -l info --pool=solo 
\ No newline at end of file
+echo Starting Celery workers (one solo pool per queue)...
+python manage.py start_workers --pool=solo